@@ -0,0 +1,96 @@
+"""
+Compara la serialización de GET /api/v1/reports: instancias ORM + serialize_report
++ jsonable_encoder + json.dumps (camino anterior) contra columnas como tuplas +
+orjson (REPORT_PROJECTION).
+Ejecutar desde: python scripts/bench_list_serialization.py [filas]
+
+Usa una base SQLite temporal con `filas` reportes (100000 por defecto); no toca
+la base configurada en DATABASE_URL.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+REST_DIR = ROOT / "services" / "rest-api"
+sys.path.insert(0, str(REST_DIR))
+
+_tmp = tempfile.mkdtemp(prefix="bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/bench.db"
+os.environ["ASYNC_DB_ENABLED"] = "0"
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+import orjson  # noqa: E402
+from db import SessionLocal  # noqa: E402
+from main import REPORT_PROJECTION, estados_lookup, serialize_report, status_resolver  # noqa: E402
+from entities.reporte import Reporte  # noqa: E402
+from entities.usuario import Usuario  # noqa: E402
+
+
+def seed(filas: int) -> None:
+    with SessionLocal() as session:
+        user = Usuario(nombre="Bench", email="bench@example.com", password_hash="x")
+        session.add(user)
+        session.flush()
+        base = datetime(2025, 1, 1)
+        session.execute(insert(Reporte), [
+            {
+                "id_usuario": user.id_usuario,
+                "titulo": f"Reporte {i}",
+                "descripcion": "Descripción de prueba con algo de texto " * 4,
+                "ubicacion": "Edificio A",
+                "creado_en": base + timedelta(seconds=i),
+            }
+            for i in range(filas)
+        ])
+        session.commit()
+
+
+def orm() -> bytes:
+    estados = estados_lookup()
+    with SessionLocal() as session:
+        reportes = session.query(Reporte).order_by(Reporte.creado_en.desc(), Reporte.id_reporte.desc()).all()
+        content = jsonable_encoder([serialize_report(r, estados) for r in reportes])
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def columnas() -> bytes:
+    status = status_resolver(estados_lookup())
+    with SessionLocal() as session:
+        rows = (
+            session.query(*REPORT_PROJECTION.columnas())
+            .order_by(Reporte.creado_en.desc(), Reporte.id_reporte.desc())
+            .all()
+        )
+        return orjson.dumps(REPORT_PROJECTION.to_dicts(rows, status=status))
+
+
+def medir(fn, repeticiones: int = 3) -> tuple[float, int]:
+    mejor, size = float("inf"), 0
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        size = len(fn())
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor, size
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    seed(filas)
+    assert json.loads(orm()) == json.loads(columnas()), "los dos caminos deben producir el mismo JSON"
+    t_orm, size = medir(orm)
+    t_col, _ = medir(columnas)
+    print(f"{filas} reportes, {size / 1e6:.1f} MB de JSON")
+    print(f"  ORM + jsonable_encoder + json : {t_orm:.2f} s ({t_orm / filas * 1e6:.1f} µs/fila)")
+    print(f"  columnas + orjson             : {t_col:.2f} s ({t_col / filas * 1e6:.1f} µs/fila)")
+    print(f"  mejora: {t_orm / t_col:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
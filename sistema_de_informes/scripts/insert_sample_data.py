@@ -24,6 +24,10 @@ from entities.etiqueta import Etiqueta
 from entities.comentario import Comentario
 from entities.puntuacion import Puntuacion
 from entities.archivo_adjunto import ArchivoAdjunto
+from entities.contenido_archivo import ContenidoArchivo
+from entities.variante_archivo import VarianteArchivo
+from entities.trabajo_miniatura import TrabajoMiniatura
+from entities.resumen_puntuacion import ResumenPuntuacion
 
 def insert_data():
     session = SessionLocal()
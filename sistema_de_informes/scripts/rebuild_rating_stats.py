@@ -0,0 +1,43 @@
+"""
+Reconstruye la tabla report_rating_stats a partir de puntuaciones.
+Ejecutar desde: python scripts/rebuild_rating_stats.py
+
+La API la llena sola al arrancar si está vacía; el script sirve para
+reconstruirla a mano (p. ej. tras cargar puntuaciones con SQL directo).
+Después los routers mantienen el agregado en cada alta/cambio/baja.
+"""
+import sys
+from pathlib import Path
+
+# Configurar path para importar módulos de rest-api
+ROOT = Path(__file__).resolve().parents[1]
+REST_DIR = ROOT / "services" / "rest-api"
+sys.path.insert(0, str(REST_DIR))
+
+from db import Base, SessionLocal, engine
+# Importar todas las entidades para evitar problemas de relaciones
+from entities.rol import Rol
+from entities.usuario import Usuario
+from entities.categoria import Categoria
+from entities.area import Area
+from entities.estado_reporte import EstadoReporte
+from entities.reporte import Reporte
+from entities.comentario import Comentario
+from entities.puntuacion import Puntuacion
+from entities.archivo_adjunto import ArchivoAdjunto
+from entities.contenido_archivo import ContenidoArchivo
+from entities.variante_archivo import VarianteArchivo
+from entities.trabajo_miniatura import TrabajoMiniatura
+from entities.resumen_puntuacion import ResumenPuntuacion
+from rating_stats import rebuild_rating_stats
+
+
+def main():
+    Base.metadata.create_all(bind=engine, tables=[ResumenPuntuacion.__table__])
+    with SessionLocal() as session:
+        total = rebuild_rating_stats(session)
+    print(f"✅ report_rating_stats reconstruida: {total} reportes con puntuaciones")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Reconstruye el índice de búsqueda de reportes (FTS5 en SQLite, tsvector en Postgres).
+Ejecutar desde: python scripts/rebuild_search_index.py
+
+El REST API crea y llena el índice al arrancar si no existe; este script sirve
+cuando se cargaron o modificaron reportes/comentarios directamente en SQL.
+"""
+import sys
+from pathlib import Path
+
+# Configurar path para importar módulos de rest-api
+ROOT = Path(__file__).resolve().parents[1]
+REST_DIR = ROOT / "services" / "rest-api"
+sys.path.insert(0, str(REST_DIR))
+
+from db import SessionLocal
+# Importar todas las entidades para evitar problemas de relaciones
+from entities.rol import Rol
+from entities.usuario import Usuario
+from entities.categoria import Categoria
+from entities.area import Area
+from entities.estado_reporte import EstadoReporte
+from entities.reporte import Reporte
+from entities.comentario import Comentario
+from entities.puntuacion import Puntuacion
+from entities.archivo_adjunto import ArchivoAdjunto
+from entities.contenido_archivo import ContenidoArchivo
+from entities.variante_archivo import VarianteArchivo
+from entities.trabajo_miniatura import TrabajoMiniatura
+from search import ensure_search_index, rebuild_search_index
+
+
+def main():
+    ensure_search_index()
+    with SessionLocal() as session:
+        total = rebuild_search_index(session)
+    print(f"✅ Índice de búsqueda reconstruido: {total} reportes indexados")
+
+
+if __name__ == "__main__":
+    main()
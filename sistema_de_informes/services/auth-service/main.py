@@ -1,13 +1,18 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 from typing import Optional
+from datetime import datetime, timedelta, timezone
+import time
 
 from db import Base, engine, get_db
 from models import Usuario, RefreshToken, RevokedToken
 from schemas import RegisterIn, LoginIn, TokenPairOut, AccessTokenOut, UserOut, RefreshIn, LogoutIn, ValidateOut
-from security import hash_password, verify_password, create_access_token, create_refresh_token, decode_token, rate_limiter
+from revocation_events import broadcaster
+from security import hash_password, verify_password, create_access_token, create_refresh_token, decode_token, rate_limiter, ACCESS_TOKEN_EXPIRE_MINUTES
 
 load_dotenv()
 
@@ -98,13 +103,16 @@ def logout(payload: LogoutIn, user: Usuario = Depends(get_current_user), db: Ses
         jti = claims.get("jti")
     except Exception:
         raise HTTPException(status_code=400, detail="Token inválido")
+    revoked = None
     if jti:
         # Idempotencia: no insertar si ya existe revocado
         existing = db.query(RevokedToken).filter(RevokedToken.jti == jti).first()
         if not existing:
-            db.add(RevokedToken(jti=jti, token=token, reason="logout"))
+            revoked = RevokedToken(jti=jti, token=token, reason="logout")
+            db.add(revoked)
 
     # Si se envía refresh_token, revocarlo también
+    revoked_refresh = None
     if payload.refresh_token:
         try:
             r_claims = decode_token(payload.refresh_token)
@@ -114,8 +122,16 @@ def logout(payload: LogoutIn, user: Usuario = Depends(get_current_user), db: Ses
             raise HTTPException(status_code=400, detail="Refresh token inválido")
         rt = db.query(RefreshToken).filter(RefreshToken.jti == r_claims.get("jti")).first()
         if rt:
+            if not rt.revoked:
+                revoked_refresh = (rt.jti, int(r_claims.get("exp") or 0))
             rt.revoked = True
     db.commit()
+
+    # Publicar sólo después del commit: el evento nunca adelanta a /auth/revoked
+    if revoked is not None:
+        broadcaster.publish(jti, int(claims.get("exp") or 0), "access", cursor=revoked.id)
+    if revoked_refresh:
+        broadcaster.publish(*revoked_refresh, "refresh")
     return {"status": "ok"}
 
 
@@ -145,6 +161,7 @@ def refresh(payload: RefreshIn, db: Session = Depends(get_db)):
     new_refresh_token, new_refresh_jti, new_refresh_exp = create_refresh_token(str(user.id_usuario))
     db.add(RefreshToken(user_id=user.id_usuario, token=new_refresh_token, jti=new_refresh_jti, expires_at=new_refresh_exp))
     db.commit()
+    broadcaster.publish(rt.jti, int(claims.get("exp") or 0), "refresh")
 
     return TokenPairOut(access_token=access_token, refresh_token=new_refresh_token)
 
@@ -173,17 +190,74 @@ def validate(token: Optional[str] = None, authorization: Optional[str] = Header(
     return ValidateOut(valid=True, claims=claims)
 
 
+REVOKED_PRUNE_INTERVAL_SECONDS = 60
+_last_revoked_prune = 0.0
+
+
+def _revoked_expiry(revoked_at: datetime) -> datetime:
+    # Un access token revocado vence a más tardar ACCESS_TOKEN_EXPIRE_MINUTES después de la revocación
+    return revoked_at + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+
+
+def _prune_revoked(db: Session) -> None:
+    """Elimina revocaciones cuyos tokens ya expiraron (como máximo una vez por minuto)."""
+    global _last_revoked_prune
+    now = time.monotonic()
+    if now - _last_revoked_prune < REVOKED_PRUNE_INTERVAL_SECONDS:
+        return
+    _last_revoked_prune = now
+    cutoff = datetime.utcnow() - timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    db.query(RevokedToken).filter(RevokedToken.revoked_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+
+
 @app.get("/auth/revoked", response_model=dict)
-def revoked_snapshot(db: Session = Depends(get_db)):
-    """Snapshot interno de tokens revocados.
+def revoked_snapshot(since: Optional[int] = None, db: Session = Depends(get_db)):
+    """Tokens revocados para la blacklist local de otros microservicios.
 
-    Se usa para que otros microservicios mantengan una blacklist local mediante
-    sincronización periódica (sin consultar al Auth Service en cada request).
+    Sin `since` devuelve el snapshot completo de revocaciones vigentes; con
+    `since=<cursor>` sólo las posteriores a ese cursor. En ambos casos se
+    devuelve el `cursor` a usar en la siguiente llamada y el `exp` (epoch) de
+    cada jti para que el consumidor pueda podar su copia local.
     """
 
-    rows = db.query(RevokedToken.jti).all()
-    jtis = [r[0] for r in rows if r and r[0]]
-    return {"count": len(jtis), "jtis": jtis}
+    _prune_revoked(db)
+    q = db.query(RevokedToken.id, RevokedToken.jti, RevokedToken.revoked_at)
+    if since is not None:
+        q = q.filter(RevokedToken.id > since)
+    rows = q.order_by(RevokedToken.id).all()
+
+    cursor = rows[-1][0] if rows else since
+    if cursor is None:
+        cursor = db.query(func.max(RevokedToken.id)).scalar() or 0
+    items = [
+        {"jti": jti, "exp": int(_revoked_expiry(revoked_at).replace(tzinfo=timezone.utc).timestamp())}
+        for _, jti, revoked_at in rows
+        if jti
+    ]
+    return {
+        "count": len(items),
+        "jtis": [item["jti"] for item in items],
+        "items": items,
+        "cursor": cursor,
+        "full": since is None,
+    }
+
+
+@app.get("/auth/revoked/stream")
+async def revoked_stream(request: Request):
+    """Stream SSE de revocaciones (evento `revoked` con `{jti, exp, type, cursor?}`).
+
+    Al conectar, el consumidor debe completar su copia con `/auth/revoked?since=`:
+    el stream sólo trae las revocaciones posteriores a la suscripción.
+    """
+
+    sub = broadcaster.subscribe()
+    return StreamingResponse(
+        broadcaster.stream(sub, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/")
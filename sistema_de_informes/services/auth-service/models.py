@@ -30,4 +30,4 @@ class RevokedToken(Base):
     jti = Column(String(64), nullable=False, unique=True, index=True)
     token = Column(Text, nullable=False)
     reason = Column(String(120), nullable=True)
-    revoked_at = Column(DateTime, default=datetime.utcnow)
+    revoked_at = Column(DateTime, default=datetime.utcnow, index=True)
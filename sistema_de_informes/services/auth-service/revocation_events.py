@@ -0,0 +1,88 @@
+"""
+Difusión en vivo de revocaciones (Server-Sent Events).
+
+`/auth/logout` y la rotación de `/auth/refresh` publican un evento por cada
+jti revocado; los microservicios suscritos a `/auth/revoked/stream` lo
+reciben en milisegundos en vez de esperar al siguiente polling.
+
+La difusión es en memoria y por proceso: un suscriptor sólo recibe eventos
+del worker al que está conectado. Por eso los consumidores, al (re)conectar,
+completan su blacklist con `/auth/revoked?since=`, que sigue siendo la
+fuente de verdad.
+"""
+import asyncio
+import json
+import os
+import threading
+from typing import Optional
+
+REVOKED_STREAM_QUEUE_SIZE = int(os.getenv("REVOKED_STREAM_QUEUE_SIZE", "1000"))
+REVOKED_STREAM_KEEPALIVE_SECONDS = float(os.getenv("REVOKED_STREAM_KEEPALIVE_SECONDS", "15"))
+
+
+class _Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=REVOKED_STREAM_QUEUE_SIZE)
+        # Si la cola se llena se corta el stream: el consumidor reconecta y
+        # recupera lo perdido por polling en vez de quedarse con huecos.
+        self.overflowed = False
+
+    def offer(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class RevocationBroadcaster:
+    def __init__(self) -> None:
+        self._mu = threading.Lock()
+        self._subscribers: set[_Subscriber] = set()
+
+    def subscribe(self) -> _Subscriber:
+        sub = _Subscriber(asyncio.get_running_loop())
+        with self._mu:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: _Subscriber) -> None:
+        with self._mu:
+            self._subscribers.discard(sub)
+
+    def publish(self, jti: str, exp: int, kind: str, cursor: Optional[int] = None) -> None:
+        """Encola el evento en cada suscriptor. Seguro desde el threadpool de rutas sync."""
+        event = {"jti": jti, "exp": exp, "type": kind}
+        if cursor is not None:
+            event["cursor"] = cursor
+        with self._mu:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.offer, event)
+            except RuntimeError:
+                # Loop cerrado: el suscriptor ya no existe
+                self.unsubscribe(sub)
+
+    async def stream(self, sub: _Subscriber, is_disconnected):
+        """Generador SSE: un evento `revoked` por jti y comentarios de keep-alive."""
+        try:
+            yield "retry: 2000\n\n"
+            while not sub.overflowed:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), REVOKED_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                lines = ["event: revoked"]
+                if "cursor" in event:
+                    lines.append(f"id: {event['cursor']}")
+                lines.append("data: " + json.dumps(event, separators=(",", ":")))
+                yield "\n".join(lines) + "\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+
+broadcaster = RevocationBroadcaster()
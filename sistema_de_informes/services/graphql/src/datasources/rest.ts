@@ -172,6 +172,57 @@ const mapTag = (raw: AnyObject) => {
   };
 };
 
+/**
+ * Filtros que el REST API resuelve en SQL sobre /api/v1/reports
+ */
+export type ReportFilters = {
+  state_id?: number;
+  category_id?: number;
+  area_id?: number;
+  user_id?: number;
+  created_from?: string;
+  created_to?: string;
+  sort?: "created_at" | "-created_at";
+};
+
+const toQueryString = (params: Record<string, unknown> = {}): string => {
+  const search = new URLSearchParams();
+  for (const [key, value] of Object.entries(params)) {
+    if (value !== undefined && value !== null && value !== "") search.set(key, String(value));
+  }
+  const qs = search.toString();
+  return qs ? `?${qs}` : "";
+};
+
+const toTime = (value: unknown): number | undefined => {
+  const t = typeof value === "string" ? Date.parse(value) : NaN;
+  return Number.isNaN(t) ? undefined : t;
+};
+
+/**
+ * Aplica en memoria los mismos filtros que `/api/v1/reports` resuelve en SQL.
+ * Sólo se usa con la ruta de respaldo `/reportes`, que no acepta filtros.
+ */
+const applyReportFilters = (reports: ReturnType<typeof mapReport>[], filters: ReportFilters) => {
+  const from = toTime(filters.created_from);
+  const to = toTime(filters.created_to);
+  const out = reports.filter((r) => {
+    if (filters.state_id !== undefined && r.state_id !== filters.state_id) return false;
+    if (filters.category_id !== undefined && r.category_id !== filters.category_id) return false;
+    if (filters.area_id !== undefined && r.area_id !== filters.area_id) return false;
+    if (filters.user_id !== undefined && r.user_id !== filters.user_id) return false;
+    if (from !== undefined || to !== undefined) {
+      const created = toTime(r.created_at);
+      if (created === undefined) return false;
+      if (from !== undefined && created < from) return false;
+      if (to !== undefined && created > to) return false;
+    }
+    return true;
+  });
+  const dir = filters.sort === "created_at" ? 1 : -1;
+  return out.sort((a, b) => dir * ((toTime(a.created_at) ?? 0) - (toTime(b.created_at) ?? 0)));
+};
+
 export class RestDataSource {
   private readonly baseURL: string;
   private readonly bearerToken?: string;
@@ -223,9 +274,37 @@ export class RestDataSource {
   /**
    * Endpoints de integración (públicos, sin auth)
    */
-  async getReports() {
-    const data = await this.getWithFallback<any[]>(["/api/v1/reports", "/reportes"]);
-    return Array.isArray(data) ? data.map(mapReport) : [];
+  async getReports(filters: ReportFilters = {}) {
+    const qs = toQueryString(filters);
+    try {
+      const data = await this.get<any[]>(`/api/v1/reports${qs}`);
+      return Array.isArray(data) ? data.map(mapReport) : [];
+    } catch {
+      // Respaldo sin filtros en el servidor: se filtra aquí para no devolver todos los reportes
+      const data = await this.getWithFallback<any[]>(["/reportes"]);
+      return Array.isArray(data) ? applyReportFilters(data.map(mapReport), filters) : [];
+    }
+  }
+
+  /**
+   * Agregaciones calculadas en SQL por el REST API (/api/v1/analytics)
+   */
+  async getReportCounts(groupBy: "state" | "area" | "category") {
+    return this.get<{ total: number; groups: Array<{ id: number | null; name: string; count: number }> }>(
+      `/api/v1/analytics/reports${toQueryString({ group_by: groupBy })}`
+    );
+  }
+
+  async getTopUsers(limit: number) {
+    return this.get<Array<{ user_id: number; name: string; count: number }>>(
+      `/api/v1/analytics/top-users${toQueryString({ limit })}`
+    );
+  }
+
+  async getRatingsSummary() {
+    return this.get<{ count: number; average: number | null; min: number | null; max: number | null }>(
+      "/api/v1/analytics/ratings"
+    );
   }
 
   async getCategories() {
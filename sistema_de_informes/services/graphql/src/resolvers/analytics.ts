@@ -70,14 +70,15 @@ export const typeDefsAnalytics = `#graphql
 
 export const resolversAnalytics = {
   Query: {
-    // 1️⃣ Estadísticas generales de reportes
+    // 1️⃣ Estadísticas generales de reportes (conteo por estado calculado en SQL)
     statsReportes: async () => {
       try {
-        const reports = await restAPI.getReports();
-        const total = reports.length;
-        const abiertos = reports.filter((r: any) => r.status === "Abierto" || r.status === "ABIERTO").length;
-        const cerrados = reports.filter((r: any) => r.status === "Cerrado" || r.status === "CERRADO").length;
-        const enProceso = reports.filter((r: any) => r.status === "En Proceso" || r.status === "EN_PROCESO").length;
+        const { total, groups } = await restAPI.getReportCounts("state");
+        const countWhere = (names: string[]) =>
+          groups.filter((g) => names.includes(g.name)).reduce((acc, g) => acc + g.count, 0);
+        const abiertos = countWhere(["Abierto", "ABIERTO"]);
+        const cerrados = countWhere(["Cerrado", "CERRADO"]);
+        const enProceso = countWhere(["En Proceso", "EN_PROCESO"]);
 
         return { total, abiertos, cerrados, enProceso };
       } catch (error) {
@@ -99,39 +100,40 @@ export const resolversAnalytics = {
       }
     },
 
-    // 3️⃣ Reportes por categoría
+    // 3️⃣ Reportes por categoría (filtrado en SQL por category_id)
     reportesPorCategoria: async (_: unknown, { categoria }: { categoria: string }) => {
       try {
-        const reports = await restAPI.getReports();
         const categories = await restAPI.getCategories();
         const cat = categories.find((c: any) => c.name.toLowerCase() === categoria.toLowerCase());
         if (!cat) return [];
-        
-        return reports.filter((r: any) => r.category_id === cat.id);
+
+        return await restAPI.getReports({ category_id: Number(cat.id) });
       } catch (error) {
         console.error("Error en reportesPorCategoria:", error);
         return [];
       }
     },
 
-    // 4️⃣ Reportes por estado
+    // 4️⃣ Reportes por estado (filtrado en SQL por state_id)
     reportesPorEstado: async (_: unknown, { estado }: { estado: string }) => {
       try {
-        const reports = await restAPI.getReports();
-        return reports.filter((r: any) => 
-          r.status?.toLowerCase() === estado.toLowerCase()
-        );
+        const states = await restAPI.getStates();
+        const st = states.find((s: any) => s.name.toLowerCase() === estado.toLowerCase());
+        if (!st) return [];
+
+        return await restAPI.getReports({ state_id: Number(st.id) });
       } catch (error) {
         console.error("Error en reportesPorEstado:", error);
         return [];
       }
     },
 
-    // 5️⃣ Reportes por usuario
+    // 5️⃣ Reportes por usuario (filtrado en SQL por user_id)
     reportesPorUsuario: async (_: unknown, { usuario }: { usuario: string }) => {
       try {
-        const reports = await restAPI.getReports();
-        return reports.filter((r: any) => String(r.user_id) === usuario);
+        const userId = Number(usuario);
+        if (!Number.isInteger(userId)) return [];
+        return await restAPI.getReports({ user_id: userId });
       } catch (error) {
         console.error("Error en reportesPorUsuario:", error);
         return [];
@@ -169,36 +171,22 @@ export const resolversAnalytics = {
       }
     },
 
-    // 7️⃣ Top áreas con más reportes
+    // 7️⃣ Top áreas con más reportes (GROUP BY id_area en SQL)
     topAreas: async (_: unknown, { limit = 5 }: { limit?: number }) => {
       try {
-        const reports = await restAPI.getReports();
-        const areaCount: Record<string, number> = {};
-        
-        reports.forEach((r: any) => {
-          const area = r.location || "Sin área";
-          areaCount[area] = (areaCount[area] || 0) + 1;
-        });
-        
-        const sorted = Object.entries(areaCount)
-          .map(([area, cantidad]) => ({ area, cantidad }))
-          .sort((a, b) => b.cantidad - a.cantidad);
-        
-        return sorted.slice(0, limit);
+        const { groups } = await restAPI.getReportCounts("area");
+        return groups.slice(0, limit).map((g) => ({ area: g.name, cantidad: g.count }));
       } catch (error) {
         console.error("Error en topAreas:", error);
         return [];
       }
     },
 
-    // 8️⃣ Promedio de puntuaciones
+    // 8️⃣ Promedio de puntuaciones (AVG en SQL)
     promedioPuntuaciones: async () => {
       try {
-        const ratings = await restAPI.getRatings();
-        if (ratings.length === 0) return 0;
-        
-        const sum = ratings.reduce((acc: number, r: any) => acc + (r.value || 0), 0);
-        return sum / ratings.length;
+        const summary = await restAPI.getRatingsSummary();
+        return summary.average ?? 0;
       } catch (error) {
         console.error("Error en promedioPuntuaciones:", error);
         return 0;
@@ -226,45 +214,21 @@ export const resolversAnalytics = {
       }
     },
 
-    // 🔟 Reportes por rango de fechas
+    // 🔟 Reportes por rango de fechas (filtrado en SQL por creado_en)
     reportesPorFecha: async (_: unknown, { desde, hasta }: { desde: string; hasta: string }) => {
       try {
-        const reports = await restAPI.getReports();
-        const start = new Date(desde);
-        const end = new Date(hasta);
-        
-        return reports.filter((r: any) => {
-          const created = new Date(r.created_at);
-          return created >= start && created <= end;
-        });
+        return await restAPI.getReports({ created_from: desde, created_to: hasta });
       } catch (error) {
         console.error("Error en reportesPorFecha:", error);
         return [];
       }
     },
 
-    // 1️⃣1️⃣ Usuarios más activos
+    // 1️⃣1️⃣ Usuarios más activos (top-N por cantidad de reportes, calculado en SQL)
     usuariosMasActivos: async (_: unknown, { limit = 5 }: { limit?: number }) => {
       try {
-        const reports = await restAPI.getReports();
-        const users = await restAPI.getUsers();
-        const userCount: Record<string, number> = {};
-        
-        reports.forEach((r: any) => {
-          const userId = String(r.user_id || 0);
-          userCount[userId] = (userCount[userId] || 0) + 1;
-        });
-        
-        const result = Object.entries(userCount).map(([userId, cantidad]) => {
-          const user = users.find((u: any) => String(u.id) === userId);
-          return {
-            clave: user?.name || `Usuario #${userId}`,
-            valor: cantidad,
-          };
-        });
-        
-        result.sort((a, b) => b.valor - a.valor);
-        return result.slice(0, limit);
+        const top = await restAPI.getTopUsers(limit);
+        return top.map((u) => ({ clave: u.name, valor: u.count }));
       } catch (error) {
         console.error("Error en usuariosMasActivos:", error);
         return [];
@@ -274,11 +238,12 @@ export const resolversAnalytics = {
     // Alias en inglés: mapea a la misma lógica que statsReportes
     reportsAnalytics: async () => {
       try {
-        const reports = await restAPI.getReports();
-        const total = reports.length;
-        const abiertos = reports.filter((r: any) => (r.status || '').toLowerCase() === 'abierto' || (r.status || '').toLowerCase() === 'abiertos').length;
-        const cerrados = reports.filter((r: any) => (r.status || '').toLowerCase() === 'cerrado' || (r.status || '').toLowerCase() === 'cerrados').length;
-        const enProceso = reports.filter((r: any) => (r.status || '').toLowerCase().includes('proceso')).length;
+        const { total, groups } = await restAPI.getReportCounts("state");
+        const countWhere = (match: (name: string) => boolean) =>
+          groups.filter((g) => match((g.name || '').toLowerCase())).reduce((acc, g) => acc + g.count, 0);
+        const abiertos = countWhere((n) => n === 'abierto' || n === 'abiertos');
+        const cerrados = countWhere((n) => n === 'cerrado' || n === 'cerrados');
+        const enProceso = countWhere((n) => n.includes('proceso'));
         const byStatus = [
           { clave: 'Abierto', valor: abiertos },
           { clave: 'En Proceso', valor: enProceso },
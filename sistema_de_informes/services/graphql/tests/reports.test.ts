@@ -2,6 +2,7 @@ import { describe, it, expect, beforeAll, afterAll, vi } from 'vitest';
 import { ApolloServer } from '@apollo/server';
 import { typeDefs } from '../src/schema';
 import { resolvers } from '../src/resolvers/reportes';
+import { RestDataSource } from '../src/datasources/rest';
 
 let server: ApolloServer;
 
@@ -69,4 +70,24 @@ describe('GraphQL reports (Semana 6)', () => {
     const abierto = data.reportsAnalytics.byStatus.find((k: any) => k.clave === 'Abierto');
     expect(abierto.valor).toBe(2);
   });
+
+  it('getReports filters the /reportes fallback when /api/v1/reports fails', async () => {
+    const raw = [
+      { id_reporte: 1, titulo: 'A', id_estado: 1, id_categoria: 2, creado_en: '2025-10-19T00:00:00Z' },
+      { id_reporte: 2, titulo: 'B', id_estado: 2, id_categoria: 2, creado_en: '2025-10-20T00:00:00Z' },
+      { id_reporte: 3, titulo: 'C', id_estado: 1, id_categoria: 3, creado_en: '2025-10-21T00:00:00Z' },
+    ];
+    const fetchMock = vi.fn(async (url: string) =>
+      url.includes('/api/v1/reports')
+        ? ({ ok: false, status: 503, statusText: 'Service Unavailable' } as any)
+        : ({ ok: true, json: async () => raw } as any)
+    );
+    // @ts-ignore
+    global.fetch = fetchMock;
+
+    const rest = new RestDataSource('http://rest');
+    expect((await rest.getReports({ state_id: 1 })).map((r) => r.id)).toEqual([3, 1]);
+    expect((await rest.getReports({ category_id: 2, sort: 'created_at' })).map((r) => r.id)).toEqual([1, 2]);
+    expect((await rest.getReports({ created_from: '2025-10-20T00:00:00Z' })).map((r) => r.id)).toEqual([3, 2]);
+  });
 });
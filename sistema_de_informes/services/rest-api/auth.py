@@ -10,6 +10,7 @@ from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
 from db import get_db
+from deps import invalidate_principal
 from entities.rol import Rol
 from entities.usuario import Usuario
 from schemas.schemas import LoginIn, TokenOut, UsuarioCreate
@@ -38,6 +39,7 @@ def _sync_local_user(db: Session, nombre: str, email: str, id_rol: Optional[int]
         if id_rol is not None and existing.id_rol != id_rol:
             existing.id_rol = id_rol
         db.commit()
+        invalidate_principal(id_usuario=existing.id_usuario)
         return
 
     dummy_password = pwd_context.hash(secrets.token_hex(16))
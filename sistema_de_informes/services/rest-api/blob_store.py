@@ -0,0 +1,329 @@
+"""
+Almacén local de archivos direccionado por contenido.
+
+Cada archivo se guarda una sola vez bajo su SHA-256:
+
+    <BLOB_STORE_DIR>/sha256/ab/cd/<sha256>
+
+Subir el mismo archivo a otro reporte no ocupa espacio extra: sólo se crea
+otra fila en `archivos_adjuntos` apuntando al mismo blob. Las subidas por
+partes se acumulan en `<BLOB_STORE_DIR>/uploads/<id_carga>` y al completarse
+se mueven (rename atómico) al almacén. `UploadSweeper` borra periódicamente
+las subidas abandonadas (fila en `cargas_archivo` y archivo parcial) y los
+temporales huérfanos.
+
+Quien crea o suelta una referencia a un blob toma antes `lock_blobs` sobre
+su sha y lo mantiene hasta el commit: así `release_unused` nunca borra un
+archivo al que otra transacción le está agregando un adjunto o variante.
+
+`RangeFileResponse` sirve el blob con soporte de `Range` (un rango) y usa la
+extensión ASGI de envío sin copia (`http.response.zerocopysend` /
+`pathsend`) cuando el servidor la ofrece.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+import anyio
+import anyio.to_thread
+from sqlalchemy import or_, text
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+_here = os.path.dirname(os.path.abspath(__file__))
+_default_dir = os.path.normpath(os.path.join(_here, "..", "..", "db", "blobs"))
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", _default_dir)
+BLOB_MAX_BYTES = int(os.getenv("BLOB_MAX_BYTES", str(100 * 1024 * 1024)))
+# Tamaño sugerido de cada parte en las subidas por partes
+BLOB_CHUNK_SIZE = int(os.getenv("BLOB_CHUNK_SIZE", str(5 * 1024 * 1024)))
+# Reserva de escritura de una parte (se renueva mientras llegan bytes)
+BLOB_UPLOAD_LEASE_SECONDS = int(os.getenv("BLOB_UPLOAD_LEASE_SECONDS", "120"))
+# Una subida sin actividad durante este tiempo se considera abandonada
+BLOB_UPLOAD_TTL_SECONDS = int(os.getenv("BLOB_UPLOAD_TTL_SECONDS", str(24 * 3600)))
+BLOB_SWEEP_SECONDS = float(os.getenv("BLOB_SWEEP_SECONDS", "3600"))
+
+_SHA_RE = re.compile(r"^[0-9a-f]{64}$")
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def blob_path(sha: str) -> str:
+    if not _SHA_RE.match(sha):
+        raise ValueError("sha256 inválido")
+    return os.path.join(BLOB_STORE_DIR, "sha256", sha[:2], sha[2:4], sha)
+
+
+def uploads_dir() -> str:
+    return os.path.join(BLOB_STORE_DIR, "uploads")
+
+
+def upload_path(id_carga: str) -> str:
+    return os.path.join(uploads_dir(), id_carga)
+
+
+def scratch_dir() -> str:
+    """Directorio temporal en el mismo sistema de archivos que el almacén (para `put_file`)."""
+    path = os.path.join(BLOB_STORE_DIR, "tmp")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def exists(sha: str) -> bool:
+    return os.path.isfile(blob_path(sha))
+
+
+def start_upload(id_carga: str) -> None:
+    path = upload_path(id_carga)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+
+
+def resume_upload(id_carga: str, offset: int) -> None:
+    """Recorta el archivo parcial al último offset confirmado (FileNotFoundError si ya no existe)."""
+    os.truncate(upload_path(id_carga), offset)
+
+
+def discard_upload(id_carga: str) -> None:
+    try:
+        os.unlink(upload_path(id_carga))
+    except OSError:
+        pass
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        while chunk := fh.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def put_file(path: str, sha: Optional[str] = None) -> tuple[str, bool]:
+    """Mueve `path` al almacén (mismo sistema de archivos). Devuelve (sha256, ya_existía).
+
+    Si se pasa `sha` (ya calculado con `file_sha256`) no se vuelve a leer el archivo.
+    """
+    sha = sha or file_sha256(path)
+    destino = blob_path(sha)
+    if os.path.isfile(destino):
+        os.unlink(path)  # deduplicado: el contenido ya estaba guardado
+        return sha, True
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    os.replace(path, destino)
+    return sha, False
+
+
+def commit_upload(id_carga: str, sha: Optional[str] = None) -> tuple[str, bool]:
+    """Mueve la subida completa al almacén. Devuelve (sha256, ya_existía)."""
+    return put_file(upload_path(id_carga), sha)
+
+
+def delete(sha: str) -> None:
+    try:
+        os.unlink(blob_path(sha))
+    except OSError:
+        pass
+
+
+def lock_blobs(session, shas) -> None:
+    """Bloquea los blobs hasta el fin de la transacción de `session`.
+
+    En Postgres es un advisory lock por sha (en orden, para no cruzarse); en
+    otros dialectos (SQLite) se toma el lock de escritura de la base.
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        for sha in sorted(shas):
+            session.execute(text("SELECT pg_advisory_xact_lock(hashtextextended(:sha, 0))"), {"sha": sha})
+    elif shas:
+        session.execute(text("UPDATE cargas_archivo SET id_carga = id_carga WHERE 1 = 0"))
+
+
+def _referenced(session, sha: str) -> bool:
+    from entities.contenido_archivo import ContenidoArchivo
+    from entities.variante_archivo import VarianteArchivo
+
+    if session.query(ContenidoArchivo.id_archivo).filter(ContenidoArchivo.sha256 == sha).first():
+        return True
+    return session.query(VarianteArchivo.id_archivo).filter(VarianteArchivo.sha256 == sha).first() is not None
+
+
+def release_unused(db, shas: set[str]) -> None:
+    """Borra del disco los blobs que ya no referencia ningún adjunto ni variante (llamar después del commit).
+
+    Cada sha se vuelve a comprobar y se borra con su lock tomado, de modo que
+    una deduplicación concurrente o llega antes (y el blob se conserva) o ve
+    que ya no existe y sube el contenido de nuevo.
+    """
+    for sha in shas:
+        lock_blobs(db, {sha})
+        try:
+            if not _referenced(db, sha):
+                delete(sha)
+        finally:
+            db.commit()
+
+
+def purge_stale_uploads() -> int:
+    """Borra las subidas sin actividad desde hace BLOB_UPLOAD_TTL_SECONDS y los temporales huérfanos.
+
+    Devuelve cuántas subidas se borraron. Una subida con una escritura en
+    curso (reserva vigente) no se toca.
+    """
+    from db import SessionLocal
+    from entities.carga_archivo import CargaArchivo
+
+    now = datetime.utcnow()
+    limite = now - timedelta(seconds=BLOB_UPLOAD_TTL_SECONDS)
+    borradas = []
+    with SessionLocal() as session:
+        abandonada = (
+            CargaArchivo.actualizado_en < limite,
+            or_(CargaArchivo.escribiendo_hasta.is_(None), CargaArchivo.escribiendo_hasta < now),
+        )
+        for (id_carga,) in session.query(CargaArchivo.id_carga).filter(*abandonada).all():
+            # Se vuelve a evaluar la condición al borrar: un PUT pudo reactivarla
+            if session.query(CargaArchivo).filter(CargaArchivo.id_carga == id_carga, *abandonada).delete():
+                borradas.append(id_carga)
+        session.commit()
+        vigentes = {id_carga for (id_carga,) in session.query(CargaArchivo.id_carga)}
+    for id_carga in borradas:
+        discard_upload(id_carga)
+
+    # Parciales sin fila y temporales (miniaturas) que quedaron de un proceso caído
+    corte = time.time() - BLOB_UPLOAD_TTL_SECONDS
+    for directorio, conservar in ((uploads_dir(), vigentes), (scratch_dir(), set())):
+        if not os.path.isdir(directorio):
+            continue
+        for entry in os.scandir(directorio):
+            if entry.name in conservar or entry.stat().st_mtime >= corte:
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+    return len(borradas)
+
+
+class UploadSweeper:
+    """Ejecuta `purge_stale_uploads` cada BLOB_SWEEP_SECONDS en segundo plano."""
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await run_in_threadpool(purge_stale_uploads)
+            except Exception as e:
+                print(f"❌ Error limpiando subidas abandonadas: {e}")
+            await asyncio.sleep(BLOB_SWEEP_SECONDS)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """Rango único `bytes=a-b` -> (inicio, fin inclusivo). None = archivo completo.
+
+    Levanta ValueError si el rango no es satisfacible (416).
+    """
+    if not header:
+        return None
+    m = _RANGE_RE.match(header.strip())
+    if not m:
+        return None  # varios rangos o sintaxis desconocida: se ignora y se envía completo
+    desde, hasta = m.groups()
+    if desde == "" and hasta == "":
+        return None
+    if desde == "":
+        largo = int(hasta)
+        if largo == 0:
+            raise ValueError("rango vacío")
+        return max(0, size - largo), size - 1
+    inicio = int(desde)
+    fin = min(int(hasta), size - 1) if hasta else size - 1
+    if inicio >= size or fin < inicio:
+        raise ValueError("rango fuera del archivo")
+    return inicio, fin
+
+
+class RangeFileResponse(FileResponse):
+    """FileResponse con `Range` de un solo tramo y envío sin copia si el servidor lo soporta."""
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: str, range_header: Optional[str] = None, **kwargs) -> None:
+        stat_result = os.stat(path)
+        super().__init__(path, stat_result=stat_result, **kwargs)
+        self.headers["accept-ranges"] = "bytes"
+        self.range: Optional[tuple[int, int]] = None
+        size = stat_result.st_size
+        try:
+            self.range = parse_range(range_header, size)
+        except ValueError:
+            self.status_code = 416
+            self.headers["content-range"] = f"bytes */{size}"
+            self.headers["content-length"] = "0"
+            return
+        if self.range is not None:
+            inicio, fin = self.range
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {inicio}-{fin}/{size}"
+            self.headers["content-length"] = str(fin - inicio + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.range is None and self.status_code != 416:
+            await super().__call__(scope, receive, send)
+            return
+        if self.status_code == 416 or scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        inicio, fin = self.range
+        restante = fin - inicio + 1
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            # El servidor lee del archivo al transferir: recibe el objeto archivo
+            # (no un fd suelto), abierto antes del start y cerrado al terminar la respuesta
+            fh = await anyio.to_thread.run_sync(open, self.path, "rb")
+            try:
+                await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": fh,
+                    "offset": inicio,
+                    "count": restante,
+                    "more_body": False,
+                })
+            finally:
+                fh.close()
+            return
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        async with await anyio.open_file(self.path, mode="rb") as fh:
+            await fh.seek(inicio)
+            while restante > 0:
+                chunk = await fh.read(min(self.chunk_size, restante))
+                if not chunk:
+                    break
+                restante -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": restante > 0})
+        if restante > 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
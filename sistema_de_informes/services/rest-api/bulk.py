@@ -0,0 +1,70 @@
+"""
+Utilidades para los endpoints de alta masiva (`POST /<entidad>/bulk`).
+
+Las claves foráneas de todo el lote se validan con una consulta `IN` por
+tabla referenciada (en bloques para no exceder el límite de parámetros de
+SQLite) en lugar de un `.get()` por fila.
+
+También las consultas por lote (`GET /api/v1/<entidad>?ids=1,2,3`, estilo
+DataLoader): un solo `WHERE id IN (...)` y la respuesta en el orden pedido,
+con `null` para los ids que no existen.
+"""
+import os
+from typing import Any, Callable, Iterable, Optional
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "10000"))
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "500"))
+_IN_CHUNK = 500
+
+
+def existing_ids(db: Session, pk_col, ids: Iterable[int]) -> set[int]:
+    buscados = sorted(set(ids))
+    encontrados: set[int] = set()
+    for i in range(0, len(buscados), _IN_CHUNK):
+        chunk = buscados[i:i + _IN_CHUNK]
+        encontrados.update(id_ for (id_,) in db.query(pk_col).filter(pk_col.in_(chunk)))
+    return encontrados
+
+
+def require_existing(db: Session, pk_col, ids: Iterable[int | None], entidad: str) -> None:
+    """400 si alguno de los ids (no nulos) no existe en la tabla de `pk_col`."""
+    buscados = {id_ for id_ in ids if id_ is not None}
+    if not buscados:
+        return
+    faltantes = buscados - existing_ids(db, pk_col, buscados)
+    if faltantes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{entidad} no existe: {sorted(faltantes)[:20]}",
+        )
+
+
+def batch_ids(
+    ids: Optional[str] = Query(default=None, description="Lista de ids separados por coma, p. ej. '1,2,3'"),
+) -> Optional[list[int]]:
+    """Dependencia: parsea `?ids=` conservando orden y repetidos. None si no se envió."""
+    if ids is None:
+        return None
+    try:
+        parsed = [int(p) for p in ids.split(",") if p.strip()]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids debe ser una lista de enteros separados por coma")
+    if len(parsed) > BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Se aceptan como máximo {BATCH_MAX_IDS} ids por consulta"
+        )
+    return parsed
+
+
+def fetch_by_ids(query, pk_col, ids: list[int]) -> dict[int, Any]:
+    """Filas de `query` con `pk_col IN ids` (una sola consulta), indexadas por id."""
+    if not ids:
+        return {}
+    return {getattr(row, pk_col.key): row for row in query.filter(pk_col.in_(set(ids)))}
+
+
+def in_request_order(ids: list[int], encontrados: dict[int, Any], serialize: Callable[[Any], Any] = lambda x: x) -> list:
+    return [serialize(encontrados[i]) if i in encontrados else None for i in ids]
@@ -1,13 +1,16 @@
-from fastapi import Depends, HTTPException, status, Header
+from fastapi import HTTPException, status, Header
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
-from db import get_db
+from db import SessionLocal
 from entities.usuario import Usuario
+from table_versions import current_versions
 import os
 
+import json
 import threading
 import time
-from typing import Optional, Set
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
 
 import httpx
 
@@ -16,16 +19,50 @@ ALGORITHM = os.getenv("JWT_ALG", "HS256")
 
 AUTH_SERVICE_URL = (os.getenv("AUTH_SERVICE_URL") or "http://auth-service:8001").rstrip("/")
 REVOKED_SYNC_SECONDS = int(os.getenv("REVOKED_SYNC_SECONDS", "30"))
+# Cada cuánto se pide el snapshot completo en vez del delta (corrige huecos del cursor)
+REVOKED_FULL_SYNC_SECONDS = int(os.getenv("REVOKED_FULL_SYNC_SECONDS", "600"))
+# Vida asumida para jtis sin `exp` (auth-service antiguo que sólo envía `jtis`)
+REVOKED_DEFAULT_TTL_SECONDS = int(os.getenv("REVOKED_DEFAULT_TTL_SECONDS", "3600"))
+# Stream SSE de auth-service: revocaciones en vivo; el polling queda como respaldo
+REVOKED_STREAM_ENABLED = os.getenv("REVOKED_STREAM_ENABLED", "1").lower() not in ("0", "false", "no")
+# Debe superar el keep-alive del stream (15 s) para detectar conexiones muertas
+REVOKED_STREAM_READ_TIMEOUT = float(os.getenv("REVOKED_STREAM_READ_TIMEOUT", "45"))
 
-_revoked_jtis: Set[str] = set()
+# Caché del usuario autenticado (evita una consulta a `usuarios` por request)
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+# Cada cuánto se consulta la versión de `usuarios` (versiones_tabla): un cambio
+# hecho en cualquier worker descarta el caché de todos en a lo sumo este tiempo
+AUTH_CACHE_VERSION_POLL_SECONDS = float(os.getenv("AUTH_CACHE_VERSION_POLL_SECONDS", "1"))
+
+# jti -> exp (epoch): las entradas se podan cuando el token ya venció
+_revoked_jtis: Dict[str, float] = {}
 _revoked_mu = threading.Lock()
 _revoked_started = False
 
 
-def _set_revoked(jtis: Set[str]) -> None:
+def _parse_revoked(data: dict) -> Dict[str, float]:
+    items = data.get("items")
+    if isinstance(items, list):
+        return {
+            str(it["jti"]): float(it.get("exp") or time.time() + REVOKED_DEFAULT_TTL_SECONDS)
+            for it in items
+            if isinstance(it, dict) and isinstance(it.get("jti"), str) and it["jti"]
+        }
+    jtis = data.get("jtis")
+    if isinstance(jtis, list):
+        exp = time.time() + REVOKED_DEFAULT_TTL_SECONDS
+        return {str(x): exp for x in jtis if isinstance(x, str) and x}
+    return {}
+
+
+def _apply_revoked(revoked: Dict[str, float], full: bool) -> None:
+    """Reemplaza (snapshot) o agrega (delta) revocaciones y poda las vencidas."""
     global _revoked_jtis
+    now = time.time()
     with _revoked_mu:
-        _revoked_jtis = set(jtis)
+        merged = dict(revoked) if full else {**_revoked_jtis, **revoked}
+        _revoked_jtis = {jti: exp for jti, exp in merged.items() if exp > now}
 
 
 def is_revoked(jti: Optional[str]) -> bool:
@@ -35,10 +72,77 @@ def is_revoked(jti: Optional[str]) -> bool:
         return jti in _revoked_jtis
 
 
+def sync_revoked(client: httpx.Client, cursor: Optional[int]) -> Optional[int]:
+    """Una ronda de sincronización: delta desde `cursor` o snapshot si es None.
+
+    Devuelve el cursor para la siguiente ronda (None si auth-service no lo soporta).
+    """
+    params = {"since": cursor} if cursor is not None else None
+    r = client.get(f"{AUTH_SERVICE_URL}/auth/revoked", params=params)
+    r.raise_for_status()
+    data = r.json() if r.content else {}
+    _apply_revoked(_parse_revoked(data), full=cursor is None)
+    next_cursor = data.get("cursor")
+    return int(next_cursor) if isinstance(next_cursor, int) else None
+
+
+class _RevokedSync:
+    """Estado del polling: cursor del último delta e instante del último snapshot."""
+
+    def __init__(self) -> None:
+        self.cursor: Optional[int] = None
+        self.last_full = 0.0
+
+    def poll(self, client: httpx.Client) -> None:
+        full = self.cursor is None or time.monotonic() - self.last_full >= REVOKED_FULL_SYNC_SECONDS
+        self.cursor = sync_revoked(client, None if full else self.cursor)
+        if full:
+            self.last_full = time.monotonic()
+
+    def full_due(self) -> bool:
+        return time.monotonic() - self.last_full >= REVOKED_FULL_SYNC_SECONDS
+
+
+def _apply_revoked_event(data: str) -> None:
+    try:
+        event = json.loads(data)
+    except ValueError:
+        return
+    # Los refresh tokens sólo los valida auth-service
+    if not isinstance(event, dict) or event.get("type", "access") != "access":
+        return
+    jti = event.get("jti")
+    if isinstance(jti, str) and jti:
+        exp = float(event.get("exp") or time.time() + REVOKED_DEFAULT_TTL_SECONDS)
+        _apply_revoked({jti: exp}, full=False)
+
+
+def consume_revoked_stream(client: httpx.Client, state: _RevokedSync) -> None:
+    """Escucha `/auth/revoked/stream` hasta que la conexión se corta.
+
+    Tras suscribirse se hace un polling para cubrir lo revocado mientras no
+    había conexión; los eventos no mueven el cursor, así un reconectado vuelve
+    a pedir el delta desde el último polling.
+    """
+    timeout = httpx.Timeout(5.0, read=REVOKED_STREAM_READ_TIMEOUT)
+    with client.stream("GET", f"{AUTH_SERVICE_URL}/auth/revoked/stream", timeout=timeout) as r:
+        r.raise_for_status()
+        state.poll(client)
+        for line in r.iter_lines():
+            if line.startswith("data:"):
+                _apply_revoked_event(line[5:].strip())
+            elif state.full_due():
+                # Llega con los keep-alive: snapshot periódico sin abrir otro hilo
+                state.poll(client)
+
+
 def start_revoked_sync() -> None:
-    """Sincroniza blacklist desde auth-service cada N segundos.
+    """Sincroniza blacklist desde auth-service.
 
     Cumple: validación local (sin consultar auth-service en cada request).
+    Las revocaciones llegan por el stream SSE; si se corta (o está desactivado)
+    se vuelve al polling incremental (`?since=`) mientras se reintenta la
+    conexión, con un snapshot completo cada REVOKED_FULL_SYNC_SECONDS.
     """
 
     global _revoked_started
@@ -47,25 +151,126 @@ def start_revoked_sync() -> None:
     _revoked_started = True
 
     def loop() -> None:
-        while True:
-            try:
-                with httpx.Client(timeout=5.0) as client:
-                    r = client.get(f"{AUTH_SERVICE_URL}/auth/revoked")
-                    if r.status_code < 400:
-                        data = r.json() if r.content else {}
-                        jtis = data.get("jtis")
-                        if isinstance(jtis, list):
-                            cleaned = {str(x) for x in jtis if isinstance(x, str) and x}
-                            _set_revoked(cleaned)
-            except Exception:
-                # Silencioso: no bloquea la app si auth-service cae
-                pass
-            time.sleep(max(5, REVOKED_SYNC_SECONDS))
+        state = _RevokedSync()
+        backoff = 1.0
+        with httpx.Client(timeout=5.0) as client:
+            while True:
+                if REVOKED_STREAM_ENABLED:
+                    connected_at = time.monotonic()
+                    try:
+                        consume_revoked_stream(client, state)
+                    except Exception:
+                        pass
+                    # Una conexión que duró reinicia el backoff de reconexión
+                    if time.monotonic() - connected_at > REVOKED_STREAM_READ_TIMEOUT:
+                        backoff = 1.0
+                try:
+                    state.poll(client)
+                except Exception:
+                    # Silencioso: no bloquea la app si auth-service cae
+                    pass
+                if REVOKED_STREAM_ENABLED:
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, max(5, REVOKED_SYNC_SECONDS))
+                else:
+                    time.sleep(max(5, REVOKED_SYNC_SECONDS))
 
     t = threading.Thread(target=loop, daemon=True)
     t.start()
 
-def Auth(authorization: str | None = Header(None), dep_db: Session = Depends(get_db)) -> Usuario:
+
+@dataclass(frozen=True)
+class Principal:
+    """Usuario autenticado resuelto desde el token (lo que usan los routers)."""
+    id_usuario: int
+    email: str
+    nombre: str
+    id_rol: Optional[int]
+    estado: str
+
+
+# clave (jti o email/sub) -> (principal, expira_en [epoch], versión de `usuarios` al cargarlo)
+_principals: "OrderedDict[str, tuple[Principal, float, int]]" = OrderedDict()
+_principals_mu = threading.Lock()
+# (versión de `usuarios`, instante de la consulta [monotonic])
+_users_version: tuple[int, float] = (0, float("-inf"))
+
+
+def _current_users_version() -> int:
+    """Versión de `usuarios` en el primario, consultada a lo sumo cada AUTH_CACHE_VERSION_POLL_SECONDS."""
+    global _users_version
+    now = time.monotonic()
+    with _principals_mu:
+        version, leida = _users_version
+    if now - leida < AUTH_CACHE_VERSION_POLL_SECONDS:
+        return version
+    version = current_versions(("usuarios",), SessionLocal).get("usuarios", 0)
+    with _principals_mu:
+        _users_version = (version, now)
+    return version
+
+
+def _cache_get(key: str, version: int) -> Optional[Principal]:
+    with _principals_mu:
+        entry = _principals.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time() or entry[2] != version:
+            del _principals[key]
+            return None
+        _principals.move_to_end(key)
+        return entry[0]
+
+
+def _cache_put(key: str, principal: Principal, token_exp: Optional[float], version: int) -> None:
+    # Nunca más allá del vencimiento del token
+    expira = time.time() + AUTH_CACHE_TTL_SECONDS
+    if token_exp:
+        expira = min(expira, float(token_exp))
+    with _principals_mu:
+        _principals[key] = (principal, expira, version)
+        _principals.move_to_end(key)
+        while len(_principals) > AUTH_CACHE_MAX_ENTRIES:
+            _principals.popitem(last=False)
+
+
+def invalidate_principal(id_usuario: Optional[int] = None, email: Optional[str] = None) -> None:
+    """Descarta de inmediato las entradas de un usuario en este proceso (llamar tras actualizarlo o eliminarlo).
+
+    Los demás workers lo notan por la versión de `usuarios`.
+    """
+    with _principals_mu:
+        for key in [
+            k for k, (p, _, _) in _principals.items()
+            if p.id_usuario == id_usuario or (email is not None and p.email == email)
+        ]:
+            del _principals[key]
+
+
+def _load_principal(payload: dict) -> Optional[Principal]:
+    # Pilar 1: validación local por firma/exp.
+    # Nota: el Auth Service emite `sub` como id de su propia DB, por lo que aquí
+    # buscamos al usuario local por `email` (claim) cuando esté presente.
+    email = payload.get("email")
+    with SessionLocal() as db:
+        user = None
+        if isinstance(email, str) and email:
+            user = db.query(Usuario).filter(Usuario.email == email).first()
+        if not user:
+            uid = int(payload.get("sub", 0) or 0)
+            user = db.get(Usuario, uid) if uid else None
+        if not user:
+            return None
+        return Principal(
+            id_usuario=user.id_usuario,
+            email=user.email,
+            nombre=user.nombre,
+            id_rol=user.id_rol,
+            estado=user.estado,
+        )
+
+
+def Auth(authorization: str | None = Header(None)) -> Principal:
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Falta token Bearer")
     token = authorization.split(" ", 1)[1]
@@ -78,16 +283,17 @@ def Auth(authorization: str | None = Header(None), dep_db: Session = Depends(get
     jti = payload.get("jti")
     if isinstance(jti, str) and is_revoked(jti):
         raise HTTPException(status_code=401, detail="Token revocado")
-    # Pilar 1: validación local por firma/exp.
-    # Nota: el Auth Service emite `sub` como id de su propia DB, por lo que aquí
-    # buscamos al usuario local por `email` (claim) cuando esté presente.
-    email = payload.get("email")
-    user = None
-    if isinstance(email, str) and email:
-        user = dep_db.query(Usuario).filter(Usuario.email == email).first()
-    if not user:
-        uid = int(payload.get("sub", 0) or 0)
-        user = dep_db.query(Usuario).get(uid) if uid else None
-    if not user:
-        raise HTTPException(status_code=401, detail="Usuario no encontrado")
-    return user
+
+    if isinstance(jti, str) and jti:
+        key = f"jti:{jti}"
+    else:
+        key = f"email:{payload.get('email')}|sub:{payload.get('sub')}"
+    # La versión se lee antes que el usuario: una entrada nunca es más vieja que su versión
+    version = _current_users_version()
+    principal = _cache_get(key, version)
+    if principal is None:
+        principal = _load_principal(payload)
+        if principal is None:
+            raise HTTPException(status_code=401, detail="Usuario no encontrado")
+        _cache_put(key, principal, payload.get("exp"), version)
+    return principal
@@ -11,3 +11,32 @@ class ArchivoAdjunto(Base):
     url: Mapped[str] = mapped_column(String, nullable=False)
 
     reporte = relationship("Reporte", back_populates="archivos")
+    # Sólo los adjuntos subidos al almacén local; los que son una URL externa no tienen contenido
+    contenido = relationship("ContenidoArchivo", uselist=False, lazy="selectin", cascade="all, delete-orphan")
+    # Miniaturas generadas en segundo plano (thumbnails.ThumbnailWorker)
+    variantes_archivo = relationship("VarianteArchivo", lazy="selectin", cascade="all, delete-orphan")
+    trabajo_miniatura = relationship("TrabajoMiniatura", uselist=False, cascade="all, delete-orphan")
+
+    @property
+    def sha256(self) -> str | None:
+        return self.contenido.sha256 if self.contenido else None
+
+    @property
+    def tamano(self) -> int | None:
+        return self.contenido.tamano if self.contenido else None
+
+    @property
+    def variantes(self) -> dict[str, str]:
+        """URLs de las variantes ya generadas, p. ej. {"thumb": "/archivos/1/contenido?variante=thumb"}."""
+        return {
+            v.nombre: f"/archivos/{self.id_archivo}/contenido?variante={v.nombre}"
+            for v in self.variantes_archivo
+        }
+
+    @property
+    def blob_shas(self) -> set[str]:
+        """Blobs que usa el adjunto (original y variantes), para liberarlos al borrarlo."""
+        shas = {v.sha256 for v in self.variantes_archivo}
+        if self.contenido:
+            shas.add(self.contenido.sha256)
+        return shas
@@ -0,0 +1,25 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, BigInteger, String, DateTime, ForeignKey
+from datetime import datetime
+from db import Base
+
+class CargaArchivo(Base):
+    """Subida por partes en curso; los bytes recibidos viven en blob_store.upload_path(id_carga).
+
+    `recibido` es el offset confirmado (la verdad, no el tamaño del archivo
+    parcial). `escribiendo_hasta` es la reserva de quien está escribiendo una
+    parte: serializa los PUT aunque lleguen a workers distintos. `sha256` es
+    el hash declarado por el cliente: se compara con el de los bytes subidos.
+    """
+    __tablename__ = "cargas_archivo"
+    id_carga: Mapped[str] = mapped_column(String(32), primary_key=True)
+    id_reporte: Mapped[int] = mapped_column(Integer, ForeignKey("reportes.id_reporte", ondelete="CASCADE"), nullable=False)
+    id_usuario: Mapped[int] = mapped_column(Integer, ForeignKey("usuarios.id_usuario"), nullable=False)
+    nombre_archivo: Mapped[str] = mapped_column(String, nullable=False)
+    tipo: Mapped[str | None] = mapped_column(String, nullable=True)
+    tamano: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    sha256: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    recibido: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    escribiendo_hasta: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    creado_en: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    actualizado_en: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -1,10 +1,12 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, Text, DateTime, ForeignKey
+from sqlalchemy import Integer, Text, DateTime, ForeignKey, Index
 from datetime import datetime
 from db import Base
 
 class Comentario(Base):
     __tablename__ = "comentarios"
+    # Reindexado de búsqueda y listados por reporte
+    __table_args__ = (Index("idx_comentarios_reporte", "id_reporte"),)
     id_comentario: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     id_usuario: Mapped[int] = mapped_column(Integer, ForeignKey("usuarios.id_usuario"), nullable=False)
     id_reporte: Mapped[int] = mapped_column(Integer, ForeignKey("reportes.id_reporte"), nullable=False)
@@ -0,0 +1,10 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, BigInteger, String, ForeignKey
+from db import Base
+
+class ContenidoArchivo(Base):
+    """Blob local (blob_store) de un adjunto; varios adjuntos pueden compartir el mismo sha256."""
+    __tablename__ = "archivos_contenido"
+    id_archivo: Mapped[int] = mapped_column(Integer, ForeignKey("archivos_adjuntos.id_archivo", ondelete="CASCADE"), primary_key=True)
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False, index=True)
+    tamano: Mapped[int] = mapped_column(BigInteger, nullable=False)
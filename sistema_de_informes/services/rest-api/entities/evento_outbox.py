@@ -0,0 +1,27 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String, Text, DateTime, Index
+from datetime import datetime
+from db import Base
+
+class EventoOutbox(Base):
+    """Evento de dominio pendiente de entrega (WebSocket / n8n).
+
+    Se inserta en la misma transacción que el cambio que lo origina y lo
+    entrega `outbox.OutboxWorker`; `enviado_en` NULL significa pendiente.
+    `fallido_en` marca los que agotaron OUTBOX_MAX_ATTEMPTS (ya no se reintentan).
+    """
+    __tablename__ = "outbox"
+    # Búsqueda de pendientes: WHERE enviado_en IS NULL AND fallido_en IS NULL AND proximo_intento <= now ORDER BY id_evento
+    __table_args__ = (
+        Index("idx_outbox_pendientes", "enviado_en", "fallido_en", "proximo_intento", "id_evento"),
+    )
+    id_evento: Mapped[int] = mapped_column(Integer, primary_key=True)
+    destino: Mapped[str] = mapped_column(String(10), nullable=False)  # "ws" | "n8n"
+    sala: Mapped[str | None] = mapped_column(String(50), nullable=True)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)  # JSON
+    creado_en: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    intentos: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    proximo_intento: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    enviado_en: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    fallido_en: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    ultimo_error: Mapped[str | None] = mapped_column(String(255), nullable=True)
@@ -1,10 +1,18 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Integer, String, Text, DateTime, ForeignKey, Index
 from datetime import datetime
 from db import Base
 
 class Reporte(Base):
     __tablename__ = "reportes"
+    # Índices para filtros del listado y para la paginación por cursor (creado_en, id_reporte)
+    __table_args__ = (
+        Index("idx_reportes_creado_en_id", "creado_en", "id_reporte"),
+        Index("idx_reportes_usuario", "id_usuario"),
+        Index("idx_reportes_estado", "id_estado"),
+        Index("idx_reportes_categoria", "id_categoria"),
+        Index("idx_reportes_area", "id_area"),
+    )
     id_reporte: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     id_usuario: Mapped[int] = mapped_column(Integer, ForeignKey("usuarios.id_usuario"), nullable=False)
     titulo: Mapped[str] = mapped_column(String, nullable=False)
@@ -22,3 +30,4 @@ class Reporte(Base):
     archivos = relationship("ArchivoAdjunto", back_populates="reporte", cascade="all, delete")
     comentarios = relationship("Comentario", back_populates="reporte", cascade="all, delete")
     puntuaciones = relationship("Puntuacion", back_populates="reporte", cascade="all, delete")
+    resumen_puntuacion = relationship("ResumenPuntuacion", uselist=False, cascade="all, delete")
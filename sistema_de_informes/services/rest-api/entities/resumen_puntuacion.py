@@ -0,0 +1,16 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, ForeignKey
+from db import Base
+
+class ResumenPuntuacion(Base):
+    """Agregado por reporte mantenido en la misma transacción que `puntuaciones`."""
+    __tablename__ = "report_rating_stats"
+    id_reporte: Mapped[int] = mapped_column(Integer, ForeignKey("reportes.id_reporte", ondelete="CASCADE"), primary_key=True)
+    cantidad: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    suma: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    minimo: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    maximo: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    @property
+    def promedio(self) -> float | None:
+        return round(self.suma / self.cantidad, 4) if self.cantidad else None
@@ -0,0 +1,22 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String, DateTime, ForeignKey, Index
+from datetime import datetime
+from db import Base
+
+class TrabajoMiniatura(Base):
+    """Generación pendiente de variantes de una imagen adjunta.
+
+    Se inserta en la misma transacción que el adjunto y lo procesa
+    `thumbnails.ThumbnailWorker`; `terminado_en` NULL significa pendiente.
+    """
+    __tablename__ = "trabajos_miniaturas"
+    __table_args__ = (
+        Index("idx_trabajos_miniaturas_pendientes", "terminado_en", "proximo_intento", "id_trabajo"),
+    )
+    id_trabajo: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id_archivo: Mapped[int] = mapped_column(Integer, ForeignKey("archivos_adjuntos.id_archivo", ondelete="CASCADE"), nullable=False, unique=True)
+    creado_en: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    intentos: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    proximo_intento: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    terminado_en: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    ultimo_error: Mapped[str | None] = mapped_column(String(255), nullable=True)
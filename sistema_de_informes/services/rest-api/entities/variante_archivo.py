@@ -0,0 +1,14 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, BigInteger, String, ForeignKey
+from db import Base
+
+class VarianteArchivo(Base):
+    """Versión reducida de un adjunto de imagen ("thumb", "web"), guardada en blob_store."""
+    __tablename__ = "archivos_variantes"
+    id_archivo: Mapped[int] = mapped_column(Integer, ForeignKey("archivos_adjuntos.id_archivo", ondelete="CASCADE"), primary_key=True)
+    nombre: Mapped[str] = mapped_column(String(20), primary_key=True)
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False, index=True)
+    tamano: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    ancho: Mapped[int] = mapped_column(Integer, nullable=False)
+    alto: Mapped[int] = mapped_column(Integer, nullable=False)
+    tipo: Mapped[str] = mapped_column(String(50), nullable=False)
@@ -0,0 +1,9 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String
+from db import Base
+
+class VersionTabla(Base):
+    """Contador de cambios por tabla; base de los ETag de /api/v1."""
+    __tablename__ = "versiones_tabla"
+    tabla: Mapped[str] = mapped_column(String, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
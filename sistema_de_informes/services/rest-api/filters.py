@@ -0,0 +1,70 @@
+"""
+Filtros y orden del lado del servidor para el listado de reportes.
+
+Se declaran como dependencia de FastAPI (`Depends(report_filters)`) para que
+todos los endpoints que listan reportes acepten exactamente los mismos
+parámetros y los traduzcan a SQL sobre columnas indexadas.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Query
+
+from entities.reporte import Reporte
+
+
+@dataclass
+class ReportFilters:
+    state_id: Optional[int] = None
+    category_id: Optional[int] = None
+    area_id: Optional[int] = None
+    user_id: Optional[int] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+    sort: str = "-created_at"  # "-" indica descendente
+
+    @property
+    def descending(self) -> bool:
+        return self.sort.startswith("-")
+
+    def apply(self, query):
+        """Agrega las condiciones WHERE (sin ORDER BY) a una consulta sobre Reporte."""
+        if self.state_id is not None:
+            query = query.filter(Reporte.id_estado == self.state_id)
+        if self.category_id is not None:
+            query = query.filter(Reporte.id_categoria == self.category_id)
+        if self.area_id is not None:
+            query = query.filter(Reporte.id_area == self.area_id)
+        if self.user_id is not None:
+            query = query.filter(Reporte.id_usuario == self.user_id)
+        if self.created_from is not None:
+            query = query.filter(Reporte.creado_en >= self.created_from)
+        if self.created_to is not None:
+            query = query.filter(Reporte.creado_en <= self.created_to)
+        return query
+
+    def order(self, query):
+        if self.descending:
+            return query.order_by(Reporte.creado_en.desc(), Reporte.id_reporte.desc())
+        return query.order_by(Reporte.creado_en.asc(), Reporte.id_reporte.asc())
+
+
+def report_filters(
+    state_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    area_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    created_from: Optional[datetime] = Query(default=None, description="creado_en >= (ISO 8601)"),
+    created_to: Optional[datetime] = Query(default=None, description="creado_en <= (ISO 8601)"),
+    sort: str = Query(default="-created_at", pattern="^-?created_at$"),
+) -> ReportFilters:
+    return ReportFilters(
+        state_id=state_id,
+        category_id=category_id,
+        area_id=area_id,
+        user_id=user_id,
+        created_from=created_from,
+        created_to=created_to,
+        sort=sort,
+    )
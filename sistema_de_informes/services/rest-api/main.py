@@ -1,8 +1,15 @@
+import asyncio
+import csv
+import io
 from datetime import datetime
-from typing import Any, List
-from fastapi import FastAPI
+from typing import Any, Iterator, Optional
+from fastapi import Depends, FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from db import Base, engine, SessionLocal
+from fastapi.responses import StreamingResponse
+from sqlalchemy import literal
+from sqlalchemy.orm import selectinload
+import orjson
+from db import Base, engine, ReadRoutingMiddleware, ReadSessionLocal
 from auth import router as auth_router
 from routers.usuario import router as usuarios_router
 from routers.rol import router as roles_router
@@ -16,6 +23,7 @@ from routers.puntuacion import router as puntuaciones_router
 from routers.etiqueta import router as etiquetas_router
 from routers.pdf import router as pdf_router
 from routers.integrations import router as integrations_router
+from routers.analytics import router as analytics_router
 from entities.reporte import Reporte
 from entities.estado_reporte import EstadoReporte
 from entities.categoria import Categoria
@@ -26,7 +34,26 @@ from entities.comentario import Comentario
 from entities.puntuacion import Puntuacion
 from entities.archivo_adjunto import ArchivoAdjunto
 from entities.etiqueta import Etiqueta
+from entities.resumen_puntuacion import ResumenPuntuacion  # noqa: F401 (tabla report_rating_stats)
+from entities.evento_outbox import EventoOutbox  # noqa: F401 (tabla outbox)
+from entities.contenido_archivo import ContenidoArchivo  # noqa: F401 (tabla archivos_contenido)
+from entities.carga_archivo import CargaArchivo  # noqa: F401 (tabla cargas_archivo)
+from entities.variante_archivo import VarianteArchivo  # noqa: F401 (tabla archivos_variantes)
+from entities.trabajo_miniatura import TrabajoMiniatura  # noqa: F401 (tabla trabajos_miniaturas)
 from deps import start_revoked_sync
+from ws_notifier import dispatcher as ws_dispatcher
+from outbox import OutboxWorker
+from thumbnails import ThumbnailWorker
+from blob_store import UploadSweeper
+from pdf_extractor import shutdown_pool as shutdown_pdf_pool
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page
+from filters import ReportFilters, report_filters
+from bulk import batch_ids, fetch_by_ids, in_request_order
+from projection import Proyeccion, json_response, or_empty, pick
+import ref_cache
+from table_versions import ensure_version_rows, etag_for
+from search import ensure_search_index, search_reports
+from rating_stats import ensure_rating_stats
 
 app = FastAPI(title="REST API - Semana 4 (FastAPI)")
 
@@ -36,9 +63,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Last-Write"],
 )
+app.add_middleware(ReadRoutingMiddleware)
 
 Base.metadata.create_all(bind=engine)
+ensure_version_rows()
+ensure_search_index()
+ensure_rating_stats()
 
 
 @app.on_event("startup")
@@ -46,6 +78,47 @@ def _startup_revoked_sync():
     # Sincronización periódica de tokens revocados (blacklist) desde auth-service.
     start_revoked_sync()
 
+
+outbox_worker = OutboxWorker(ws_dispatcher.send)
+
+
+@app.on_event("startup")
+async def _startup_outbox_worker():
+    # Entrega de eventos guardados por los routers (WebSocket / n8n)
+    outbox_worker.start()
+
+
+thumbnail_worker = ThumbnailWorker()
+
+
+@app.on_event("startup")
+async def _startup_thumbnail_worker():
+    # Miniaturas de imágenes adjuntas (cola persistente en trabajos_miniaturas)
+    thumbnail_worker.start()
+
+
+upload_sweeper = UploadSweeper()
+
+
+@app.on_event("startup")
+async def _startup_upload_sweeper():
+    # Subidas por partes abandonadas y temporales huérfanos del almacén de adjuntos
+    upload_sweeper.start()
+
+
+@app.on_event("shutdown")
+async def _shutdown_background_workers():
+    await outbox_worker.stop()
+    await thumbnail_worker.stop()
+    await upload_sweeper.stop()
+    # Entrega lo pendiente (acotado) antes de cerrar el cliente HTTP compartido
+    try:
+        await asyncio.wait_for(ws_dispatcher.drain(), timeout=5)
+    except asyncio.TimeoutError:
+        pass
+    await ws_dispatcher.stop()
+    shutdown_pdf_pool()
+
 def to_iso(value: datetime | None) -> str | None:
     if value is None:
         return None
@@ -68,56 +141,6 @@ def serialize_report(reporte: Reporte, estados_lookup: dict[int | None, str]) ->
     }
 
 
-def serialize_categoria(categoria: Categoria) -> dict[str, Any]:
-    return {
-        "id": categoria.id_categoria,
-        "name": categoria.nombre,
-        "description": categoria.descripcion,
-        "priority": categoria.prioridad,
-        "status": categoria.estado,
-    }
-
-
-def serialize_area(area: Area) -> dict[str, Any]:
-    return {
-        "id": area.id_area,
-        "name": area.nombre_area,
-        "location": area.ubicacion,
-        "responsable": area.responsable,
-        "description": area.descripcion,
-    }
-
-
-def serialize_estado(estado: EstadoReporte) -> dict[str, Any]:
-    return {
-        "id": estado.id_estado,
-        "name": estado.nombre,
-        "description": estado.descripcion,
-        "color": estado.color,
-        "order": estado.orden,
-        "final": estado.es_final,
-    }
-
-
-def serialize_rol(rol: Rol) -> dict[str, Any]:
-    return {
-        "id": rol.id_rol,
-        "name": rol.nombre_rol,
-        "description": rol.descripcion,
-        "permissions": rol.permisos,
-    }
-
-
-def serialize_usuario(usuario: Usuario) -> dict[str, Any]:
-    return {
-        "id": usuario.id_usuario,
-        "name": usuario.nombre,
-        "email": usuario.email,
-        "status": usuario.estado,
-        "role_id": usuario.id_rol,
-    }
-
-
 def serialize_comentario(comentario: Comentario) -> dict[str, Any]:
     return {
         "id": comentario.id_comentario,
@@ -128,16 +151,6 @@ def serialize_comentario(comentario: Comentario) -> dict[str, Any]:
     }
 
 
-def serialize_puntuacion(puntuacion: Puntuacion) -> dict[str, Any]:
-    return {
-        "id": puntuacion.id_puntuacion,
-        "report_id": puntuacion.id_reporte,
-        "user_id": puntuacion.id_usuario,
-        "value": puntuacion.valor,
-        "date": to_iso(puntuacion.fecha),
-    }
-
-
 def serialize_archivo(archivo: ArchivoAdjunto) -> dict[str, Any]:
     return {
         "id": archivo.id_archivo,
@@ -148,102 +161,443 @@ def serialize_archivo(archivo: ArchivoAdjunto) -> dict[str, Any]:
     }
 
 
-def serialize_etiqueta(etiqueta: Etiqueta) -> dict[str, Any]:
-    return {
-        "id": etiqueta.id_etiqueta,
-        "name": etiqueta.nombre,
-        "color": etiqueta.color,
-    }
+# Mismas claves que serialize_*, leídas como columnas (listados y export).
+# "status" guarda id_estado; cada request lo resuelve con estados_lookup().
+REPORT_PROJECTION = Proyeccion({
+    "id": (Reporte.id_reporte, None),
+    "title": (Reporte.titulo, None),
+    "description": (Reporte.descripcion, or_empty),
+    "status": (Reporte.id_estado, None),
+    "priority": (literal("Media"), None),
+    "location": (Reporte.ubicacion, or_empty),
+    "created_at": (Reporte.creado_en, None),
+    "category_id": (Reporte.id_categoria, None),
+    "user_id": (Reporte.id_usuario, None),
+    "area_id": (Reporte.id_area, None),
+    "state_id": (Reporte.id_estado, None),
+})
+REPORT_FIELDS = REPORT_PROJECTION.nombres
+
+USER_PROJECTION = Proyeccion({
+    "id": (Usuario.id_usuario, None),
+    "name": (Usuario.nombre, None),
+    "email": (Usuario.email, None),
+    "status": (Usuario.estado, None),
+    "role_id": (Usuario.id_rol, None),
+})
+
+COMMENT_PROJECTION = Proyeccion({
+    "id": (Comentario.id_comentario, None),
+    "report_id": (Comentario.id_reporte, None),
+    "user_id": (Comentario.id_usuario, None),
+    "content": (Comentario.contenido, None),
+    "date": (Comentario.fecha, None),
+})
+
+RATING_PROJECTION = Proyeccion({
+    "id": (Puntuacion.id_puntuacion, None),
+    "report_id": (Puntuacion.id_reporte, None),
+    "user_id": (Puntuacion.id_usuario, None),
+    "value": (Puntuacion.valor, None),
+    "date": (Puntuacion.fecha, None),
+})
+
+FILE_PROJECTION = Proyeccion({
+    "id": (ArchivoAdjunto.id_archivo, None),
+    "report_id": (ArchivoAdjunto.id_reporte, None),
+    "name": (ArchivoAdjunto.nombre_archivo, None),
+    "type": (ArchivoAdjunto.tipo, None),
+    "url": (ArchivoAdjunto.url, None),
+})
+
+CATEGORY_PROJECTION = Proyeccion({
+    "id": (Categoria.id_categoria, None),
+    "name": (Categoria.nombre, None),
+    "description": (Categoria.descripcion, None),
+    "priority": (Categoria.prioridad, None),
+    "status": (Categoria.estado, None),
+})
+
+AREA_PROJECTION = Proyeccion({
+    "id": (Area.id_area, None),
+    "name": (Area.nombre_area, None),
+    "location": (Area.ubicacion, None),
+    "responsable": (Area.responsable, None),
+    "description": (Area.descripcion, None),
+})
+
+STATE_PROJECTION = Proyeccion({
+    "id": (EstadoReporte.id_estado, None),
+    "name": (EstadoReporte.nombre, None),
+    "description": (EstadoReporte.descripcion, None),
+    "color": (EstadoReporte.color, None),
+    "order": (EstadoReporte.orden, None),
+    "final": (EstadoReporte.es_final, None),
+})
+
+ROLE_PROJECTION = Proyeccion({
+    "id": (Rol.id_rol, None),
+    "name": (Rol.nombre_rol, None),
+    "description": (Rol.descripcion, None),
+    "permissions": (Rol.permisos, None),
+})
+
+TAG_PROJECTION = Proyeccion({
+    "id": (Etiqueta.id_etiqueta, None),
+    "name": (Etiqueta.nombre, None),
+    "color": (Etiqueta.color, None),
+})
+
+
+def status_resolver(estados: dict[int | None, str]):
+    return lambda id_estado: estados.get(id_estado, "Sin estado")
+
+
+# Los loaders de `ref_cache` leen de la réplica del request, después de la
+# versión (en `etag_for` o en `ref_cache.get`): los datos nunca son más viejos.
+def _load_estados_lookup() -> dict[int | None, str]:
+    with ReadSessionLocal() as session:
+        return {
+            id_estado: nombre
+            for id_estado, nombre in session.query(EstadoReporte.id_estado, EstadoReporte.nombre)
+        }
+
+
+def estados_lookup(versiones: Optional[dict[str, int]] = None) -> dict[int | None, str]:
+    """id_estado -> nombre, desde la caché de tablas de referencia.
+
+    `versiones` son las que devolvió `etag_for` (evita otra lectura de la versión).
+    """
+    db_version = versiones.get("estados_reporte") if versiones else None
+    return ref_cache.get("estados_reporte", "lookup", _load_estados_lookup, db_version)
+
 
 @app.get("/")
 def root():
     return {"status": "ok", "service": "REST API"}
 
+
+@app.get("/health/notifications")
+def health_notifications():
+    """Métricas del despachador WebSocket: enviados, reintentos, fallidos, descartados, en cola."""
+    return ws_dispatcher.metrics()
+
 @app.get("/health")
 def health():
     return {"status": "ok", "service": "REST API"}
 
 @app.get("/api/v1/reports")
-def get_reports():
-    with SessionLocal() as session:
-        estados = {
-            estado.id_estado: estado.nombre
-            for estado in session.query(EstadoReporte).all()
-        }
-        reportes: List[Reporte] = (
+def get_reports(
+    response: Response,
+    versiones: dict[str, int] = Depends(etag_for("reportes", "estados_reporte")),
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    filters: ReportFilters = Depends(report_filters),
+    ids: Optional[list[int]] = Depends(batch_ids),
+    fields: Optional[tuple[str, ...]] = Depends(REPORT_PROJECTION.fields_param),
+):
+    """Listado de reportes para integración.
+
+    Acepta filtros `state_id`, `category_id`, `area_id`, `user_id`,
+    `created_from`/`created_to` y `sort` (`-created_at` | `created_at`),
+    resueltos en SQL.
+
+    Sin `limit` ni `cursor` devuelve la lista completa (compatibilidad).
+    Con cualquiera de ellos pagina por cursor y responde
+    `{"items": [...], "next_cursor": "..." | null}`.
+
+    Con `ids=1,2,3` devuelve esos reportes en el orden pedido (`null` si no
+    existe), en una sola consulta; los filtros y la paginación no aplican.
+
+    `fields=id,title,status` limita el SELECT y la respuesta a esos campos.
+    """
+    status = status_resolver(estados_lookup(versiones))
+    with ReadSessionLocal() as session:
+        # Columnas como tuplas (sin instancias ORM); la clave del cursor va al final
+        query = session.query(*REPORT_PROJECTION.columnas(fields), Reporte.creado_en, Reporte.id_reporte)
+        if ids is not None:
+            encontrados = fetch_by_ids(query, Reporte.id_reporte, ids)
+            return json_response(
+                in_request_order(ids, encontrados, lambda row: REPORT_PROJECTION.to_dicts([row], fields, status=status)[0]),
+                response,
+            )
+        query = filters.apply(query)
+        if limit is None and cursor is None:
+            rows = filters.order(query).all()
+            return json_response(REPORT_PROJECTION.to_dicts(rows, fields, status=status), response)
+
+        rows, next_cursor = keyset_page(
+            query, Reporte.creado_en, Reporte.id_reporte, cursor, limit or DEFAULT_PAGE_SIZE,
+            descending=filters.descending,
+        )
+        return json_response(
+            {"items": REPORT_PROJECTION.to_dicts(rows, fields, status=status), "next_cursor": next_cursor},
+            response,
+        )
+
+
+@app.get("/api/v1/reports/search")
+def search_reports_endpoint(
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    versiones: dict[str, int] = Depends(etag_for("reportes", "comentarios", "estados_reporte")),
+):
+    """Búsqueda de texto completo en título, descripción y comentarios.
+
+    Ordena por relevancia y agrega `score` y `snippet` (coincidencias entre
+    `<b>…</b>`) a cada reporte. Pagina por cursor: `{"items", "next_cursor"}`.
+    """
+    estados = estados_lookup(versiones)
+    with ReadSessionLocal() as session:
+        hits, next_cursor = search_reports(session, q, limit, cursor)
+        ids = [h["id_reporte"] for h in hits]
+        reportes = {r.id_reporte: r for r in session.query(Reporte).filter(Reporte.id_reporte.in_(ids))}
+        items = [
+            {**serialize_report(reportes[h["id_reporte"]], estados), "score": h["score"], "snippet": h["snippet"]}
+            for h in hits
+            if h["id_reporte"] in reportes
+        ]
+        return {"items": items, "next_cursor": next_cursor}
+
+
+@app.get(
+    "/api/v1/reports/{report_id}/full",
+    dependencies=[Depends(etag_for(
+        "reportes", "comentarios", "puntuaciones", "archivos_adjuntos", "archivos_variantes",
+        "estados_reporte", "categorias", "areas", "usuarios",
+    ))],
+)
+def get_report_full(
+    report_id: int,
+    comments_limit: int = Query(default=20, ge=1, le=MAX_PAGE_SIZE),
+    comments_cursor: Optional[str] = None,
+):
+    """Detalle de un reporte en una sola llamada.
+
+    Incluye nombres de estado/categoría/área/autor, resumen de puntuaciones,
+    adjuntos (con sus variantes) y la primera página de comentarios, más
+    nuevos primero (`comments.next_cursor` pide la siguiente). Las relaciones
+    se cargan con `selectinload`: la cantidad de consultas es fija, no
+    depende de cuántos comentarios o adjuntos tenga el reporte.
+    """
+    with ReadSessionLocal() as session:
+        reporte = (
             session.query(Reporte)
-            .order_by(Reporte.creado_en.desc())
-            .all()
+            .options(
+                selectinload(Reporte.estado_obj),
+                selectinload(Reporte.categoria),
+                selectinload(Reporte.area),
+                selectinload(Reporte.usuario),
+                selectinload(Reporte.resumen_puntuacion),
+                selectinload(Reporte.archivos),
+            )
+            .filter(Reporte.id_reporte == report_id)
+            .one_or_none()
+        )
+        if reporte is None:
+            raise HTTPException(status_code=404, detail="Reporte no encontrado")
+        comentarios, next_cursor = keyset_page(
+            session.query(Comentario).options(selectinload(Comentario.usuario)).filter(Comentario.id_reporte == report_id),
+            Comentario.fecha, Comentario.id_comentario, comments_cursor, comments_limit,
         )
-        return [serialize_report(reporte, estados) for reporte in reportes]
+        estado = reporte.estado_obj
+        resumen = reporte.resumen_puntuacion
+        return {
+            **serialize_report(reporte, {reporte.id_estado: estado.nombre} if estado else {}),
+            "category_name": reporte.categoria.nombre if reporte.categoria else None,
+            "area_name": reporte.area.nombre_area if reporte.area else None,
+            "user_name": reporte.usuario.nombre if reporte.usuario else None,
+            "rating": {
+                "count": resumen.cantidad if resumen else 0,
+                "average": resumen.promedio if resumen else None,
+                "min": resumen.minimo if resumen else None,
+                "max": resumen.maximo if resumen else None,
+            },
+            "attachments": [
+                {**serialize_archivo(archivo), "variants": archivo.variantes}
+                for archivo in sorted(reporte.archivos, key=lambda a: a.id_archivo)
+            ],
+            "comments": {
+                "items": [
+                    {**serialize_comentario(c), "user_name": c.usuario.nombre if c.usuario else None}
+                    for c in comentarios
+                ],
+                "next_cursor": next_cursor,
+            },
+        }
+
+
+EXPORT_BATCH_SIZE = 1000
+_EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _iter_export(filters: ReportFilters, fmt: str, fields: Optional[tuple[str, ...]] = None) -> Iterator[str | bytes]:
+    """Genera el export en lotes de EXPORT_BATCH_SIZE filas.
+
+    La sesión vive mientras dura el streaming; `yield_per` usa cursor del lado
+    del servidor en Postgres, así la memoria no crece con el tamaño de la tabla.
+    Se leen columnas (tuplas), no instancias ORM: no hay identity map que vaciar.
+    """
+    status = status_resolver(estados_lookup())
+    with ReadSessionLocal() as session:
+        query = filters.order(filters.apply(session.query(*REPORT_PROJECTION.columnas(fields))))
+        partes = session.execute(query.statement, execution_options={"yield_per": EXPORT_BATCH_SIZE}).partitions()
+
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=fields or REPORT_FIELDS)
+            writer.writeheader()
+            yield buffer.getvalue()
+            for rows in partes:
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(REPORT_PROJECTION.to_dicts(rows, fields, status=status, created_at=to_iso))
+                yield buffer.getvalue()
+            return
+
+        for rows in partes:
+            yield b"".join(orjson.dumps(row) + b"\n" for row in REPORT_PROJECTION.to_dicts(rows, fields, status=status))
+
+
+@app.get("/api/v1/reports/export")
+def export_reports(
+    format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    filters: ReportFilters = Depends(report_filters),
+    fields: Optional[tuple[str, ...]] = Depends(REPORT_PROJECTION.fields_param),
+):
+    """Export completo de reportes en streaming (NDJSON o CSV) con los mismos filtros y `fields` del listado."""
+    return StreamingResponse(
+        _iter_export(filters, format, fields),
+        media_type=_EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="reports.{format}"'},
+    )
+
+
+def _load_categories() -> list[dict[str, Any]]:
+    with ReadSessionLocal() as session:
+        rows = session.query(*CATEGORY_PROJECTION.columnas()).order_by(Categoria.id_categoria).all()
+        return CATEGORY_PROJECTION.to_dicts(rows)
+
+
+def _load_areas() -> list[dict[str, Any]]:
+    with ReadSessionLocal() as session:
+        rows = session.query(*AREA_PROJECTION.columnas()).order_by(Area.id_area).all()
+        return AREA_PROJECTION.to_dicts(rows)
+
+
+def _load_states() -> list[dict[str, Any]]:
+    with ReadSessionLocal() as session:
+        rows = session.query(*STATE_PROJECTION.columnas()).order_by(EstadoReporte.orden, EstadoReporte.id_estado).all()
+        return STATE_PROJECTION.to_dicts(rows)
+
+
+def _load_roles() -> list[dict[str, Any]]:
+    with ReadSessionLocal() as session:
+        rows = session.query(*ROLE_PROJECTION.columnas()).order_by(Rol.id_rol).all()
+        return ROLE_PROJECTION.to_dicts(rows)
 
 
 @app.get("/api/v1/categories")
-def get_categories():
-    with SessionLocal() as session:
-        categorias = session.query(Categoria).order_by(Categoria.id_categoria).all()
-        return [serialize_categoria(categoria) for categoria in categorias]
+def get_categories(
+    versiones: dict[str, int] = Depends(etag_for("categorias")),
+    ids: Optional[list[int]] = Depends(batch_ids),
+    fields: Optional[tuple[str, ...]] = Depends(CATEGORY_PROJECTION.fields_param),
+):
+    # `?ids=` en tablas de referencia se resuelve sobre la lista cacheada, sin ir a la base
+    items = ref_cache.get("categorias", "list", _load_categories, versiones.get("categorias"))
+    if ids is not None:
+        return in_request_order(ids, {item["id"]: item for item in items}, lambda item: pick([item], fields)[0])
+    return pick(items, fields)
 
 
 @app.get("/api/v1/areas")
-def get_areas():
-    with SessionLocal() as session:
-        areas = session.query(Area).order_by(Area.id_area).all()
-        return [serialize_area(area) for area in areas]
+def get_areas(
+    versiones: dict[str, int] = Depends(etag_for("areas")),
+    ids: Optional[list[int]] = Depends(batch_ids),
+    fields: Optional[tuple[str, ...]] = Depends(AREA_PROJECTION.fields_param),
+):
+    items = ref_cache.get("areas", "list", _load_areas, versiones.get("areas"))
+    if ids is not None:
+        return in_request_order(ids, {item["id"]: item for item in items}, lambda item: pick([item], fields)[0])
+    return pick(items, fields)
 
 
 @app.get("/api/v1/states")
-def get_states():
-    with SessionLocal() as session:
-        estados = session.query(EstadoReporte).order_by(EstadoReporte.orden, EstadoReporte.id_estado).all()
-        return [serialize_estado(estado) for estado in estados]
+def get_states(
+    versiones: dict[str, int] = Depends(etag_for("estados_reporte")),
+    ids: Optional[list[int]] = Depends(batch_ids),
+    fields: Optional[tuple[str, ...]] = Depends(STATE_PROJECTION.fields_param),
+):
+    items = ref_cache.get("estados_reporte", "list", _load_states, versiones.get("estados_reporte"))
+    if ids is not None:
+        return in_request_order(ids, {item["id"]: item for item in items}, lambda item: pick([item], fields)[0])
+    return pick(items, fields)
 
 
 @app.get("/api/v1/roles")
-def get_roles():
-    with SessionLocal() as session:
-        roles = session.query(Rol).order_by(Rol.id_rol).all()
-        return [serialize_rol(rol) for rol in roles]
+def get_roles(
+    versiones: dict[str, int] = Depends(etag_for("roles")),
+    fields: Optional[tuple[str, ...]] = Depends(ROLE_PROJECTION.fields_param),
+):
+    return pick(ref_cache.get("roles", "list", _load_roles, versiones.get("roles")), fields)
+
+
+@app.get("/api/v1/users", dependencies=[Depends(etag_for("usuarios"))])
+def get_users(
+    response: Response,
+    ids: Optional[list[int]] = Depends(batch_ids),
+    fields: Optional[tuple[str, ...]] = Depends(USER_PROJECTION.fields_param),
+):
+    with ReadSessionLocal() as session:
+        query = session.query(*USER_PROJECTION.columnas(fields), Usuario.id_usuario)
+        if ids is not None:
+            encontrados = fetch_by_ids(query, Usuario.id_usuario, ids)
+            return json_response(
+                in_request_order(ids, encontrados, lambda row: USER_PROJECTION.to_dicts([row], fields)[0]), response
+            )
+        rows = query.order_by(Usuario.id_usuario).all()
+        return json_response(USER_PROJECTION.to_dicts(rows, fields), response)
 
 
-@app.get("/api/v1/users")
-def get_users():
-    with SessionLocal() as session:
-        usuarios = session.query(Usuario).order_by(Usuario.id_usuario).all()
-        return [serialize_usuario(usuario) for usuario in usuarios]
+@app.get("/api/v1/comments", dependencies=[Depends(etag_for("comentarios"))])
+def get_comments(response: Response, fields: Optional[tuple[str, ...]] = Depends(COMMENT_PROJECTION.fields_param)):
+    with ReadSessionLocal() as session:
+        rows = session.query(*COMMENT_PROJECTION.columnas(fields)).order_by(Comentario.fecha.desc()).all()
+        return json_response(COMMENT_PROJECTION.to_dicts(rows, fields), response)
 
 
-@app.get("/api/v1/comments")
-def get_comments():
-    with SessionLocal() as session:
-        comentarios = session.query(Comentario).order_by(Comentario.fecha.desc()).all()
-        return [serialize_comentario(comentario) for comentario in comentarios]
+@app.get("/api/v1/ratings", dependencies=[Depends(etag_for("puntuaciones"))])
+def get_ratings(response: Response, fields: Optional[tuple[str, ...]] = Depends(RATING_PROJECTION.fields_param)):
+    with ReadSessionLocal() as session:
+        rows = session.query(*RATING_PROJECTION.columnas(fields)).order_by(Puntuacion.fecha.desc()).all()
+        return json_response(RATING_PROJECTION.to_dicts(rows, fields), response)
 
 
-@app.get("/api/v1/ratings")
-def get_ratings():
-    with SessionLocal() as session:
-        puntuaciones = session.query(Puntuacion).order_by(Puntuacion.fecha.desc()).all()
-        return [serialize_puntuacion(puntuacion) for puntuacion in puntuaciones]
+@app.get("/api/v1/files", dependencies=[Depends(etag_for("archivos_adjuntos"))])
+def get_files(response: Response, fields: Optional[tuple[str, ...]] = Depends(FILE_PROJECTION.fields_param)):
+    with ReadSessionLocal() as session:
+        rows = session.query(*FILE_PROJECTION.columnas(fields)).order_by(ArchivoAdjunto.id_archivo).all()
+        return json_response(FILE_PROJECTION.to_dicts(rows, fields), response)
 
 
-@app.get("/api/v1/files")
-def get_files():
-    with SessionLocal() as session:
-        archivos = session.query(ArchivoAdjunto).order_by(ArchivoAdjunto.id_archivo).all()
-        return [serialize_archivo(archivo) for archivo in archivos]
+@app.get("/api/v1/attachments", dependencies=[Depends(etag_for("archivos_adjuntos"))])
+def get_attachments(response: Response, fields: Optional[tuple[str, ...]] = Depends(FILE_PROJECTION.fields_param)):
+    return get_files(response, fields)
 
 
-@app.get("/api/v1/attachments")
-def get_attachments():
-    return get_files()
+def _load_tags() -> list[dict[str, Any]]:
+    with ReadSessionLocal() as session:
+        rows = session.query(*TAG_PROJECTION.columnas()).order_by(Etiqueta.id_etiqueta).all()
+        return TAG_PROJECTION.to_dicts(rows)
 
 
 @app.get("/api/v1/tags")
-def get_tags():
-    with SessionLocal() as session:
-        etiquetas = session.query(Etiqueta).order_by(Etiqueta.id_etiqueta).all()
-        return [serialize_etiqueta(etiqueta) for etiqueta in etiquetas]
+def get_tags(
+    versiones: dict[str, int] = Depends(etag_for("etiquetas")),
+    fields: Optional[tuple[str, ...]] = Depends(TAG_PROJECTION.fields_param),
+):
+    return pick(ref_cache.get("etiquetas", "list", _load_tags, versiones.get("etiquetas")), fields)
 
 # Routers
 app.include_router(auth_router)
@@ -258,4 +612,5 @@ app.include_router(comentarios_router)
 app.include_router(puntuaciones_router)
 app.include_router(etiquetas_router)
 app.include_router(pdf_router)
-app.include_router(integrations_router)
\ No newline at end of file
+app.include_router(integrations_router)
+app.include_router(analytics_router)
\ No newline at end of file
@@ -0,0 +1,190 @@
+"""
+Outbox transaccional para eventos de dominio.
+
+Los routers guardan el evento (`add_event`) en la tabla `outbox` dentro de la
+misma transacción que el reporte/comentario/puntuación: si la transacción se
+revierte, el evento no existe; si el proceso cae después del commit, el
+evento sigue pendiente. `OutboxWorker` lo entrega fuera del camino de la
+request, por lotes:
+
+- destino "ws": un POST por evento al servicio WebSocket (cliente keep-alive
+  compartido de `ws_notifier`), concurrentes dentro del lote.
+- destino "n8n": un único POST con la lista de eventos del lote a
+  `N8N_EVENTS_WEBHOOK_URL` (sólo si está configurada).
+
+La entrega es al menos una vez: un evento reclamado por un worker que muere
+vuelve a estar disponible al vencer `OUTBOX_LEASE_SECONDS`. Tras
+`OUTBOX_MAX_ATTEMPTS` fallos el evento queda en `fallido_en` (dead letter):
+no se reintenta ni se purga, y conserva `ultimo_error` para revisarlo.
+"""
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+from db import SessionLocal
+from entities.evento_outbox import EventoOutbox
+
+N8N_EVENTS_WEBHOOK_URL = (os.getenv("N8N_EVENTS_WEBHOOK_URL") or "").strip()
+OUTBOX_ENABLED = os.getenv("OUTBOX_ENABLED", "1") == "1"
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1.0"))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "30"))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "2"))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "300"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+# Los eventos entregados se borran pasado este tiempo
+OUTBOX_RETENTION_HOURS = float(os.getenv("OUTBOX_RETENTION_HOURS", "24"))
+
+
+def add_event(db, room: str, payload: dict, ws: bool = True) -> None:
+    """Agrega el evento a la transacción de `db` (Session o AsyncSession); no hace flush."""
+    data = json.dumps(payload, separators=(",", ":"), default=str)
+    if ws:
+        db.add(EventoOutbox(destino="ws", sala=room, payload=data))
+    if N8N_EVENTS_WEBHOOK_URL:
+        db.add(EventoOutbox(destino="n8n", sala=room, payload=data))
+
+
+def _claim(limit: int) -> list[tuple[int, str, Optional[str], str]]:
+    """Reserva hasta `limit` eventos pendientes moviendo su `proximo_intento` al fin del lease."""
+    now = datetime.utcnow()
+    with SessionLocal() as session:
+        rows = (
+            session.query(EventoOutbox)
+            .filter(
+                EventoOutbox.enviado_en.is_(None),
+                EventoOutbox.fallido_en.is_(None),
+                EventoOutbox.proximo_intento <= now,
+            )
+            .order_by(EventoOutbox.id_evento)
+            .limit(limit)
+            .with_for_update(skip_locked=True)  # varios workers no reclaman la misma fila (Postgres)
+            .all()
+        )
+        out = [(r.id_evento, r.destino, r.sala, r.payload) for r in rows]
+        lease = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+        for r in rows:
+            r.proximo_intento = lease
+        session.commit()
+        return out
+
+
+def _finish(enviados: list[int], fallidos: dict[int, str]) -> None:
+    now = datetime.utcnow()
+    with SessionLocal() as session:
+        if enviados:
+            session.query(EventoOutbox).filter(EventoOutbox.id_evento.in_(enviados)).update(
+                {EventoOutbox.enviado_en: now}, synchronize_session=False
+            )
+        for r in session.query(EventoOutbox).filter(EventoOutbox.id_evento.in_(list(fallidos))):
+            r.intentos += 1
+            r.ultimo_error = fallidos[r.id_evento][:255]
+            if r.intentos >= OUTBOX_MAX_ATTEMPTS:
+                r.fallido_en = now  # se abandona: queda como dead letter
+                print(f"⚠️ Evento {r.id_evento} ({r.destino}) abandonado tras {r.intentos} intentos: {r.ultimo_error}")
+                continue
+            espera = min(OUTBOX_RETRY_BASE_SECONDS * 2 ** (r.intentos - 1), OUTBOX_RETRY_MAX_SECONDS)
+            r.proximo_intento = now + timedelta(seconds=espera)
+        session.commit()
+
+
+def _purge() -> None:
+    limite = datetime.utcnow() - timedelta(hours=OUTBOX_RETENTION_HOURS)
+    with SessionLocal() as session:
+        session.query(EventoOutbox).filter(EventoOutbox.enviado_en < limite).delete(synchronize_session=False)
+        session.commit()
+
+
+class OutboxWorker:
+    """Drena la outbox en lotes. `ws_send(sala, payload) -> bool` entrega un evento al WebSocket."""
+
+    def __init__(
+        self,
+        ws_send: Callable[[str, dict], Awaitable[bool]],
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self._ws_send = ws_send
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+
+    async def run_once(self) -> int:
+        """Procesa un lote; devuelve cuántos eventos se reclamaron."""
+        rows = await run_in_threadpool(_claim, OUTBOX_BATCH_SIZE)
+        if not rows:
+            return 0
+        enviados: list[int] = []
+        fallidos: dict[int, str] = {}
+
+        ws_rows = [r for r in rows if r[1] == "ws"]
+        resultados = await asyncio.gather(
+            *(self._ws_send(sala or "general", json.loads(payload)) for _, _, sala, payload in ws_rows),
+            return_exceptions=True,
+        )
+        for (id_evento, *_), ok in zip(ws_rows, resultados):
+            if ok is True:
+                enviados.append(id_evento)
+            else:
+                fallidos[id_evento] = "WebSocket no confirmó la entrega" if ok is False else repr(ok)
+
+        n8n_rows = [r for r in rows if r[1] == "n8n"]
+        if n8n_rows:
+            ids = [r[0] for r in n8n_rows]
+            error = await self._post_n8n([{**json.loads(r[3]), "room": r[2]} for r in n8n_rows])
+            if error is None:
+                enviados.extend(ids)
+            else:
+                fallidos.update({i: error for i in ids})
+
+        await run_in_threadpool(_finish, enviados, fallidos)
+        return len(rows)
+
+    async def _post_n8n(self, eventos: list[dict]) -> Optional[str]:
+        if not N8N_EVENTS_WEBHOOK_URL:
+            return "N8N_EVENTS_WEBHOOK_URL no está configurada"
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=5.0, transport=self._transport)
+        try:
+            r = await self._client.post(N8N_EVENTS_WEBHOOK_URL, json={"events": eventos})
+        except Exception as e:
+            return f"n8n: {e!r}"
+        return None if r.is_success else f"n8n respondió con status {r.status_code}"
+
+    async def run(self) -> None:
+        while True:
+            try:
+                n = await self.run_once()
+                if time.monotonic() - self._last_purge > 600:
+                    self._last_purge = time.monotonic()
+                    await run_in_threadpool(_purge)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # La base de datos puede no estar disponible; se reintenta en el siguiente ciclo
+                print(f"❌ Error procesando outbox: {e}")
+                n = 0
+            if n < OUTBOX_BATCH_SIZE:
+                await asyncio.sleep(OUTBOX_POLL_SECONDS)
+
+    def start(self) -> None:
+        if OUTBOX_ENABLED and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
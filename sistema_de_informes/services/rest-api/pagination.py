@@ -0,0 +1,62 @@
+"""
+Paginación por cursor (keyset) para listados grandes.
+
+El cursor es opaco para el cliente: codifica en base64url la última clave
+ordenada que se entregó, (fecha, id). La siguiente página se obtiene con
+`WHERE (fecha, id) < (cursor)` (o `>` en orden ascendente) sobre un índice
+compuesto, por lo que el costo de cada página no depende de cuántas filas hay
+antes.
+"""
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Any, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+MAX_PAGE_SIZE = int(os.getenv("PAGE_SIZE_MAX", "500"))
+
+
+def encode_cursor(fecha: datetime, id_: int) -> str:
+    raw = json.dumps([fecha.isoformat(), id_], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        fecha, id_ = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(fecha), int(id_)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+
+
+def keyset_page(
+    query, fecha_col, id_col, cursor: Optional[str], limit: int, descending: bool = True
+) -> tuple[list[Any], Optional[str]]:
+    """Aplica orden (fecha, id) + cursor a `query` y devuelve (filas, next_cursor).
+
+    Sirve tanto para consultas ORM como para consultas por columnas: las filas
+    deben exponer los atributos `fecha_col.key` e `id_col.key`.
+    """
+    if cursor:
+        fecha, id_ = decode_cursor(cursor)
+        if descending:
+            query = query.filter(or_(fecha_col < fecha, and_(fecha_col == fecha, id_col < id_)))
+        else:
+            query = query.filter(or_(fecha_col > fecha, and_(fecha_col == fecha, id_col > id_)))
+    if descending:
+        query = query.order_by(fecha_col.desc(), id_col.desc())
+    else:
+        query = query.order_by(fecha_col.asc(), id_col.asc())
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, fecha_col.key), getattr(last, id_col.key))
+    return rows, next_cursor
@@ -0,0 +1,111 @@
+"""
+Caché en disco de extracciones de PDF, direccionada por contenido.
+
+La clave es el SHA-256 de los bytes del archivo: subir el mismo PDF otra vez
+(aunque con otro nombre) reutiliza el texto ya extraído sin pasar por
+PyPDF2. Cada entrada es un JSON con el total de páginas y el texto de las
+páginas extraídas:
+
+    <PDF_CACHE_DIR>/<sha[:2]>/<sha>.json            documento completo
+    <PDF_CACHE_DIR>/<sha[:2]>/<sha>.<ini>-<fin>.json rango (base 0, semiabierto)
+
+Un documento completo sirve cualquier rango. La expulsión es LRU por tamaño
+total (`PDF_CACHE_MAX_BYTES`): cada acierto actualiza el mtime del archivo y
+al escribir se borran los más antiguos hasta volver al límite.
+"""
+import glob
+import json
+import os
+import tempfile
+import time
+from typing import Optional
+
+from pdf_extractor import resolve_range
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "rest-api-pdf-cache"))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+PDF_CACHE_ENABLED = os.getenv("PDF_CACHE_ENABLED", "1") == "1" and PDF_CACHE_MAX_BYTES > 0
+
+
+def _dir(sha: str) -> str:
+    return os.path.join(PDF_CACHE_DIR, sha[:2])
+
+
+def _path(sha: str, span: Optional[tuple[int, int]] = None) -> str:
+    name = f"{sha}.json" if span is None else f"{sha}.{span[0]}-{span[1]}.json"
+    return os.path.join(_dir(sha), name)
+
+
+def _read(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _touch(path: str) -> None:
+    """LRU: marca la entrada como usada ahora (tiempo explícito; algunos FS tienen mtime grueso)."""
+    now = time.time()
+    try:
+        os.utime(path, (now, now))
+    except OSError:
+        pass
+
+
+def lookup(sha: str, page_range: Optional[tuple[int, int]]) -> Optional[tuple[int, int, int, list[str]]]:
+    """Busca una entrada que cubra el rango pedido (base 1, como `pages=`).
+
+    Devuelve (total, inicio, fin, textos) con inicio/fin base 0 semiabiertos.
+    Los rangos inválidos para el documento cacheado levantan el mismo error
+    que sin caché.
+    """
+    if not PDF_CACHE_ENABLED:
+        return None
+    for path in [_path(sha), *sorted(glob.glob(os.path.join(_dir(sha), f"{sha}.*-*.json")))]:
+        entry = _read(path)
+        if entry is None:
+            continue
+        start, end = resolve_range(int(entry["total"]), page_range)
+        ini, fin = entry["start"], entry["end"]
+        if ini <= start and end <= fin:
+            _touch(path)
+            return int(entry["total"]), start, end, entry["pages"][start - ini:end - ini]
+    return None
+
+
+def store(sha: str, total: int, start: int, end: int, pages: list[str]) -> None:
+    """Guarda el texto de [start, end) de forma atómica y aplica la expulsión LRU."""
+    if not PDF_CACHE_ENABLED:
+        return
+    span = None if (start, end) == (0, total) else (start, end)
+    path = _path(sha, span)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = json.dumps({"total": total, "start": start, "end": end, "pages": pages}, ensure_ascii=False)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+    _touch(path)
+    evict()
+
+
+def evict(max_bytes: Optional[int] = None) -> None:
+    """Borra las entradas menos usadas hasta que el total quede bajo `max_bytes`."""
+    limite = PDF_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entradas = []
+    for path in glob.glob(os.path.join(PDF_CACHE_DIR, "*", "*.json")):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entradas.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in entradas)
+    for _, size, path in sorted(entradas):
+        if total <= limite:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        total -= size
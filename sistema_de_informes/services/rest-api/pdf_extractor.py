@@ -0,0 +1,146 @@
+"""
+Extracción de texto de PDF fuera del event loop.
+
+El parseo con PyPDF2 es CPU puro: se ejecuta en un pool de procesos
+(`PDF_WORKERS`, por defecto un proceso por núcleo) en bloques de
+`PDF_PAGES_PER_TASK` páginas. El archivo subido se vuelca a un temporal en
+trozos y los workers lo abren por ruta, así ni el handler ni el pool copian
+el PDF completo en memoria.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, UploadFile, status
+
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(20 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "500"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or (os.cpu_count() or 2)
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# --- Funciones que corren en el pool (deben ser picklables: nivel de módulo) ---
+
+def _count_pages(path: str) -> int:
+    from PyPDF2 import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def _extract_pages(path: str, start: int, end: int) -> list[str]:
+    """Texto de las páginas [start, end) (base 0)."""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+# --- Lado del handler ---
+
+def parse_page_range(pages: Optional[str]) -> Optional[tuple[int, int]]:
+    """'3-7' o '5' (base 1, inclusivo) -> (inicio, fin) base 1 inclusivo."""
+    if not pages:
+        return None
+    try:
+        desde, _, hasta = pages.partition("-")
+        inicio = int(desde)
+        fin = int(hasta) if hasta else inicio
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Rango de páginas inválido (use '3-7')")
+    if inicio < 1 or fin < inicio:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Rango de páginas inválido (use '3-7')")
+    return inicio, fin
+
+
+async def save_upload(file: UploadFile) -> tuple[str, str]:
+    """Vuelca el upload a un archivo temporal respetando PDF_MAX_BYTES.
+
+    Devuelve (ruta, SHA-256 hex del contenido), calculado mientras se escribe.
+    """
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    total = 0
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                total += len(chunk)
+                digest.update(chunk)
+                if total > PDF_MAX_BYTES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"El PDF supera el máximo de {PDF_MAX_BYTES} bytes",
+                    )
+                out.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, digest.hexdigest()
+
+
+async def plan_pages(path: str, page_range: Optional[tuple[int, int]]) -> tuple[int, int, int]:
+    """Valida el documento y el rango. Devuelve (inicio, fin) base 0 semiabierto y el total de páginas."""
+    loop = asyncio.get_running_loop()
+    try:
+        total = await loop.run_in_executor(get_pool(), _count_pages, path)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"PDF inválido: {e}")
+    return (*resolve_range(total, page_range), total)
+
+
+def resolve_range(total: int, page_range: Optional[tuple[int, int]]) -> tuple[int, int]:
+    """Aplica el rango pedido (base 1) a un documento de `total` páginas; (inicio, fin) base 0 semiabierto."""
+    inicio, fin = (1, total) if page_range is None else page_range
+    if inicio > total:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"El PDF tiene {total} páginas")
+    fin = min(fin, total)
+    if fin - inicio + 1 > PDF_MAX_PAGES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Se pueden extraer como máximo {PDF_MAX_PAGES} páginas por solicitud (use `pages=`)",
+        )
+    return inicio - 1, fin
+
+
+async def iter_pages(path: str, start: int, end: int) -> AsyncIterator[tuple[int, str]]:
+    """Genera (número de página base 1, texto) en orden.
+
+    Mantiene como máximo PDF_WORKERS bloques en vuelo: la memoria queda
+    acotada aunque el cliente lea el stream despacio.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    bloques = [(i, min(i + PDF_PAGES_PER_TASK, end)) for i in range(start, end, PDF_PAGES_PER_TASK)]
+    pendientes: list[tuple[int, asyncio.Future]] = []
+    siguiente = 0
+    try:
+        while siguiente < len(bloques) or pendientes:
+            while siguiente < len(bloques) and len(pendientes) < PDF_WORKERS:
+                desde, hasta = bloques[siguiente]
+                pendientes.append((desde, loop.run_in_executor(pool, _extract_pages, path, desde, hasta)))
+                siguiente += 1
+            desde, fut = pendientes.pop(0)
+            for offset, texto in enumerate(await fut):
+                yield desde + offset + 1, texto
+    finally:
+        for _, fut in pendientes:
+            fut.cancel()
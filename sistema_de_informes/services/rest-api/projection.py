@@ -0,0 +1,80 @@
+"""
+Serialización por columnas para los listados `/api/v1`.
+
+En lugar de materializar instancias ORM (identity map, estado por atributo)
+y copiarlas a dicts fila por fila, los listados seleccionan sólo las
+columnas que publican, como tuplas, y las codifican directo a JSON con
+orjson, sin pasar por `jsonable_encoder`. orjson escribe los `datetime` en
+ISO 8601 igual que `to_iso`.
+
+`?fields=id,title,status` (sparse fieldsets) reduce tanto el SELECT como el
+JSON a esos campos; un campo desconocido responde 400.
+"""
+from typing import Any, Callable, Iterable, Optional, Sequence
+
+from fastapi import HTTPException, Query, Response, status
+from fastapi.responses import ORJSONResponse
+
+Conversion = Optional[Callable[[Any], Any]]
+
+
+def or_empty(value: Optional[str]) -> str:
+    return value or ""
+
+
+class Proyeccion:
+    """Campo de salida -> (expresión SQL, conversión opcional del valor leído)."""
+
+    def __init__(self, campos: dict[str, tuple[Any, Conversion]]) -> None:
+        self.campos = campos
+        self.nombres = tuple(campos)
+
+    def fields_param(
+        self, fields: Optional[str] = Query(default=None, description="Campos separados por coma, p. ej. 'id,title'"),
+    ) -> Optional[tuple[str, ...]]:
+        """Dependencia: valida `?fields=` contra los campos de la proyección. None = todos."""
+        if fields is None:
+            return None
+        pedidos = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        desconocidos = [f for f in pedidos if f not in self.campos]
+        if desconocidos or not pedidos:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Campos desconocidos: {desconocidos}. Disponibles: {list(self.nombres)}",
+            )
+        return pedidos
+
+    def columnas(self, fields: Optional[Sequence[str]] = None) -> list[Any]:
+        return [self.campos[f][0] for f in (fields or self.nombres)]
+
+    def to_dicts(
+        self, rows: Iterable[Sequence[Any]], fields: Optional[Sequence[str]] = None, **conversiones: Conversion
+    ) -> list[dict[str, Any]]:
+        """Filas con las columnas de `columnas(fields)` al principio (se ignoran las extra) -> dicts.
+
+        `conversiones` reemplaza la conversión de un campo para esta llamada
+        (p. ej. `status` resuelto con la caché de estados).
+        """
+        fields = tuple(fields or self.nombres)
+        out = [dict(zip(fields, row)) for row in rows]
+        for f in fields:
+            conv = conversiones.get(f, self.campos[f][1])
+            if conv is not None:
+                for d in out:
+                    d[f] = conv(d[f])
+        return out
+
+
+def pick(items: list[dict[str, Any]], fields: Optional[Sequence[str]]) -> list[dict[str, Any]]:
+    """Recorta dicts ya serializados (listas cacheadas) a `fields`."""
+    if fields is None:
+        return items
+    return [{f: item[f] for f in fields} for item in items]
+
+
+def json_response(content: Any, response: Optional[Response] = None) -> ORJSONResponse:
+    """Respuesta codificada con orjson. Copia los headers que pusieron las dependencias (ETag)."""
+    headers = None
+    if response is not None:
+        headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    return ORJSONResponse(content, headers=headers)
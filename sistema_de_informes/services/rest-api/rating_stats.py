@@ -0,0 +1,138 @@
+"""
+Mantenimiento incremental de `report_rating_stats` (cantidad, suma, mín, máx
+por reporte).
+
+Los routers llaman a `registrar_puntuacion` antes de `db.commit()`, así el
+agregado se actualiza en la misma transacción que la puntuación. El promedio
+de un reporte pasa a ser una lectura por clave primaria en lugar de un
+recorrido de `puntuaciones`.
+
+Al arrancar, `ensure_rating_stats` llena la tabla si está vacía y ya hay
+puntuaciones (bases anteriores al agregado).
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from entities.puntuacion import Puntuacion
+from entities.resumen_puntuacion import ResumenPuntuacion
+
+
+def _bloquear(db: Session, ids: Iterable[int]) -> dict[int, ResumenPuntuacion]:
+    """Crea las filas que falten y las bloquea (FOR UPDATE) en orden de id.
+
+    `INSERT ... ON CONFLICT DO NOTHING` evita que dos primeras puntuaciones
+    concurrentes del mismo reporte inserten ambas la fila (IntegrityError):
+    la segunda no inserta nada y espera el lock de la primera.
+    """
+    ids = sorted(set(ids))
+    db.flush()  # los cambios pendientes del agregado no deben perderse con populate_existing
+    dialecto = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    db.execute(
+        dialecto.insert(ResumenPuntuacion)
+        .values([{"id_reporte": i, "cantidad": 0, "suma": 0} for i in ids])
+        .on_conflict_do_nothing(index_elements=["id_reporte"])
+    )
+    filas = (
+        db.query(ResumenPuntuacion)
+        .filter(ResumenPuntuacion.id_reporte.in_(ids))
+        .order_by(ResumenPuntuacion.id_reporte)
+        .with_for_update()
+        .populate_existing()
+        .all()
+    )
+    return {f.id_reporte: f for f in filas}
+
+
+def _recalcular(db: Session, stats: ResumenPuntuacion) -> None:
+    """Recalcula el agregado desde `puntuaciones` sólo para este reporte (usa idx_puntuaciones_reporte)."""
+    db.flush()
+    cantidad, suma, minimo, maximo = (
+        db.query(
+            func.count(Puntuacion.id_puntuacion),
+            func.coalesce(func.sum(Puntuacion.valor), 0),
+            func.min(Puntuacion.valor),
+            func.max(Puntuacion.valor),
+        )
+        .filter(Puntuacion.id_reporte == stats.id_reporte)
+        .one()
+    )
+    stats.cantidad, stats.suma, stats.minimo, stats.maximo = cantidad, suma, minimo, maximo
+
+
+def registrar_puntuacion(
+    db: Session, id_reporte: int, nuevo: Optional[int] = None, anterior: Optional[int] = None
+) -> ResumenPuntuacion:
+    """Aplica un alta (`nuevo`), baja (`anterior`) o cambio (ambos) al agregado del reporte.
+
+    Se llama después de `db.add`/`db.delete`/`setattr` sobre la puntuación y
+    antes de `db.commit()`; no hace commit por sí misma.
+    """
+    stats = _bloquear(db, [id_reporte])[id_reporte]
+
+    if anterior is not None and anterior in (stats.minimo, stats.maximo):
+        # Al quitar un extremo no se puede deducir el nuevo mín/máx: recalcular este reporte
+        _recalcular(db, stats)
+        return stats
+
+    if anterior is not None:
+        stats.cantidad -= 1
+        stats.suma -= anterior
+    if nuevo is not None:
+        stats.cantidad += 1
+        stats.suma += nuevo
+        stats.minimo = nuevo if stats.minimo is None else min(stats.minimo, nuevo)
+        stats.maximo = nuevo if stats.maximo is None else max(stats.maximo, nuevo)
+    return stats
+
+
+def registrar_lote(db: Session, valores_por_reporte: dict[int, list[int]]) -> None:
+    """Aplica un lote de altas con una sola actualización del agregado por reporte."""
+    if not valores_por_reporte:
+        return
+    filas = _bloquear(db, valores_por_reporte)
+    for id_reporte, valores in valores_por_reporte.items():
+        stats = filas[id_reporte]
+        stats.cantidad += len(valores)
+        stats.suma += sum(valores)
+        stats.minimo = min(valores) if stats.minimo is None else min(stats.minimo, *valores)
+        stats.maximo = max(valores) if stats.maximo is None else max(stats.maximo, *valores)
+
+
+def rebuild_rating_stats(db: Session) -> int:
+    """Reconstruye `report_rating_stats` completa desde `puntuaciones`. Devuelve filas escritas."""
+    db.query(ResumenPuntuacion).delete()
+    rows = (
+        db.query(
+            Puntuacion.id_reporte,
+            func.count(Puntuacion.id_puntuacion),
+            func.sum(Puntuacion.valor),
+            func.min(Puntuacion.valor),
+            func.max(Puntuacion.valor),
+        )
+        .group_by(Puntuacion.id_reporte)
+        .all()
+    )
+    db.add_all(
+        ResumenPuntuacion(id_reporte=id_reporte, cantidad=cantidad, suma=suma, minimo=minimo, maximo=maximo)
+        for id_reporte, cantidad, suma, minimo, maximo in rows
+    )
+    db.commit()
+    return len(rows)
+
+
+def ensure_rating_stats() -> None:
+    """Reconstruye el agregado si está vacío y `puntuaciones` no (igual que `ensure_search_index`)."""
+    with SessionLocal() as session:
+        if session.query(ResumenPuntuacion.id_reporte).first() is not None:
+            return
+        if session.query(Puntuacion.id_puntuacion).first() is None:
+            return
+        try:
+            rebuild_rating_stats(session)
+        except IntegrityError:
+            session.rollback()  # otro worker lo reconstruyó al mismo tiempo
@@ -0,0 +1,91 @@
+"""
+Caché en proceso para tablas de referencia (categorías, áreas, estados, roles,
+etiquetas).
+
+Una entrada se guarda con la versión de su tabla en `versiones_tabla` (la
+misma que alimenta el ETag) y sólo se sirve mientras esa versión no cambie:
+una escritura en otro worker o en un script invalida la entrada en todos los
+procesos. La versión se consulta (en la réplica del request) a lo sumo una vez
+cada REF_CACHE_POLL_SECONDS por tabla; entre consultas un acierto se responde
+desde memoria, sin ir a la base. Ese intervalo es la desactualización máxima
+ante escrituras de otros procesos.
+
+Además, los routers llaman a `invalidate()` después de escribir: descarta las
+entradas locales de inmediato y evita publicar una carga que corrió en
+paralelo con la escritura. El TTL sólo acota la desactualización ante
+escrituras con SQL directo, que no incrementan la versión.
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from table_versions import current_versions
+
+REF_CACHE_TTL_SECONDS = float(os.getenv("REF_CACHE_TTL_SECONDS", "300"))
+REF_CACHE_POLL_SECONDS = float(os.getenv("REF_CACHE_POLL_SECONDS", "1"))
+
+REFERENCE_TABLES = ("categorias", "areas", "estados_reporte", "roles", "etiquetas")
+
+_mu = threading.Lock()
+_versions: dict[str, int] = {table: 0 for table in REFERENCE_TABLES}
+# (tabla, clave) -> ((versión local, versión en la base), instante de carga, valor)
+_entries: dict[tuple[str, str], tuple[tuple[int, int], float, Any]] = {}
+# tabla -> (versión más nueva vista en la base, instante de la última consulta)
+_db_versions: dict[str, tuple[int, float]] = {}
+
+
+def version(table: str) -> int:
+    with _mu:
+        return _versions.get(table, 0)
+
+
+def invalidate(table: str) -> None:
+    """Marca la tabla como modificada: descarta sus entradas y sube la versión."""
+    with _mu:
+        _versions[table] = _versions.get(table, 0) + 1
+        for k in [k for k in _entries if k[0] == table]:
+            del _entries[k]
+
+
+def _observe(table: str, db_version: int, now: float) -> int:
+    """Registra una lectura de la versión; devuelve la más nueva vista (una réplica atrasada no la baja)."""
+    with _mu:
+        vista = max(_db_versions.get(table, (0, 0.0))[0], db_version)
+        _db_versions[table] = (vista, now)
+        return vista
+
+
+def _known_version(table: str, now: float) -> int:
+    with _mu:
+        vista, leida = _db_versions.get(table, (0, float("-inf")))
+    if now - leida < REF_CACHE_POLL_SECONDS:
+        return vista
+    return _observe(table, current_versions((table,)).get(table, 0), now)
+
+
+def get(table: str, key: str, loader: Callable[[], Any], db_version: Optional[int] = None) -> Any:
+    """Devuelve el valor cacheado para (tabla, clave) o lo carga con `loader()`.
+
+    `db_version` es la versión ya leída en el request (la de `etag_for`); sin
+    ella se usa la consultada cada REF_CACHE_POLL_SECONDS. El valor devuelto se
+    comparte entre requests: no debe modificarse.
+    """
+    now = time.monotonic()
+    vista = _known_version(table, now) if db_version is None else _observe(table, db_version, now)
+    with _mu:
+        local = _versions.get(table, 0)
+        entry = _entries.get((table, key))
+        if entry and entry[0][0] == local and entry[0][1] >= vista and now - entry[1] < REF_CACHE_TTL_SECONDS:
+            return entry[2]
+
+    # La versión se lee antes que los datos y del mismo origen: nunca es más nueva que lo cargado
+    if db_version is None:
+        db_version = current_versions((table,)).get(table, 0)
+        _observe(table, db_version, now)
+    value = loader()
+    with _mu:
+        # Sólo se publica si nadie escribió la tabla durante la carga
+        if _versions.get(table, 0) == local:
+            _entries[(table, key)] = ((local, db_version), now, value)
+    return value
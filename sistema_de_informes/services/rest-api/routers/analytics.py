@@ -0,0 +1,96 @@
+from fastapi import APIRouter, Query
+from sqlalchemy import func
+from db import ReadSessionLocal
+from entities.reporte import Reporte
+from entities.estado_reporte import EstadoReporte
+from entities.area import Area
+from entities.categoria import Categoria
+from entities.usuario import Usuario
+from entities.resumen_puntuacion import ResumenPuntuacion
+
+# Agregaciones calculadas en SQL (GROUP BY ... LIMIT): el tamaño de la respuesta
+# depende del número de grupos, no del número de reportes.
+router = APIRouter(prefix="/api/v1/analytics", tags=["Analytics"])
+
+# group_by -> (columna FK en reportes, catálogo, PK, nombre, etiqueta para NULL)
+_GROUPS = {
+    "state": (Reporte.id_estado, EstadoReporte, EstadoReporte.id_estado, EstadoReporte.nombre, "Sin estado"),
+    "area": (Reporte.id_area, Area, Area.id_area, Area.nombre_area, "Sin área"),
+    "category": (Reporte.id_categoria, Categoria, Categoria.id_categoria, Categoria.nombre, "Sin categoría"),
+}
+
+
+def _average(total, count) -> float | None:
+    return round(float(total) / count, 4) if count else None
+
+
+@router.get("/reports")
+def reports_count(group_by: str = Query(default="state", pattern="^(state|area|category)$")):
+    """Conteo de reportes agrupado por estado, área o categoría."""
+    fk_col, catalogo, pk_col, name_col, sin_grupo = _GROUPS[group_by]
+    with ReadSessionLocal() as session:
+        rows = (
+            session.query(fk_col, name_col, func.count(Reporte.id_reporte))
+            .outerjoin(catalogo, pk_col == fk_col)
+            .group_by(fk_col, name_col)
+            .order_by(func.count(Reporte.id_reporte).desc())
+            .all()
+        )
+        groups = [
+            {"id": id_, "name": nombre or sin_grupo, "count": count}
+            for id_, nombre, count in rows
+        ]
+        return {"group_by": group_by, "total": sum(g["count"] for g in groups), "groups": groups}
+
+
+@router.get("/top-users")
+def top_users(limit: int = Query(default=5, ge=1, le=100)):
+    """Usuarios con más reportes creados."""
+    with ReadSessionLocal() as session:
+        count = func.count(Reporte.id_reporte)
+        rows = (
+            session.query(Reporte.id_usuario, Usuario.nombre, count)
+            .outerjoin(Usuario, Usuario.id_usuario == Reporte.id_usuario)
+            .group_by(Reporte.id_usuario, Usuario.nombre)
+            .order_by(count.desc(), Reporte.id_usuario)
+            .limit(limit)
+            .all()
+        )
+        return [
+            {"user_id": user_id, "name": nombre or f"Usuario #{user_id}", "count": n}
+            for user_id, nombre, n in rows
+        ]
+
+
+@router.get("/ratings")
+def ratings_summary():
+    """Resumen global de puntuaciones: cantidad, promedio, mínimo y máximo.
+
+    Se lee de `report_rating_stats` (una fila por reporte puntuado), no de `puntuaciones`.
+    """
+    with ReadSessionLocal() as session:
+        count, total, minimo, maximo = session.query(
+            func.coalesce(func.sum(ResumenPuntuacion.cantidad), 0),
+            func.coalesce(func.sum(ResumenPuntuacion.suma), 0),
+            func.min(ResumenPuntuacion.minimo),
+            func.max(ResumenPuntuacion.maximo),
+        ).one()
+        return {"count": count, "average": _average(total, count), "min": minimo, "max": maximo}
+
+
+@router.get("/ratings/by-report")
+def ratings_by_report(limit: int = Query(default=10, ge=1, le=100)):
+    """Reportes con mejor promedio de puntuación."""
+    with ReadSessionLocal() as session:
+        avg = ResumenPuntuacion.suma * 1.0 / ResumenPuntuacion.cantidad
+        rows = (
+            session.query(ResumenPuntuacion)
+            .filter(ResumenPuntuacion.cantidad > 0)
+            .order_by(avg.desc(), ResumenPuntuacion.cantidad.desc(), ResumenPuntuacion.id_reporte)
+            .limit(limit)
+            .all()
+        )
+        return [
+            {"report_id": r.id_reporte, "count": r.cantidad, "average": r.promedio}
+            for r in rows
+        ]
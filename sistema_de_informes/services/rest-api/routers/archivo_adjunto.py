@@ -1,32 +1,273 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+import re
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import or_, update
 from sqlalchemy.orm import Session
-from db import get_db
+from starlette.concurrency import run_in_threadpool
+from db import get_async_db, get_db, get_read_db
 from entities.archivo_adjunto import ArchivoAdjunto
-from schemas.schemas import ArchivoAdjuntoCreate, ArchivoAdjuntoOut, ArchivoAdjuntoUpdate
+from entities.carga_archivo import CargaArchivo
+from entities.contenido_archivo import ContenidoArchivo
+from schemas.schemas import (
+    ArchivoAdjuntoCreate, ArchivoAdjuntoOut, ArchivoAdjuntoUpdate, CargaArchivoCreate, CargaArchivoOut,
+)
 from deps import Auth
 from entities.reporte import Reporte
+import blob_store
+import thumbnails
 
 router = APIRouter(prefix="/archivos", tags=["ArchivosAdjuntos"])
 
+_CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+
+def content_url(id_archivo: int) -> str:
+    return f"/archivos/{id_archivo}/contenido"
+
+
+def _crear_adjunto(db: Session, id_reporte: int, nombre: str, tipo: Optional[str], sha: str, tamano: int) -> ArchivoAdjuntoOut:
+    """Registra un adjunto que apunta a un blob del almacén local (sin commit).
+
+    Si es una imagen, encola la generación de miniaturas en la misma transacción.
+    """
+    obj = ArchivoAdjunto(id_reporte=id_reporte, nombre_archivo=nombre, tipo=tipo, url="")
+    obj.contenido = ContenidoArchivo(sha256=sha, tamano=tamano)
+    obj.variantes_archivo = []
+    db.add(obj); db.flush()
+    obj.url = content_url(obj.id_archivo)
+    thumbnails.enqueue(db, obj)
+    db.flush()
+    return ArchivoAdjuntoOut.model_validate(obj)
+
+
+def _carga_out(carga: CargaArchivo, recibido: int) -> CargaArchivoOut:
+    return CargaArchivoOut(
+        id_carga=carga.id_carga, recibido=recibido, tamano=carga.tamano, chunk_size=blob_store.BLOB_CHUNK_SIZE
+    )
+
+
 @router.get("", response_model=list[ArchivoAdjuntoOut])
-def listar(db: Session = Depends(get_db), user=Depends(Auth)):
+def listar(db: Session = Depends(get_read_db), user=Depends(Auth)):
     return db.query(ArchivoAdjunto).all()
 
 @router.post("", response_model=ArchivoAdjuntoOut, status_code=201)
 def crear(payload: ArchivoAdjuntoCreate, db: Session = Depends(get_db), user=Depends(Auth)):
     if not db.query(Reporte).get(payload.id_reporte):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Reporte no existe")
-    obj = ArchivoAdjunto(**payload.model_dict())
+    obj = ArchivoAdjunto(**payload.model_dump())
     db.add(obj); db.commit(); db.refresh(obj)
     return obj
 
+# ---- Subida por partes (reanudable) al almacén local ----
+
+@router.post("/uploads", response_model=CargaArchivoOut, status_code=201)
+async def iniciar_carga(payload: CargaArchivoCreate, db=Depends(get_async_db), user=Depends(Auth)):
+    """Abre una subida.
+
+    El contenido siempre se sube: conocer el `sha256` de un blob no da acceso
+    a él. La deduplicación ocurre al completar, con el hash calculado por el
+    servidor; el `sha256` enviado sólo se verifica contra los bytes recibidos.
+    """
+    if payload.tamano > blob_store.BLOB_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"El archivo supera el máximo de {blob_store.BLOB_MAX_BYTES} bytes")
+    if not await db.get(Reporte, payload.id_reporte):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Reporte no existe")
+    carga = CargaArchivo(
+        id_carga=uuid.uuid4().hex,
+        id_reporte=payload.id_reporte,
+        id_usuario=user.id_usuario,
+        nombre_archivo=payload.nombre_archivo,
+        tipo=payload.tipo,
+        tamano=payload.tamano,
+        sha256=payload.sha256,
+    )
+    await run_in_threadpool(blob_store.start_upload, carga.id_carga)
+    db.add(carga); await db.commit()
+    return _carga_out(carga, 0)
+
+async def _get_carga(db, id_carga: str, user) -> CargaArchivo:
+    carga = await db.get(CargaArchivo, id_carga)
+    if not carga or carga.id_usuario != user.id_usuario:
+        raise HTTPException(status_code=404, detail="Subida no encontrada")
+    return carga
+
+@router.get("/uploads/{id_carga}", response_model=CargaArchivoOut)
+async def estado_carga(id_carga: str, db=Depends(get_async_db), user=Depends(Auth)):
+    """Bytes ya recibidos: el cliente reanuda desde `recibido`."""
+    carga = await _get_carga(db, id_carga, user)
+    return _carga_out(carga, carga.recibido)
+
+def _conflicto(recibido: int) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=f"Se esperaba el byte {recibido}",
+        headers={"Upload-Offset": str(recibido)},
+    )
+
+async def _reservar(db, id_carga: str, inicio: int, actual: Optional[datetime] = None) -> Optional[datetime]:
+    """Reserva la escritura desde `inicio` (compare-and-set en la fila). Devuelve la reserva o None.
+
+    Sin `actual` sólo se reserva si nadie tiene una vigente; con `actual` se
+    renueva la propia (falla si otro la tomó al vencer).
+    """
+    now = datetime.utcnow()
+    hasta = now + timedelta(seconds=blob_store.BLOB_UPLOAD_LEASE_SECONDS)
+    libre = (
+        CargaArchivo.escribiendo_hasta == actual
+        if actual is not None
+        else or_(CargaArchivo.escribiendo_hasta.is_(None), CargaArchivo.escribiendo_hasta < now)
+    )
+    result = await db.execute(
+        update(CargaArchivo)
+        .where(CargaArchivo.id_carga == id_carga, CargaArchivo.recibido == inicio, libre)
+        .values(escribiendo_hasta=hasta, actualizado_en=now)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return hasta if result.rowcount == 1 else None
+
+async def _confirmar(db, id_carga: str, inicio: int, reserva: datetime, recibido: int) -> bool:
+    """Publica el nuevo offset y suelta la reserva (sólo si sigue siendo nuestra)."""
+    result = await db.execute(
+        update(CargaArchivo)
+        .where(
+            CargaArchivo.id_carga == id_carga,
+            CargaArchivo.recibido == inicio,
+            CargaArchivo.escribiendo_hasta == reserva,
+        )
+        .values(recibido=recibido, escribiendo_hasta=None, actualizado_en=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+@router.put("/uploads/{id_carga}", response_model=CargaArchivoOut)
+async def subir_parte(id_carga: str, request: Request, db=Depends(get_async_db), user=Depends(Auth)):
+    """Agrega una parte. `Content-Range: bytes <ini>-<fin>/<total>`; `ini` debe ser igual a `recibido`.
+
+    Una sola parte a la vez por subida, aunque los PUT lleguen a workers
+    distintos: la escritura se reserva en la fila de `cargas_archivo`; un PUT
+    concurrente o fuera de orden recibe 409 con `Upload-Offset`. Al recibir el
+    último byte el archivo pasa al almacén (deduplicado por SHA-256) y la
+    respuesta incluye el adjunto creado.
+    """
+    carga = await _get_carga(db, id_carga, user)
+    inicio = carga.recibido
+    header = request.headers.get("content-range")
+    if header:
+        m = _CONTENT_RANGE_RE.match(header)
+        if not m:
+            raise HTTPException(status_code=400, detail="Content-Range inválido")
+        inicio = int(m.group(1))
+        if m.group(3) != "*" and int(m.group(3)) != carga.tamano:
+            raise HTTPException(status_code=400, detail="El total no coincide con el tamaño declarado")
+    if inicio != carga.recibido:
+        raise _conflicto(carga.recibido)
+    reserva = await _reservar(db, id_carga, inicio)
+    if reserva is None:
+        await db.refresh(carga)
+        raise _conflicto(carga.recibido)
+
+    recibido = inicio
+    try:
+        # Descarta bytes de una escritura anterior que no llegó a confirmarse
+        await run_in_threadpool(blob_store.resume_upload, id_carga, inicio)
+        async with await anyio.open_file(blob_store.upload_path(id_carga), "ab") as fh:
+            async for chunk in request.stream():
+                if recibido + len(chunk) > carga.tamano:
+                    raise HTTPException(status_code=413, detail="La parte excede el tamaño declarado")
+                await fh.write(chunk)
+                recibido += len(chunk)
+                if reserva - datetime.utcnow() < timedelta(seconds=blob_store.BLOB_UPLOAD_LEASE_SECONDS / 2):
+                    reserva = await _reservar(db, id_carga, inicio, actual=reserva)
+                    if reserva is None:
+                        raise _conflicto(inicio)
+    except FileNotFoundError:
+        await _confirmar(db, id_carga, inicio, reserva, inicio)
+        raise HTTPException(status_code=404, detail="Subida no encontrada")
+    except BaseException:
+        if reserva is not None:
+            await _confirmar(db, id_carga, inicio, reserva, inicio)
+        raise
+
+    if recibido < carga.tamano:
+        if not await _confirmar(db, id_carga, inicio, reserva, recibido):
+            raise _conflicto(inicio)
+        return _carga_out(carga, recibido)
+
+    sha = await run_in_threadpool(blob_store.file_sha256, blob_store.upload_path(id_carga))
+    if carga.sha256 and carga.sha256 != sha:
+        await db.delete(carga); await db.commit()
+        await run_in_threadpool(blob_store.discard_upload, id_carga)
+        raise HTTPException(status_code=422, detail="El contenido subido no coincide con el sha256 declarado")
+    await db.run_sync(blob_store.lock_blobs, {sha})
+    _, existia = await run_in_threadpool(blob_store.commit_upload, id_carga, sha)
+    archivo = await db.run_sync(
+        _crear_adjunto, carga.id_reporte, carga.nombre_archivo, carga.tipo, sha, carga.tamano
+    )
+    await db.delete(carga)
+    await db.commit()
+    out = _carga_out(carga, recibido)
+    out.archivo = archivo
+    out.deduplicado = existia
+    return out
+
+@router.delete("/uploads/{id_carga}", status_code=204)
+async def cancelar_carga(id_carga: str, db=Depends(get_async_db), user=Depends(Auth)):
+    carga = await _get_carga(db, id_carga, user)
+    await db.delete(carga); await db.commit()
+    await run_in_threadpool(blob_store.discard_upload, id_carga)
+    return None
+
+# ---- CRUD por id ----
+
 @router.get("/{id_archivo}", response_model=ArchivoAdjuntoOut)
-def obtener(id_archivo: int, db: Session = Depends(get_db), user=Depends(Auth)):
+def obtener(id_archivo: int, db: Session = Depends(get_read_db), user=Depends(Auth)):
     obj = db.query(ArchivoAdjunto).get(id_archivo)
     if not obj:
         raise HTTPException(status_code=404, detail="ArchivosAdjuntos no encontrado")
     return obj
 
+@router.get("/{id_archivo}/contenido")
+def descargar(
+    id_archivo: int,
+    request: Request,
+    variante: Optional[str] = Query(default=None, description="'thumb' o 'web' (ver `variantes` del adjunto)"),
+    db: Session = Depends(get_read_db),
+    user=Depends(Auth),
+):
+    """Contenido del adjunto desde el almacén local, con soporte de `Range` e `If-None-Match`."""
+    obj = db.get(ArchivoAdjunto, id_archivo)
+    if not obj or not obj.contenido:
+        raise HTTPException(status_code=404, detail="El adjunto no tiene contenido local")
+    sha, tipo, nombre = obj.contenido.sha256, obj.tipo or None, obj.nombre_archivo
+    if variante is not None:
+        v = next((v for v in obj.variantes_archivo if v.nombre == variante), None)
+        if v is None:
+            raise HTTPException(status_code=404, detail="Variante no disponible (puede estar generándose)")
+        sha, tipo = v.sha256, v.tipo
+        nombre = f"{os.path.splitext(nombre)[0]}-{variante}.{tipo.rsplit('/', 1)[-1]}"
+    etag = f'"{sha}"'
+    headers = {"etag": etag, "cache-control": "private, max-age=86400"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    path = blob_store.blob_path(sha)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Contenido no disponible")
+    return blob_store.RangeFileResponse(
+        path,
+        range_header=request.headers.get("range"),
+        headers=headers,
+        media_type=tipo,
+        filename=nombre,
+        content_disposition_type="inline",
+    )
+
 @router.put("/{id_archivo}", response_model=ArchivoAdjuntoOut)
 def actualizar(id_archivo: int, payload: ArchivoAdjuntoUpdate, db: Session = Depends(get_db), user=Depends(Auth)):
     obj = db.query(ArchivoAdjunto).get(id_archivo)
@@ -43,5 +284,7 @@ def eliminar(id_archivo: int, db: Session = Depends(get_db), user=Depends(Auth))
     obj = db.query(ArchivoAdjunto).get(id_archivo)
     if not obj:
         raise HTTPException(status_code=404, detail="ArchivosAdjuntos no encontrado")
+    shas = obj.blob_shas
     db.delete(obj); db.commit()
+    blob_store.release_unused(db, shas)
     return None
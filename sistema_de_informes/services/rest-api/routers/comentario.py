@@ -1,36 +1,57 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from db import get_db
+from db import get_async_db, get_db, get_read_db
 from entities.comentario import Comentario
-from schemas.schemas import ComentarioCreate, ComentarioOut, ComentarioUpdate
+from schemas.schemas import ComentarioBulkCreate, ComentarioCreate, ComentarioOut, ComentarioUpdate
 from deps import Auth
 from entities.reporte import Reporte
-from ws_notifier import notify_comment_added  # 🔥 WebSocket notifier
+from ws_notifier import notify_comment_added, notify_comments_imported  # 🔥 WebSocket notifier
+from bulk import require_existing
+from search import index_reports
 
 router = APIRouter(prefix="/comentarios", tags=["Comentarios"])
 
 @router.get("", response_model=list[ComentarioOut])
-def listar(db: Session = Depends(get_db), user=Depends(Auth)):
+def listar(db: Session = Depends(get_read_db), user=Depends(Auth)):
     return db.query(Comentario).all()
 
 @router.post("", response_model=ComentarioOut, status_code=201)
-async def crear(payload: ComentarioCreate, db: Session = Depends(get_db), user=Depends(Auth)):
-    if not db.query(Reporte).get(payload.id_reporte):
+async def crear(payload: ComentarioCreate, db=Depends(get_async_db), user=Depends(Auth)):
+    if not await db.get(Reporte, payload.id_reporte):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Reporte no existe")
     obj = Comentario(
         id_usuario=user.id_usuario,
         id_reporte=payload.id_reporte,
         contenido=payload.contenido
     )
-    db.add(obj); db.commit(); db.refresh(obj)
-    
-    # 🔥 NOTIFICAR AL WEBSOCKET
-    await notify_comment_added(obj.id_reporte, obj.id_comentario, obj.contenido)
-    
+    db.add(obj); await db.flush()
+    await db.run_sync(index_reports, [obj.id_reporte])
+
+    # 🔥 NOTIFICAR AL WEBSOCKET (outbox: se guarda con el comentario y se entrega tras el commit)
+    await notify_comment_added(obj.id_reporte, obj.id_comentario, obj.contenido, db=db)
+
+    await db.commit(); await db.refresh(obj)
     return obj
 
+@router.post("/bulk", response_model=list[ComentarioOut], status_code=201)
+async def crear_lote(payload: ComentarioBulkCreate, db=Depends(get_async_db), user=Depends(Auth)):
+    await db.run_sync(require_existing, Reporte.id_reporte, [i.id_reporte for i in payload.items], "Reporte")
+    objs = [
+        Comentario(id_usuario=user.id_usuario, id_reporte=i.id_reporte, contenido=i.contenido)
+        for i in payload.items
+    ]
+    db.add_all(objs); await db.flush()
+    out = [ComentarioOut.model_validate(obj) for obj in objs]
+    await db.run_sync(index_reports, {c.id_reporte for c in out})
+
+    # 🔥 Una sola notificación para todo el lote
+    await notify_comments_imported(len(out), sorted({c.id_reporte for c in out}), db=db)
+
+    await db.commit()
+    return out
+
 @router.get("/{id_comentario}", response_model=ComentarioOut)
-def obtener(id_comentario: int, db: Session = Depends(get_db), user=Depends(Auth)):
+def obtener(id_comentario: int, db: Session = Depends(get_read_db), user=Depends(Auth)):
     obj = db.query(Comentario).get(id_comentario)
     if not obj:
         raise HTTPException(status_code=404, detail="Comentario no encontrado")
@@ -44,6 +65,7 @@ def actualizar(id_comentario: int, payload: ComentarioUpdate, db: Session = Depe
     data = payload.model_dump(exclude_unset=True)
     for k, v in data.items():
         setattr(obj, k, v)
+    index_reports(db, [obj.id_reporte])
     db.commit(); db.refresh(obj)
     return obj
 
@@ -52,5 +74,7 @@ def eliminar(id_comentario: int, db: Session = Depends(get_db), user=Depends(Aut
     obj = db.query(Comentario).get(id_comentario)
     if not obj:
         raise HTTPException(status_code=404, detail="Comentario no encontrado")
-    db.delete(obj); db.commit()
+    db.delete(obj)
+    index_reports(db, [obj.id_reporte])
+    db.commit()
     return None
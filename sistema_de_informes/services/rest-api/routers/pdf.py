@@ -1,17 +1,120 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-import io
-from PyPDF2 import PdfReader
+import contextlib
+import json
+import os
+from typing import AsyncIterator, Callable, Optional
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, Header, Query, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+
+import pdf_cache
+import pdf_extractor
+from pdf_extractor import iter_pages, parse_page_range, plan_pages, save_upload
+
+# Margen para los delimitadores y headers del multipart alrededor del archivo
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class _LimitedUploadRoute(APIRoute):
+    """Rechaza por `Content-Length` antes de que Starlette vuelque el multipart a disco.
+
+    Sin `Content-Length` (chunked) el cuerpo se recibe completo y el límite lo
+    aplica `save_upload` al copiarlo.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def limited(request: Request):
+            declarado = request.headers.get("content-length", "")
+            if declarado.isdigit() and int(declarado) > pdf_extractor.PDF_MAX_BYTES + MULTIPART_OVERHEAD_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"El PDF supera el máximo de {pdf_extractor.PDF_MAX_BYTES} bytes",
+                )
+            return await handler(request)
+
+        return limited
+
+
+router = APIRouter(prefix="/api/v1", tags=["pdf"], route_class=_LimitedUploadRoute)
+
+
+def _borrar(path: str) -> None:
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
+
+
+async def _cached_pages(start: int, textos: list[str]) -> AsyncIterator[tuple[int, str]]:
+    for offset, texto in enumerate(textos):
+        yield start + offset + 1, texto
 
-router = APIRouter(prefix="/api/v1", tags=["pdf"])
 
 @router.post("/pdf/extract")
-async def extract_text_from_pdf(file: UploadFile = File(...)):
+async def extract_text_from_pdf(
+    file: UploadFile = File(...),
+    pages: Optional[str] = Query(default=None, description="Rango base 1, p. ej. '3-7'"),
+    format: Optional[str] = Query(default=None, pattern="^(json|ndjson)$"),
+    accept: Optional[str] = Header(default=None),
+):
+    """Extrae el texto del PDF en un pool de procesos.
+
+    Por defecto responde `{"text", "pages"}`. Con `format=ndjson` (o
+    `Accept: application/x-ndjson`) transmite una línea `{"page", "text"}`
+    por página a medida que se extraen. El resultado se cachea por SHA-256
+    del archivo; `X-Cache: HIT|MISS` indica si se reutilizó.
+    """
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Solo se permiten archivos PDF")
+    page_range = parse_page_range(pages)
+    path, sha = await save_upload(file)
+    try:
+        hit = await run_in_threadpool(pdf_cache.lookup, sha, page_range)
+        if hit is None:
+            start, end, total = await plan_pages(path, page_range)
+    except BaseException:
+        os.unlink(path)
+        raise
+    if hit is not None:
+        # El temporal ya no hace falta: el texto sale de la caché
+        os.unlink(path)
+        total, start, end, textos = hit
+        paginas = _cached_pages(start, textos)
+    else:
+        paginas = iter_pages(path, start, end)
+    headers = {"X-Cache": "HIT" if hit else "MISS", "X-Content-SHA256": sha, "X-PDF-Total-Pages": str(total)}
+
+    async def extraer() -> AsyncIterator[tuple[int, str]]:
+        """Recorre las páginas y, si se extrajeron todas sin error, las guarda en caché."""
+        extraidas: list[str] = []
+        try:
+            async for numero, texto in paginas:
+                extraidas.append(texto)
+                yield numero, texto
+            if hit is None:
+                await run_in_threadpool(pdf_cache.store, sha, total, start, end, extraidas)
+        finally:
+            if hit is None:
+                _borrar(path)
+
+    stream = format == "ndjson" or (format is None and "application/x-ndjson" in (accept or ""))
+    if stream:
+        async def body():
+            try:
+                async for numero, texto in extraer():
+                    yield json.dumps({"page": numero, "text": texto}, ensure_ascii=False) + "\n"
+            except Exception as e:
+                # El status ya se envió: el error viaja como última línea
+                yield json.dumps({"error": f"Error al procesar PDF: {e}"}, ensure_ascii=False) + "\n"
+
+        # La tarea de fondo corre aunque el cliente se desconecte antes de que empiece el streaming
+        limpieza = BackgroundTask(_borrar, path) if hit is None else None
+        return StreamingResponse(body(), media_type="application/x-ndjson", headers=headers, background=limpieza)
+
     try:
-        contents = await file.read()
-        reader = PdfReader(io.BytesIO(contents))
-        text = "\n".join(page.extract_text() or '' for page in reader.pages)
-        return {"text": text}
+        textos = [texto async for _, texto in extraer()]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al procesar PDF: {str(e)}")
+    return JSONResponse({"text": "\n".join(textos), "pages": len(textos)}, headers=headers)
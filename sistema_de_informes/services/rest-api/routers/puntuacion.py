@@ -1,36 +1,61 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from db import get_db
+from db import get_async_db, get_db, get_read_db
 from entities.puntuacion import Puntuacion
-from schemas.schemas import PuntuacionCreate, PuntuacionOut, PuntuacionUpdate
+from schemas.schemas import PuntuacionBulkCreate, PuntuacionCreate, PuntuacionOut, PuntuacionUpdate
 from deps import Auth
 from entities.reporte import Reporte
-from ws_notifier import notify_rating_added  # 🔥 WebSocket notifier
+from ws_notifier import notify_rating_added, notify_ratings_imported  # 🔥 WebSocket notifier
+from rating_stats import registrar_lote, registrar_puntuacion
+from bulk import require_existing
 
 router = APIRouter(prefix="/puntuaciones", tags=["Puntuaciones"])
 
 @router.get("", response_model=list[PuntuacionOut])
-def listar(db: Session = Depends(get_db), user=Depends(Auth)):
+def listar(db: Session = Depends(get_read_db), user=Depends(Auth)):
     return db.query(Puntuacion).all()
 
 @router.post("", response_model=PuntuacionOut, status_code=201)
-async def crear(payload: PuntuacionCreate, db: Session = Depends(get_db), user=Depends(Auth)):
-    if not db.query(Reporte).get(payload.id_reporte):
+async def crear(payload: PuntuacionCreate, db=Depends(get_async_db), user=Depends(Auth)):
+    if not await db.get(Reporte, payload.id_reporte):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Reporte no existe")
     obj = Puntuacion(
         id_usuario=user.id_usuario,
         id_reporte=payload.id_reporte,
         valor=payload.valor
     )
-    db.add(obj); db.commit(); db.refresh(obj)
-    
-    # 🔥 NOTIFICAR AL WEBSOCKET
-    await notify_rating_added(obj.id_reporte, obj.valor)
-    
+    db.add(obj)
+    stats = await db.run_sync(registrar_puntuacion, obj.id_reporte, nuevo=obj.valor)
+
+    # 🔥 NOTIFICAR AL WEBSOCKET (outbox: se guarda con la puntuación y se entrega tras el commit)
+    await notify_rating_added(obj.id_reporte, obj.valor, average=stats.promedio, db=db)
+
+    await db.commit(); await db.refresh(obj)
     return obj
 
+@router.post("/bulk", response_model=list[PuntuacionOut], status_code=201)
+async def crear_lote(payload: PuntuacionBulkCreate, db=Depends(get_async_db), user=Depends(Auth)):
+    await db.run_sync(require_existing, Reporte.id_reporte, [i.id_reporte for i in payload.items], "Reporte")
+    objs = [
+        Puntuacion(id_usuario=user.id_usuario, id_reporte=i.id_reporte, valor=i.valor)
+        for i in payload.items
+    ]
+    db.add_all(objs)
+    valores: dict[int, list[int]] = {}
+    for obj in objs:
+        valores.setdefault(obj.id_reporte, []).append(obj.valor)
+    await db.run_sync(registrar_lote, valores)
+    await db.flush()
+    out = [PuntuacionOut.model_validate(obj) for obj in objs]
+
+    # 🔥 Una sola notificación para todo el lote
+    await notify_ratings_imported(len(out), sorted(valores), db=db)
+
+    await db.commit()
+    return out
+
 @router.get("/{id_puntuacion}", response_model=PuntuacionOut)
-def obtener(id_puntuacion: int, db: Session = Depends(get_db), user=Depends(Auth)):
+def obtener(id_puntuacion: int, db: Session = Depends(get_read_db), user=Depends(Auth)):
     obj = db.query(Puntuacion).get(id_puntuacion)
     if not obj:
         raise HTTPException(status_code=404, detail="Puntuación no encontrada")
@@ -41,9 +66,12 @@ def actualizar(id_puntuacion: int, payload: PuntuacionUpdate, db: Session = Depe
     obj = db.query(Puntuacion).get(id_puntuacion)
     if not obj:
         raise HTTPException(status_code=404, detail="Puntuación no encontrada")
+    anterior = obj.valor
     data = payload.model_dump(exclude_unset=True)
     for k, v in data.items():
         setattr(obj, k, v)
+    if obj.valor != anterior:
+        registrar_puntuacion(db, obj.id_reporte, nuevo=obj.valor, anterior=anterior)
     db.commit(); db.refresh(obj)
     return obj
 
@@ -52,5 +80,7 @@ def eliminar(id_puntuacion: int, db: Session = Depends(get_db), user=Depends(Aut
     obj = db.query(Puntuacion).get(id_puntuacion)
     if not obj:
         raise HTTPException(status_code=404, detail="Puntuación no encontrada")
-    db.delete(obj); db.commit()
+    db.delete(obj)
+    registrar_puntuacion(db, obj.id_reporte, anterior=obj.valor)
+    db.commit()
     return None
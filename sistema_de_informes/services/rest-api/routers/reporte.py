@@ -1,29 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from db import get_db
+from db import get_async_db, get_db, get_read_db
 from entities.reporte import Reporte
-from schemas.schemas import ReporteCreate, ReporteOut, ReporteUpdate
+from schemas.schemas import ReporteBulkCreate, ReporteCreate, ReporteOut, ReportePage, ReporteUpdate
 from deps import Auth
 from entities.categoria import Categoria
 from entities.area import Area
 from entities.estado_reporte import EstadoReporte
-from ws_notifier import notify_new_report, notify_update_report  # 🔥 WebSocket notifier
+from ws_notifier import notify_new_report, notify_reports_imported, notify_update_report  # 🔥 WebSocket notifier
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page
+from bulk import require_existing
+from search import index_reports, remove_reports
+import blob_store
 
 router = APIRouter(prefix="/reportes", tags=["Reportes"])
 
-@router.get("", response_model=list[ReporteOut])
-def listar(db: Session = Depends(get_db), user=Depends(Auth)):
-    return db.query(Reporte).all()
+@router.get("", response_model=list[ReporteOut] | ReportePage)
+def listar(
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    user=Depends(Auth),
+):
+    # Sin limit/cursor se mantiene la lista completa; con ellos, página por cursor
+    if limit is None and cursor is None:
+        return db.query(Reporte).all()
+    items, next_cursor = keyset_page(
+        db.query(Reporte), Reporte.creado_en, Reporte.id_reporte, cursor, limit or DEFAULT_PAGE_SIZE
+    )
+    return ReportePage(items=items, next_cursor=next_cursor)
 
-@router.post("", response_model=ReporteOut, status_code=201)
-async def crear(payload: ReporteCreate, db: Session = Depends(get_db), user=Depends(Auth)):
-    # Validaciones de integridad referencial
-    if payload.id_categoria is not None and not db.query(Categoria).get(payload.id_categoria):
+async def _validar_referencias(db, payload) -> None:
+    """Integridad referencial de los campos enviados (sesión asíncrona)."""
+    if payload.id_categoria is not None and not await db.get(Categoria, payload.id_categoria):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Categoria no existe")
-    if payload.id_area is not None and not db.query(Area).get(payload.id_area):
+    if payload.id_area is not None and not await db.get(Area, payload.id_area):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Area no existe")
-    if payload.id_estado is not None and not db.query(EstadoReporte).get(payload.id_estado):
+    if payload.id_estado is not None and not await db.get(EstadoReporte, payload.id_estado):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Estado de reporte no existe")
+
+@router.post("", response_model=ReporteOut, status_code=201)
+async def crear(payload: ReporteCreate, db=Depends(get_async_db), user=Depends(Auth)):
+    await _validar_referencias(db, payload)
     rep = Reporte(
         id_usuario=user.id_usuario,
         titulo=payload.titulo,
@@ -33,40 +52,57 @@ async def crear(payload: ReporteCreate, db: Session = Depends(get_db), user=Depe
         id_area=payload.id_area,
         id_estado=payload.id_estado
     )
-    db.add(rep); db.commit(); db.refresh(rep)
-    
-    # 🔥 NOTIFICAR AL WEBSOCKET
-    await notify_new_report(rep.id_reporte, rep.titulo)
-    
+    db.add(rep); await db.flush()
+    await db.run_sync(index_reports, [rep.id_reporte])
+
+    # 🔥 NOTIFICAR AL WEBSOCKET (outbox: se guarda con el reporte y se entrega tras el commit)
+    await notify_new_report(rep.id_reporte, rep.titulo, db=db)
+
+    await db.commit(); await db.refresh(rep)
     return rep
 
+@router.post("/bulk", response_model=list[ReporteOut], status_code=201)
+async def crear_lote(payload: ReporteBulkCreate, db=Depends(get_async_db), user=Depends(Auth)):
+    # Integridad referencial del lote completo: una consulta IN por tabla
+    await db.run_sync(require_existing, Categoria.id_categoria, [i.id_categoria for i in payload.items], "Categoria")
+    await db.run_sync(require_existing, Area.id_area, [i.id_area for i in payload.items], "Area")
+    await db.run_sync(require_existing, EstadoReporte.id_estado, [i.id_estado for i in payload.items], "Estado de reporte")
+    reps = [Reporte(id_usuario=user.id_usuario, **item.model_dump()) for item in payload.items]
+    db.add_all(reps); await db.flush()
+    # Serializar antes del commit evita un SELECT por fila al expirar los objetos
+    out = [ReporteOut.model_validate(rep) for rep in reps]
+    await db.run_sync(index_reports, [rep.id_reporte for rep in out])
+
+    # 🔥 Una sola notificación para todo el lote
+    await notify_reports_imported([rep.id_reporte for rep in out], db=db)
+
+    await db.commit()
+    return out
+
 @router.get("/{id_reporte}", response_model=ReporteOut)
-def obtener(id_reporte: int, db: Session = Depends(get_db), user=Depends(Auth)):
+def obtener(id_reporte: int, db: Session = Depends(get_read_db), user=Depends(Auth)):
     rep = db.query(Reporte).get(id_reporte)
     if not rep:
         raise HTTPException(status_code=404, detail="Reporte no encontrado")
     return rep
 
 @router.put("/{id_reporte}", response_model=ReporteOut)
-async def actualizar(id_reporte: int, payload: ReporteUpdate, db: Session = Depends(get_db), user=Depends(Auth)):
-    rep = db.query(Reporte).get(id_reporte)
+async def actualizar(id_reporte: int, payload: ReporteUpdate, db=Depends(get_async_db), user=Depends(Auth)):
+    rep = await db.get(Reporte, id_reporte)
     if not rep:
         raise HTTPException(status_code=404, detail="Reporte no encontrado")
     # Validaciones de integridad referencial para campos enviados
-    if payload.id_categoria is not None and not db.query(Categoria).get(payload.id_categoria):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Categoria no existe")
-    if payload.id_area is not None and not db.query(Area).get(payload.id_area):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Area no existe")
-    if payload.id_estado is not None and not db.query(EstadoReporte).get(payload.id_estado):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Estado de reporte no existe")
+    await _validar_referencias(db, payload)
     data = payload.model_dump(exclude_unset=True)
     for k, v in data.items():
         setattr(rep, k, v)
-    db.commit(); db.refresh(rep)
-    
-    # 🔥 NOTIFICAR AL WEBSOCKET
-    await notify_update_report(rep.id_reporte, rep.titulo)
-    
+    if data.keys() & {"titulo", "descripcion"}:
+        await db.run_sync(index_reports, [rep.id_reporte])
+
+    # 🔥 NOTIFICAR AL WEBSOCKET (outbox)
+    await notify_update_report(rep.id_reporte, rep.titulo, db=db)
+
+    await db.commit(); await db.refresh(rep)
     return rep
 
 @router.delete("/{id_reporte}", status_code=204)
@@ -74,5 +110,9 @@ def eliminar(id_reporte: int, db: Session = Depends(get_db), user=Depends(Auth))
     rep = db.query(Reporte).get(id_reporte)
     if not rep:
         raise HTTPException(status_code=404, detail="Reporte no encontrado")
-    db.delete(rep); db.commit()
+    shas = set().union(*(a.blob_shas for a in rep.archivos))
+    db.delete(rep)
+    remove_reports(db, [id_reporte])
+    db.commit()
+    blob_store.release_unused(db, shas)
     return None
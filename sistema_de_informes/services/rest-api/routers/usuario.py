@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from db import get_db
+from db import get_db, get_read_db
 from entities.usuario import Usuario
 from schemas.schemas import UsuarioOut, UsuarioUpdate
-from deps import Auth
+from deps import Auth, invalidate_principal
 from entities.rol import Rol
 from entities.reporte import Reporte
 from entities.comentario import Comentario
@@ -12,11 +12,11 @@ from entities.puntuacion import Puntuacion
 router = APIRouter(prefix="/usuarios", tags=["Usuarios"])
 
 @router.get("", response_model=list[UsuarioOut])
-def listar(db: Session = Depends(get_db), user=Depends(Auth)):
+def listar(db: Session = Depends(get_read_db), user=Depends(Auth)):
     return db.query(Usuario).all()
 
 @router.get("/{id_usuario}", response_model=UsuarioOut)
-def obtener(id_usuario: int, db: Session = Depends(get_db), user=Depends(Auth)):
+def obtener(id_usuario: int, db: Session = Depends(get_read_db), user=Depends(Auth)):
     u = db.query(Usuario).get(id_usuario)
     if not u:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
@@ -34,6 +34,7 @@ def actualizar(id_usuario: int, payload: UsuarioUpdate, db: Session = Depends(ge
     for k, v in data.items():
         setattr(u, k, v)
     db.commit(); db.refresh(u)
+    invalidate_principal(id_usuario=u.id_usuario)
     return u
 
 @router.delete("/{id_usuario}", status_code=204)
@@ -47,4 +48,5 @@ def eliminar(id_usuario: int, db: Session = Depends(get_db), user=Depends(Auth))
        db.query(Puntuacion).filter(Puntuacion.id_usuario == id_usuario).first():
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="No se puede eliminar el usuario: existen registros relacionados")
     db.delete(u); db.commit()
+    invalidate_principal(id_usuario=id_usuario)
     return None
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional
 from datetime import datetime
+from bulk import BULK_MAX_ITEMS
 
 # ---- Roles ----
 class RolCreate(BaseModel):
@@ -130,6 +131,11 @@ class ReporteOut(BaseModel):
     id_estado: Optional[int]
     creado_en: datetime
     class Config: from_attributes = True
+class ReportePage(BaseModel):
+    items: list[ReporteOut]
+    next_cursor: Optional[str] = None
+class ReporteBulkCreate(BaseModel):
+    items: list[ReporteCreate] = Field(min_length=1, max_length=BULK_MAX_ITEMS)
 
 # ---- ArchivoAdjunto ----
 class ArchivoAdjuntoCreate(BaseModel):
@@ -147,12 +153,32 @@ class ArchivoAdjuntoOut(BaseModel):
     nombre_archivo: str
     tipo: Optional[str]
     url: str
+    sha256: Optional[str] = None  # sólo adjuntos guardados en el almacén local
+    tamano: Optional[int] = None
+    variantes: dict[str, str] = {}  # {"thumb": url, "web": url} cuando ya se generaron
     class Config: from_attributes = True
 
+# ---- Subida por partes de adjuntos ----
+class CargaArchivoCreate(BaseModel):
+    id_reporte: int
+    nombre_archivo: str
+    tipo: Optional[str] = None
+    tamano: int = Field(ge=1)
+    sha256: Optional[str] = Field(default=None, pattern="^[0-9a-f]{64}$")  # se verifica contra lo subido
+class CargaArchivoOut(BaseModel):
+    id_carga: Optional[str] = None
+    recibido: int
+    tamano: int
+    chunk_size: int
+    archivo: Optional[ArchivoAdjuntoOut] = None  # presente al completarse
+    deduplicado: bool = False  # el contenido ya estaba en el almacén (no ocupa espacio extra)
+
 # ---- Comentario ----
 class ComentarioCreate(BaseModel):
     id_reporte: int
     contenido: str
+class ComentarioBulkCreate(BaseModel):
+    items: list[ComentarioCreate] = Field(min_length=1, max_length=BULK_MAX_ITEMS)
 class ComentarioUpdate(BaseModel):
     contenido: Optional[str] = None
 class ComentarioOut(BaseModel):
@@ -167,6 +193,8 @@ class ComentarioOut(BaseModel):
 class PuntuacionCreate(BaseModel):
     id_reporte: int
     valor: int = Field(ge=1, le=5)
+class PuntuacionBulkCreate(BaseModel):
+    items: list[PuntuacionCreate] = Field(min_length=1, max_length=BULK_MAX_ITEMS)
 class PuntuacionUpdate(BaseModel):
     valor: Optional[int] = Field(default=None, ge=1, le=5)
 class PuntuacionOut(BaseModel):
@@ -0,0 +1,225 @@
+"""
+Búsqueda de texto completo sobre reportes (título, descripción y comentarios).
+
+Un documento por reporte en un índice invertido:
+
+- SQLite (modo local): tabla virtual FTS5 `reportes_fts` (rowid = id_reporte),
+  ranking BM25 con pesos título > descripción > comentarios y `snippet()`.
+- Postgres: tabla `reportes_busqueda` con columna `tsvector` ponderada
+  (A/B/C) e índice GIN; ranking `ts_rank_cd` y `ts_headline`.
+
+Los routers de reportes y comentarios llaman a `index_reports` /
+`remove_reports` antes del commit, así el índice cambia en la misma
+transacción que los datos. `rebuild_search_index` lo reconstruye completo
+(scripts/rebuild_search_index.py).
+
+La paginación es por cursor sobre (score, id_reporte); los snippets se
+calculan sólo para las filas de la página.
+"""
+import base64
+import json
+import os
+import re
+from typing import Any, Iterable, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from db import SessionLocal, engine, is_sqlite
+
+# Configuración de texto de Postgres (stemming y stopwords); viaja como parámetro `:cfg`
+SEARCH_TS_CONFIG = os.getenv("SEARCH_TS_CONFIG", "spanish")
+_CFG = "CAST(:cfg AS regconfig)"
+SNIPPET_START, SNIPPET_STOP = "<b>", "</b>"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def ensure_search_index() -> None:
+    """Crea el índice si no existe y lo llena la primera vez."""
+    with engine.begin() as conn:
+        if is_sqlite:
+            existe = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reportes_fts'")
+            ).first()
+            if existe:
+                return
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE reportes_fts USING fts5("
+                "titulo, descripcion, comentarios, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            ))
+        else:
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS reportes_busqueda ("
+                "id_reporte integer PRIMARY KEY REFERENCES reportes(id_reporte) ON DELETE CASCADE, "
+                "documento tsvector NOT NULL)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS idx_reportes_busqueda_documento "
+                "ON reportes_busqueda USING gin(documento)"
+            ))
+            if conn.execute(text("SELECT 1 FROM reportes_busqueda LIMIT 1")).first():
+                return
+    with SessionLocal() as session:
+        rebuild_search_index(session)
+
+
+def _sqlite_upsert(ids_filter: str) -> str:
+    return (
+        "INSERT INTO reportes_fts (rowid, titulo, descripcion, comentarios) "
+        "SELECT r.id_reporte, r.titulo, coalesce(r.descripcion, ''), "
+        "coalesce((SELECT group_concat(c.contenido, ' ') FROM comentarios c "
+        "WHERE c.id_reporte = r.id_reporte), '') "
+        f"FROM reportes r {ids_filter}"
+    )
+
+
+def _pg_upsert(ids_filter: str) -> str:
+    return (
+        "INSERT INTO reportes_busqueda (id_reporte, documento) "
+        "SELECT r.id_reporte, "
+        f"setweight(to_tsvector({_CFG}, r.titulo), 'A') || "
+        f"setweight(to_tsvector({_CFG}, coalesce(r.descripcion, '')), 'B') || "
+        f"setweight(to_tsvector({_CFG}, coalesce((SELECT string_agg(c.contenido, ' ') "
+        "FROM comentarios c WHERE c.id_reporte = r.id_reporte), '')), 'C') "
+        f"FROM reportes r {ids_filter} "
+        "ON CONFLICT (id_reporte) DO UPDATE SET documento = excluded.documento"
+    )
+
+
+def index_reports(db: Session, ids: Iterable[int]) -> None:
+    """(Re)indexa los reportes dados con su título, descripción y comentarios.
+
+    Llamar después de `db.flush()` y antes de `db.commit()`.
+    """
+    ids = sorted({int(i) for i in ids})
+    if not ids:
+        return
+    db.flush()
+    filtro = "WHERE r.id_reporte IN :ids"
+    stmt_ids = bindparam("ids", expanding=True)
+    if is_sqlite:
+        db.execute(text("DELETE FROM reportes_fts WHERE rowid IN :ids").bindparams(stmt_ids), {"ids": ids})
+        db.execute(text(_sqlite_upsert(filtro)).bindparams(stmt_ids), {"ids": ids})
+    else:
+        db.execute(text(_pg_upsert(filtro)).bindparams(stmt_ids), {"ids": ids, "cfg": SEARCH_TS_CONFIG})
+
+
+def remove_reports(db: Session, ids: Iterable[int]) -> None:
+    """Quita reportes del índice (en Postgres la FK con ON DELETE CASCADE ya lo hace)."""
+    ids = sorted({int(i) for i in ids})
+    if ids and is_sqlite:
+        db.execute(text("DELETE FROM reportes_fts WHERE rowid IN :ids").bindparams(bindparam("ids", expanding=True)), {"ids": ids})
+
+
+def rebuild_search_index(db: Session) -> int:
+    """Vacía y reconstruye el índice completo. Devuelve cuántos reportes quedaron indexados."""
+    if is_sqlite:
+        db.execute(text("DELETE FROM reportes_fts"))
+        db.execute(text(_sqlite_upsert("")))
+        total = db.execute(text("SELECT count(*) FROM reportes_fts")).scalar()
+    else:
+        db.execute(text("DELETE FROM reportes_busqueda"))
+        db.execute(text(_pg_upsert("")), {"cfg": SEARCH_TS_CONFIG})
+        total = db.execute(text("SELECT count(*) FROM reportes_busqueda")).scalar()
+    db.commit()
+    return int(total or 0)
+
+
+def _encode_cursor(score: float, id_: int) -> str:
+    raw = json.dumps([score, id_], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        score, id_ = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(score), int(id_)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+
+
+def _fts5_query(q: str) -> Optional[str]:
+    """Convierte texto libre en una consulta FTS5 segura: todos los términos, el último como prefijo.
+
+    El prefijo sólo se aplica desde 3 caracteres: uno más corto coincide con
+    casi todo el índice y obliga a rankear millones de filas.
+    """
+    tokens = _TOKEN_RE.findall(q)
+    if not tokens:
+        return None
+    terms = [f'"{t}"' for t in tokens]
+    if len(tokens[-1]) >= 3:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_reports(
+    session: Session, q: str, limit: int, cursor: Optional[str] = None
+) -> tuple[list[dict[str, Any]], Optional[str]]:
+    """Devuelve ([{id_reporte, score, snippet}], next_cursor), de mayor a menor score."""
+    after = _decode_cursor(cursor) if cursor else None
+    if is_sqlite:
+        match = _fts5_query(q)
+        if match is None:
+            return [], None
+        # bm25() es menor cuanto más relevante: se invierte para exponer "mayor es mejor"
+        sql = (
+            "SELECT id_reporte, score FROM ("
+            "SELECT rowid AS id_reporte, -bm25(reportes_fts, 10.0, 4.0, 1.0) AS score "
+            "FROM reportes_fts WHERE reportes_fts MATCH :q) "
+        )
+        params: dict[str, Any] = {"q": match, "n": limit + 1}
+    else:
+        if not q.strip():
+            return [], None
+        sql = (
+            "SELECT id_reporte, score FROM ("
+            f"SELECT id_reporte, ts_rank_cd(documento, websearch_to_tsquery({_CFG}, :q))::float8 AS score "
+            f"FROM reportes_busqueda WHERE documento @@ websearch_to_tsquery({_CFG}, :q)) AS m "
+        )
+        params = {"q": q, "n": limit + 1, "cfg": SEARCH_TS_CONFIG}
+    if after is not None:
+        sql += "WHERE score < :s OR (score = :s AND id_reporte > :i) "
+        params.update(s=after[0], i=after[1])
+    sql += "ORDER BY score DESC, id_reporte ASC LIMIT :n"
+    rows = session.execute(text(sql), params).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].score, rows[-1].id_reporte)
+    snippets = _snippets(session, params["q"], [r.id_reporte for r in rows])
+    return [
+        {"id_reporte": r.id_reporte, "score": r.score, "snippet": snippets.get(r.id_reporte, "")}
+        for r in rows
+    ], next_cursor
+
+
+def _snippets(session: Session, q: str, ids: list[int]) -> dict[int, str]:
+    if not ids:
+        return {}
+    if is_sqlite:
+        sql = (
+            "SELECT rowid, snippet(reportes_fts, -1, :a, :b, '…', 16) FROM reportes_fts "
+            "WHERE reportes_fts MATCH :q AND rowid IN :ids"
+        )
+        params = {"q": q, "ids": ids, "a": SNIPPET_START, "b": SNIPPET_STOP}
+    else:
+        # Mismo texto que el documento indexado: un reporte que coincide sólo por
+        # sus comentarios también recibe fragmento resaltado
+        sql = (
+            f"SELECT r.id_reporte, ts_headline({_CFG}, "
+            "r.titulo || ' — ' || coalesce(r.descripcion, '') || ' — ' || "
+            "coalesce((SELECT string_agg(c.contenido, ' ') FROM comentarios c WHERE c.id_reporte = r.id_reporte), ''), "
+            f"websearch_to_tsquery({_CFG}, :q), "
+            "'StartSel=' || :a || ', StopSel=' || :b || ', MaxWords=30, MinWords=10, MaxFragments=2') "
+            "FROM reportes r WHERE r.id_reporte IN :ids"
+        )
+        params = {"q": q, "ids": ids, "a": SNIPPET_START, "b": SNIPPET_STOP, "cfg": SEARCH_TS_CONFIG}
+    stmt = text(sql).bindparams(bindparam("ids", expanding=True))
+    rows = session.execute(stmt, params).all()
+    return {id_: snippet for id_, snippet in rows}
@@ -54,6 +54,43 @@ create table if not exists archivos_adjuntos (
     tipo varchar null,
     url varchar not null
 );
+create table if not exists archivos_contenido (
+    id_archivo integer primary key references archivos_adjuntos(id_archivo) on delete cascade,
+    sha256 varchar(64) not null,
+    tamano bigint not null
+);
+create table if not exists archivos_variantes (
+    id_archivo integer not null references archivos_adjuntos(id_archivo) on delete cascade,
+    nombre varchar(20) not null,
+    sha256 varchar(64) not null,
+    tamano bigint not null,
+    ancho integer not null,
+    alto integer not null,
+    tipo varchar(50) not null,
+    primary key (id_archivo, nombre)
+);
+create table if not exists trabajos_miniaturas (
+    id_trabajo serial primary key,
+    id_archivo integer not null unique references archivos_adjuntos(id_archivo) on delete cascade,
+    creado_en timestamp default now(),
+    intentos integer not null default 0,
+    proximo_intento timestamp default now(),
+    terminado_en timestamp null,
+    ultimo_error varchar(255) null
+);
+create table if not exists cargas_archivo (
+    id_carga varchar(32) primary key,
+    id_reporte integer not null references reportes(id_reporte) on delete cascade,
+    id_usuario integer not null references usuarios(id_usuario),
+    nombre_archivo varchar not null,
+    tipo varchar null,
+    tamano bigint not null,
+    sha256 varchar(64) null,
+    recibido bigint not null default 0,
+    escribiendo_hasta timestamp null,
+    creado_en timestamp default now(),
+    actualizado_en timestamp default now()
+);
 create table if not exists comentarios (
     id_comentario serial primary key,
     id_usuario integer not null references usuarios(id_usuario),
@@ -70,12 +107,51 @@ create table if not exists puntuaciones (
     ),
     fecha timestamp without time zone default now()
 );
+create table if not exists report_rating_stats (
+    id_reporte integer primary key references reportes(id_reporte) on delete cascade,
+    cantidad integer not null default 0,
+    suma integer not null default 0,
+    minimo integer null,
+    maximo integer null
+);
+create table if not exists versiones_tabla (
+    tabla varchar primary key,
+    version integer not null default 0
+);
+create table if not exists outbox (
+    id_evento serial primary key,
+    destino varchar(10) not null,
+    sala varchar(50) null,
+    payload text not null,
+    creado_en timestamp default now(),
+    intentos integer not null default 0,
+    proximo_intento timestamp default now(),
+    enviado_en timestamp null,
+    fallido_en timestamp null,
+    ultimo_error varchar(255) null
+);
+-- Bases creadas antes de OUTBOX_MAX_ATTEMPTS
+alter table outbox add column if not exists fallido_en timestamp null;
 create table if not exists etiquetas (
     id_etiqueta serial primary key,
     nombre varchar not null,
     color varchar null
 );
+create table if not exists reportes_busqueda (
+    id_reporte integer primary key references reportes(id_reporte) on delete cascade,
+    documento tsvector not null
+);
 -- Indexes útiles
+create index if not exists idx_reportes_busqueda_documento on reportes_busqueda using gin(documento);
+create index if not exists idx_comentarios_reporte on comentarios(id_reporte);
+create index if not exists ix_archivos_contenido_sha256 on archivos_contenido(sha256);
+create index if not exists ix_archivos_variantes_sha256 on archivos_variantes(sha256);
+create index if not exists idx_trabajos_miniaturas_pendientes on trabajos_miniaturas(terminado_en, proximo_intento, id_trabajo);
+drop index if exists idx_outbox_pendientes;
+create index if not exists idx_outbox_pendientes on outbox(enviado_en, fallido_en, proximo_intento, id_evento);
 create index if not exists idx_reportes_usuario on reportes(id_usuario);
 create index if not exists idx_reportes_estado on reportes(id_estado);
-create index if not exists idx_puntuaciones_reporte on puntuaciones(id_reporte);
\ No newline at end of file
+create index if not exists idx_reportes_categoria on reportes(id_categoria);
+create index if not exists idx_reportes_area on reportes(id_area);
+create index if not exists idx_puntuaciones_reporte on puntuaciones(id_reporte);
+create index if not exists idx_reportes_creado_en_id on reportes(creado_en, id_reporte);
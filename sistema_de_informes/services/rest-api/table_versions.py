@@ -0,0 +1,123 @@
+"""
+Versiones de cambio por tabla y ETag fuertes para los endpoints /api/v1.
+
+Un listener `after_flush` de SQLAlchemy anota en la sesión cada tabla con
+filas insertadas, modificadas o eliminadas; al confirmar (`after_commit`) se
+incrementa `versiones_tabla.version` de esas tablas en una transacción
+propia y corta. Así el lock de la fila de versión no se sostiene durante la
+transacción del cambio (los escritores concurrentes de una misma tabla no se
+serializan en esa fila) y un rollback no incrementa nada.
+
+El incremento ocurre después del commit: un lector intermedio puede ver
+datos nuevos con la versión anterior (sólo provoca una descarga más), nunca
+datos viejos con la versión nueva. Si el proceso cae entre ambos pasos, la
+versión se corrige con la siguiente escritura de la tabla.
+
+El ETag de un endpoint se deriva de las versiones de las tablas que lo
+alimentan: si ninguna cambió, se responde `304 Not Modified` sin consultar ni
+serializar la colección. Las escrituras hechas con SQL directo (fuera del ORM)
+no incrementan la versión.
+"""
+import hashlib
+from itertools import chain
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from db import Base, ReadSessionLocal, SessionLocal
+from entities.evento_outbox import EventoOutbox
+from entities.version_tabla import VersionTabla
+
+
+def ensure_version_rows() -> None:
+    """Crea la fila de versión de cada tabla mapeada (el listener sólo hace UPDATE)."""
+    with SessionLocal() as session:
+        existentes = {t for (t,) in session.query(VersionTabla.tabla)}
+        session.add_all(
+            VersionTabla(tabla=name, version=0)
+            for name in Base.metadata.tables
+            if name not in existentes
+        )
+        session.commit()
+
+
+# Clave en `Session.info` con las tablas escritas en la transacción en curso
+_TABLAS_ESCRITAS = "tablas_escritas"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_tables(session: Session, flush_context) -> None:
+    modificados = [obj for obj in session.dirty if session.is_modified(obj)]
+    session.info.setdefault(_TABLAS_ESCRITAS, set()).update(
+        obj.__table__.name
+        for obj in chain(session.new, session.deleted, modificados)
+        if not isinstance(obj, (VersionTabla, EventoOutbox))  # la outbox no alimenta ningún ETag
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_versions(session: Session) -> None:
+    tablas = session.info.pop(_TABLAS_ESCRITAS, None)
+    if not tablas:
+        return
+    # Conexión aparte: la sesión ya no admite SQL dentro de after_commit
+    with session.get_bind().engine.begin() as conn:
+        for tabla in sorted(tablas):  # orden fijo para no provocar deadlocks entre transacciones
+            conn.execute(
+                update(VersionTabla.__table__)
+                .where(VersionTabla.__table__.c.tabla == tabla)
+                .values(version=VersionTabla.__table__.c.version + 1)
+            )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_tables(session: Session) -> None:
+    session.info.pop(_TABLAS_ESCRITAS, None)
+
+
+def current_versions(tablas: tuple[str, ...], session_factory=ReadSessionLocal) -> dict[str, int]:
+    with session_factory() as session:
+        return dict(
+            session.query(VersionTabla.tabla, VersionTabla.version)
+            .filter(VersionTabla.tabla.in_(tablas))
+            .all()
+        )
+
+
+def etag_from(versiones: dict[str, int], recurso: str = "") -> str:
+    """ETag fuerte para `recurso` (ruta + query) a partir de las versiones de sus tablas."""
+    firma = recurso + "|" + ";".join(f"{tabla}:{versiones[tabla]}" for tabla in sorted(versiones))
+    return '"' + hashlib.sha1(firma.encode()).hexdigest()[:20] + '"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidatos = (c.strip() for c in if_none_match.split(","))
+    return any(c.removeprefix("W/") == etag for c in candidatos)
+
+
+def current_etag(tablas: tuple[str, ...], recurso: str = "") -> str:
+    """ETag de `recurso` con las versiones leídas de la misma réplica que los datos del request."""
+    return etag_from(current_versions(tablas), recurso)
+
+
+def etag_for(*tablas: str):
+    """Dependencia: responde 304 si `If-None-Match` coincide; si no, agrega el header ETag.
+
+    Devuelve las versiones leídas (una consulta por request), para que el
+    endpoint las pase a `ref_cache.get` sin volver a leerlas.
+    """
+
+    def dependency(request: Request, response: Response) -> dict[str, int]:
+        versiones = current_versions(tablas)
+        etag = etag_from(versiones, f"{request.url.path}?{request.url.query}")
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _matches(if_none_match, etag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+        return versiones
+
+    return dependency
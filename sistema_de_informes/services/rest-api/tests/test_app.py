@@ -1,6 +1,9 @@
+import json
 import os
 import sys
+import time
 from pathlib import Path
+import pytest
 from fastapi.testclient import TestClient
 from dotenv import load_dotenv
 
@@ -83,6 +86,1070 @@ def test_crud_reporte_basico():
     r = client.delete(f"/reportes/{rep_id}", headers=headers)
     assert r.status_code == 204
 
+def _seed_reportes(n, **campos):
+    """Inserta reportes directamente en la DB (los endpoints /api/v1 son públicos)."""
+    from db import SessionLocal
+    from entities.reporte import Reporte
+    from entities.usuario import Usuario
+
+    with SessionLocal() as session:
+        user = session.query(Usuario).filter(Usuario.email == "seed@example.com").first()
+        if not user:
+            user = Usuario(nombre="Seed", email="seed@example.com", password_hash="x")
+            session.add(user)
+            session.flush()
+        reportes = [
+            Reporte(id_usuario=user.id_usuario, titulo=f"Seed {i}", **campos)
+            for i in range(n)
+        ]
+        session.add_all(reportes)
+        session.commit()
+        return [r.id_reporte for r in reportes]
+
+
+def test_reports_paginacion_por_cursor():
+    ids = set(_seed_reportes(5))
+
+    vistos = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get("/api/v1/reports", params=params)
+        assert r.status_code == 200, r.text
+        page = r.json()
+        assert len(page["items"]) <= 2
+        vistos.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert len(vistos) == len(set(vistos))
+    assert ids <= set(vistos)
+    # Sin parámetros se mantiene la lista completa
+    assert isinstance(client.get("/api/v1/reports").json(), list)
+    assert client.get("/api/v1/reports", params={"cursor": "xx"}).status_code == 400
+
+
+def test_reports_filtros_en_servidor():
+    ids = set(_seed_reportes(3, id_area=777, id_estado=7))
+    _seed_reportes(2, id_area=778)
+
+    r = client.get("/api/v1/reports", params={"area_id": 777, "state_id": 7})
+    assert r.status_code == 200, r.text
+    assert {item["id"] for item in r.json()} == ids
+
+    r = client.get("/api/v1/reports", params={"area_id": 777, "sort": "created_at", "limit": 10})
+    fechas = [item["created_at"] for item in r.json()["items"]]
+    assert fechas == sorted(fechas)
+    assert client.get("/api/v1/reports", params={"created_from": "2999-01-01"}).json() == []
+    assert client.get("/api/v1/reports", params={"sort": "titulo"}).status_code == 422
+
+
+def test_analytics_agregados_en_sql():
+    _seed_reportes(4, id_area=901)
+    r = client.get("/api/v1/analytics/reports", params={"group_by": "area"})
+    assert r.status_code == 200, r.text
+    body = r.json()
+    grupo = next(g for g in body["groups"] if g["id"] == 901)
+    assert grupo["count"] == 4
+    assert body["total"] == sum(g["count"] for g in body["groups"])
+
+    top = client.get("/api/v1/analytics/top-users", params={"limit": 1}).json()
+    assert len(top) == 1 and top[0]["count"] >= 4
+    assert "average" in client.get("/api/v1/analytics/ratings").json()
+
+
+def test_resumen_puntuacion_incremental():
+    from db import SessionLocal
+    from entities.puntuacion import Puntuacion
+    from entities.resumen_puntuacion import ResumenPuntuacion
+    from rating_stats import ensure_rating_stats, rebuild_rating_stats, registrar_puntuacion
+
+    (rep_id,) = _seed_reportes(1)
+    with SessionLocal() as db:
+        objs = []
+        for valor in (2, 5, 4):
+            obj = Puntuacion(id_usuario=1, id_reporte=rep_id, valor=valor)
+            db.add(obj)
+            registrar_puntuacion(db, rep_id, nuevo=valor)
+            objs.append(obj)
+        db.commit()
+
+        # Cambio que quita el máximo (5 -> 3) y baja del mínimo (2)
+        objs[1].valor = 3
+        registrar_puntuacion(db, rep_id, nuevo=3, anterior=5)
+        db.delete(objs[0])
+        registrar_puntuacion(db, rep_id, anterior=2)
+        db.commit()
+
+        stats = db.get(ResumenPuntuacion, rep_id)
+        assert (stats.cantidad, stats.suma, stats.minimo, stats.maximo) == (2, 7, 3, 4)
+        assert stats.promedio == 3.5
+
+        rebuild_rating_stats(db)
+        db.expire_all()
+        stats = db.get(ResumenPuntuacion, rep_id)
+        assert (stats.cantidad, stats.suma, stats.minimo, stats.maximo) == (2, 7, 3, 4)
+
+        # Base previa al agregado: tabla vacía con puntuaciones -> se llena al arrancar
+        db.query(ResumenPuntuacion).delete()
+        db.commit()
+        ensure_rating_stats()
+        db.expire_all()
+        stats = db.get(ResumenPuntuacion, rep_id)
+        assert (stats.cantidad, stats.suma, stats.minimo, stats.maximo) == (2, 7, 3, 4)
+
+
+def test_reports_export_streaming():
+    ids = set(_seed_reportes(3, id_area=555))
+
+    r = client.get("/api/v1/reports/export", params={"format": "ndjson", "area_id": 555})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert {json.loads(line)["id"] for line in r.text.splitlines()} == ids
+
+    r = client.get("/api/v1/reports/export", params={"format": "csv", "area_id": 555})
+    lines = r.text.strip().splitlines()
+    assert lines[0].startswith("id,title,")
+    assert len(lines) == 1 + len(ids)
+
+
+def test_cache_tablas_de_referencia():
+    import ref_cache
+    from db import SessionLocal
+    from entities.etiqueta import Etiqueta
+
+    r = client.get("/api/v1/tags")
+    antes, etag = r.json(), r.headers["etag"]
+    assert client.get("/api/v1/tags").json() == antes  # servida desde la caché
+
+    # Escritura de otro proceso (sin ref_cache.invalidate): cambia la versión en la base
+    with SessionLocal() as session:
+        session.add(Etiqueta(nombre="cache-test"))
+        session.commit()
+
+    assert client.get("/api/v1/tags", headers={"If-None-Match": etag}).status_code == 200
+    r = client.get("/api/v1/tags")
+    assert r.headers["etag"] != etag
+    assert any(t["name"] == "cache-test" for t in r.json())
+
+    version = ref_cache.version("etiquetas")
+    ref_cache.invalidate("etiquetas")
+    assert ref_cache.version("etiquetas") == version + 1
+    assert client.get("/api/v1/tags").json() == r.json()
+
+
+def test_cache_referencia_acierto_sin_consultas(monkeypatch):
+    import ref_cache
+    from db import SessionLocal
+    from entities.etiqueta import Etiqueta
+
+    lecturas, cargas = [], []
+    real = ref_cache.current_versions
+    monkeypatch.setattr(ref_cache, "current_versions", lambda *a, **k: lecturas.append(a) or real(*a, **k))
+    monkeypatch.setattr(ref_cache, "REF_CACHE_POLL_SECONDS", 60)
+
+    def loader():
+        cargas.append(1)
+        return len(cargas)
+
+    assert ref_cache.get("etiquetas", "prueba", loader) == 1
+    consultas = len(lecturas)
+    assert all(ref_cache.get("etiquetas", "prueba", loader) == 1 for _ in range(5))
+    assert len(lecturas) == consultas  # los aciertos no van a la base
+
+    # Otro proceso escribe: se nota al vencer el intervalo de consulta
+    with SessionLocal() as session:
+        session.add(Etiqueta(nombre="poll-test"))
+        session.commit()
+    assert ref_cache.get("etiquetas", "prueba", loader) == 1
+    monkeypatch.setattr(ref_cache, "REF_CACHE_POLL_SECONDS", 0)
+    assert ref_cache.get("etiquetas", "prueba", loader) == 2
+
+
+def test_una_lectura_de_version_por_request(monkeypatch):
+    import ref_cache
+    import table_versions
+
+    lecturas = []
+    real = table_versions.current_versions
+
+    def contar(*args, **kwargs):
+        lecturas.append(args[0])
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(table_versions, "current_versions", contar)
+    monkeypatch.setattr(ref_cache, "current_versions", contar)
+    for url in ("/api/v1/tags", "/api/v1/states", "/api/v1/reports"):
+        client.get(url)  # carga la caché
+        lecturas.clear()
+        assert client.get(url).status_code == 200
+        assert len(lecturas) == 1, (url, lecturas)  # sólo la del ETag
+
+
+def test_etag_304_y_cambio_de_version():
+    r = client.get("/api/v1/reports")
+    etag = r.headers["etag"]
+    r = client.get("/api/v1/reports", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+
+    _seed_reportes(1)
+    r = client.get("/api/v1/reports", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+
+
+def _as_seed_user():
+    """Sustituye la dependencia Auth por el usuario semilla (sin Auth Service)."""
+    from db import SessionLocal
+    from deps import Auth
+    from entities.usuario import Usuario
+
+    _seed_reportes(0)
+    with SessionLocal() as session:
+        user = session.query(Usuario).filter(Usuario.email == "seed@example.com").one()
+        session.expunge(user)
+    app.dependency_overrides[Auth] = lambda: user
+    return user
+
+
+def test_bulk_reportes_comentarios_puntuaciones():
+    _as_seed_user()
+    try:
+        r = client.post("/reportes/bulk", json={"items": [{"titulo": f"Lote {i}"} for i in range(50)]})
+        assert r.status_code == 201, r.text
+        rep_ids = [rep["id_reporte"] for rep in r.json()]
+        assert len(set(rep_ids)) == 50
+
+        r = client.post("/comentarios/bulk", json={"items": [
+            {"id_reporte": rep_ids[i % 3], "contenido": f"c{i}"} for i in range(10)
+        ]})
+        assert r.status_code == 201, r.text
+        assert len(r.json()) == 10
+
+        r = client.post("/puntuaciones/bulk", json={"items": [
+            {"id_reporte": rep_ids[0], "valor": v} for v in (1, 4, 5)
+        ]})
+        assert r.status_code == 201, r.text
+        top = client.get("/api/v1/analytics/ratings/by-report", params={"limit": 100}).json()
+        assert {"report_id": rep_ids[0], "count": 3, "average": round(10 / 3, 4)} in top
+
+        # Un id inexistente rechaza el lote completo
+        r = client.post("/comentarios/bulk", json={"items": [
+            {"id_reporte": rep_ids[0], "contenido": "ok"}, {"id_reporte": 10**9, "contenido": "x"}
+        ]})
+        assert r.status_code == 400
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_rutas_async_crear_y_actualizar():
+    _as_seed_user()
+    try:
+        r = client.post("/reportes", json={"titulo": "Async", "id_categoria": 10**9})
+        assert r.status_code == 400
+        r = client.post("/reportes", json={"titulo": "Async"})
+        assert r.status_code == 201, r.text
+        rep_id = r.json()["id_reporte"]
+        r = client.put(f"/reportes/{rep_id}", json={"titulo": "Async (editado)"})
+        assert r.status_code == 200 and r.json()["titulo"] == "Async (editado)"
+        r = client.post("/puntuaciones", json={"id_reporte": rep_id, "valor": 4})
+        assert r.status_code == 201, r.text
+        r = client.post("/comentarios", json={"id_reporte": rep_id, "contenido": "hola"})
+        assert r.status_code == 201, r.text
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_auth_cachea_principal_e_invalida(monkeypatch):
+    from fastapi import HTTPException
+    from jose import jwt
+    import deps
+    from db import SessionLocal
+    from entities.usuario import Usuario
+
+    def crear(email):
+        with SessionLocal() as session:
+            u = Usuario(nombre="Cache", email=email, password_hash="x")
+            session.add(u)
+            session.commit()
+            uid = u.id_usuario
+        token = jwt.encode(
+            {"sub": "999", "email": email, "jti": f"jti-{email}", "exp": int(time.time()) + 60},
+            deps.SECRET_KEY, algorithm=deps.ALGORITHM,
+        )
+        return uid, f"Bearer {token}"
+
+    def borrar(uid):
+        # Borrado desde otro worker: no pasa por invalidate_principal de este proceso
+        with SessionLocal() as session:
+            session.delete(session.get(Usuario, uid))
+            session.commit()
+
+    monkeypatch.setattr(deps, "AUTH_CACHE_VERSION_POLL_SECONDS", 60)
+    uid, bearer = crear("cache@example.com")
+    assert deps.Auth(bearer).id_usuario == uid
+    borrar(uid)
+    assert deps.Auth(bearer).id_usuario == uid  # dentro del intervalo de consulta
+    deps.invalidate_principal(id_usuario=uid)  # el worker que borró lo descarta de inmediato
+    with pytest.raises(HTTPException):
+        deps.Auth(bearer)
+
+    # Vencido el intervalo, la versión de `usuarios` descarta el caché en todos los workers
+    uid, bearer = crear("cache2@example.com")
+    assert deps.Auth(bearer).id_usuario == uid
+    borrar(uid)
+    monkeypatch.setattr(deps, "AUTH_CACHE_VERSION_POLL_SECONDS", 0)
+    with pytest.raises(HTTPException):
+        deps.Auth(bearer)
+
+
+def test_revocaciones_delta_y_poda():
+    import httpx
+    import deps
+
+    now = int(time.time())
+    respuestas = {
+        None: {"items": [{"jti": "a", "exp": now + 60}, {"jti": "viejo", "exp": now - 1}], "cursor": 2},
+        "2": {"items": [{"jti": "b", "exp": now + 60}], "cursor": 3},
+    }
+    pedidos = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        since = request.url.params.get("since")
+        pedidos.append(since)
+        return httpx.Response(200, json=respuestas[since])
+
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        cursor = deps.sync_revoked(client, None)
+        assert cursor == 2 and deps.is_revoked("a") and not deps.is_revoked("viejo")
+        cursor = deps.sync_revoked(client, cursor)
+        assert cursor == 3 and deps.is_revoked("a") and deps.is_revoked("b")
+    assert pedidos == [None, "2"]
+
+    # Un snapshot completo reemplaza la copia local
+    deps._apply_revoked({"b": now + 60}, full=True)
+    assert not deps.is_revoked("a") and deps.is_revoked("b")
+    deps._apply_revoked({}, full=True)
+
+
+def test_revocaciones_por_stream_sse():
+    import httpx
+    import deps
+
+    exp = int(time.time()) + 60
+    sse = (
+        "retry: 2000\n\n"
+        f'event: revoked\nid: 5\ndata: {{"jti":"sse-a","exp":{exp},"type":"access","cursor":5}}\n\n'
+        f'event: revoked\ndata: {{"jti":"sse-r","exp":{exp},"type":"refresh"}}\n\n'
+    )
+    pedidos = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        pedidos.append(request.url.path)
+        if request.url.path.endswith("/stream"):
+            return httpx.Response(200, text=sse, headers={"content-type": "text/event-stream"})
+        return httpx.Response(200, json={"items": [{"jti": "previo", "exp": exp}], "cursor": 4})
+
+    state = deps._RevokedSync()
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        deps.consume_revoked_stream(client, state)
+    # Suscripción primero, luego el polling que cubre lo anterior
+    assert pedidos == ["/auth/revoked/stream", "/auth/revoked"]
+    assert state.cursor == 4
+    assert deps.is_revoked("previo") and deps.is_revoked("sse-a")
+    assert not deps.is_revoked("sse-r")
+    deps._apply_revoked({}, full=True)
+
+
+def test_ws_dispatcher_no_bloquea_y_reintenta(monkeypatch):
+    import asyncio
+    import httpx
+    import ws_notifier
+
+    monkeypatch.setattr(ws_notifier, "WS_RETRY_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(ws_notifier, "WS_QUEUE_MAX", 2)
+    llamadas = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        llamadas.append(request.url.path)
+        await asyncio.sleep(0.05)  # WS lento: no debe frenar a submit()
+        return httpx.Response(503 if len(llamadas) == 1 else 200)
+
+    async def escenario():
+        d = ws_notifier.NotificationDispatcher(transport=httpx.MockTransport(handler))
+        t0 = time.perf_counter()
+        aceptados = [d.submit("reports", {"event": f"e{i}"}) for i in range(3)]
+        assert time.perf_counter() - t0 < 0.05
+        await d.drain()
+        await d.stop()
+        return aceptados, d.metrics()
+
+    aceptados, m = asyncio.run(escenario())
+    assert aceptados == [True, True, False]
+    assert m == {"enqueued": 2, "sent": 2, "retried": 1, "failed": 0, "dropped": 1, "coalesced": 0, "queued": 0}
+    assert llamadas == ["/notify/reports"] * 3
+
+
+def test_ws_agrupa_eventos_por_reporte(monkeypatch):
+    import asyncio
+    import httpx
+    import ws_notifier
+
+    monkeypatch.setattr(ws_notifier, "WS_COALESCE_SECONDS", 0.05)
+    recibidos = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        recibidos.append((request.url.path, json.loads(request.content)))
+        return httpx.Response(200)
+
+    def rating(report_id, valor, promedio):
+        data = {"report_id": report_id, "rating": valor, "average": promedio}
+        return {"event": "rating_added", "message": "x", "data": data}
+
+    async def escenario():
+        d = ws_notifier.NotificationDispatcher(transport=httpx.MockTransport(handler))
+        envios = [d.send("reports", rating(1, v, 3.0 + i)) for i, v in enumerate([5, 4, 3, 2, 1])]
+        envios.append(d.send("reports", rating(2, 5, 5.0)))
+        resultados = await asyncio.gather(*envios)
+        # Camino sin confirmación (submit): también se agrupa
+        for i in range(3):
+            d.submit("comments", {"event": "comment_added", "message": "x",
+                                  "data": {"report_id": 7, "comment_id": i, "preview": f"c{i}"}})
+        await asyncio.sleep(0.1)
+        await d.drain()
+        await d.stop()
+        return resultados, d.metrics()
+
+    resultados, m = asyncio.run(escenario())
+    assert resultados == [True] * 6
+    assert m["coalesced"] == 6 and m["sent"] == 3
+    por_reporte = {body["data"]["report_id"]: body for _, body in recibidos}
+    assert por_reporte[1]["data"]["count"] == 5
+    assert por_reporte[1]["data"]["ratings"] == [5, 4, 3, 2, 1]
+    assert por_reporte[1]["message"] == "5 nuevas puntuaciones en reporte #1, nuevo promedio 7.00"
+    assert por_reporte[2]["data"] == {"report_id": 2, "rating": 5, "average": 5.0}
+    assert por_reporte[7]["data"]["comment_ids"] == [0, 1, 2]
+    assert por_reporte[7]["data"]["preview"] == "c2"
+
+    async def apagado():
+        # stop() con una ventana abierta: la entrega se hace y `send` no queda esperando
+        d = ws_notifier.NotificationDispatcher(transport=httpx.MockTransport(handler))
+        envio = asyncio.ensure_future(d.send("reports", rating(3, 4, 4.0)))
+        await asyncio.sleep(0)
+        await d.stop()
+        return await asyncio.wait_for(envio, 1)
+
+    assert asyncio.run(apagado()) is True
+    assert recibidos[-1][1]["data"]["report_id"] == 3
+
+
+def test_outbox_transaccional_y_worker(monkeypatch):
+    import asyncio
+    import outbox
+    from db import SessionLocal
+    from entities.comentario import Comentario
+    from entities.evento_outbox import EventoOutbox
+
+    with SessionLocal() as session:
+        session.query(EventoOutbox).delete()
+        session.commit()
+    rep_id = _seed_reportes(1)[0]
+    _as_seed_user()
+    try:
+        r = client.post("/comentarios", json={"id_reporte": rep_id, "contenido": "outbox"})
+        assert r.status_code == 201, r.text
+
+        # Falla después de insertar comentario y evento (ya enviados a la base), antes del commit
+        import routers.comentario as comentario_router
+        original = comentario_router.notify_comment_added
+
+        async def notificar_y_fallar(*args, db, **kwargs):
+            await original(*args, db=db, **kwargs)
+            await db.flush()
+            raise RuntimeError("fallo antes del commit")
+
+        monkeypatch.setattr(comentario_router, "notify_comment_added", notificar_y_fallar)
+        with pytest.raises(RuntimeError):
+            client.post("/comentarios", json={"id_reporte": rep_id, "contenido": "revertido"})
+        monkeypatch.undo()
+    finally:
+        app.dependency_overrides.clear()
+
+    with SessionLocal() as session:
+        assert not session.query(Comentario).filter(Comentario.contenido == "revertido").count()
+        pendientes = session.query(EventoOutbox).filter(EventoOutbox.enviado_en.is_(None)).all()
+        assert [(e.destino, e.sala, json.loads(e.payload)["event"]) for e in pendientes] == [
+            ("ws", "comments", "comment_added")
+        ]
+
+    entregas = []
+
+    async def ws_send(sala, payload):
+        entregas.append((sala, payload["data"]["report_id"]))
+        return len(entregas) > 1  # el primer intento falla
+
+    monkeypatch.setattr(outbox, "OUTBOX_RETRY_BASE_SECONDS", 0)
+    worker = outbox.OutboxWorker(ws_send)
+    assert asyncio.run(worker.run_once()) == 1
+    with SessionLocal() as session:
+        e = session.query(EventoOutbox).one()
+        assert e.enviado_en is None and e.intentos == 1 and e.ultimo_error
+    assert asyncio.run(worker.run_once()) == 1
+    assert asyncio.run(worker.run_once()) == 0
+    with SessionLocal() as session:
+        assert session.query(EventoOutbox).one().enviado_en is not None
+    assert entregas == [("comments", rep_id), ("comments", rep_id)]
+
+
+def test_outbox_abandona_tras_max_intentos(monkeypatch):
+    import asyncio
+    import outbox
+    from db import SessionLocal
+    from entities.evento_outbox import EventoOutbox
+
+    with SessionLocal() as session:
+        session.query(EventoOutbox).delete()
+        outbox.add_event(session, "comments", {"event": "imposible"})
+        session.commit()
+
+    intentos = []
+
+    async def ws_send(sala, payload):
+        intentos.append(payload["event"])
+        return False  # nunca se puede entregar
+
+    monkeypatch.setattr(outbox, "OUTBOX_RETRY_BASE_SECONDS", 0)
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 3)
+    worker = outbox.OutboxWorker(ws_send)
+    assert [asyncio.run(worker.run_once()) for _ in range(4)] == [1, 1, 1, 0]
+    assert len(intentos) == 3
+    with SessionLocal() as session:
+        e = session.query(EventoOutbox).one()
+        assert e.enviado_en is None and e.fallido_en is not None
+        assert e.intentos == 3 and e.ultimo_error
+
+
+def test_busqueda_texto_completo():
+    _as_seed_user()
+    try:
+        titulo = client.post("/reportes", json={"titulo": "Fuga de agua zanfoña", "descripcion": "Baño del bloque B"})
+        desc = client.post("/reportes", json={"titulo": "Luminaria rota", "descripcion": "Charco de agua: zanfona"})
+        otro = client.post("/reportes", json={"titulo": "Puerta trabada", "descripcion": "Aula 3"})
+        ids = [r.json()["id_reporte"] for r in (titulo, desc, otro)]
+        r = client.post("/comentarios", json={"id_reporte": ids[2], "contenido": "también hay zanfoña en el piso"})
+        assert r.status_code == 201, r.text
+
+        r = client.get("/api/v1/reports/search", params={"q": "zanfona"})
+        assert r.status_code == 200, r.text
+        items = r.json()["items"]
+        # Sin tildes, título > descripción > comentarios
+        assert [i["id"] for i in items] == ids
+        assert items[0]["score"] >= items[1]["score"] >= items[2]["score"]
+        assert "<b>" in items[0]["snippet"]
+
+        # Cursor: mismas filas, una por página
+        vistos, cursor = [], None
+        while True:
+            params = {"q": "zanfona", "limit": 1, **({"cursor": cursor} if cursor else {})}
+            page = client.get("/api/v1/reports/search", params=params).json()
+            vistos += [i["id"] for i in page["items"]]
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        assert vistos == ids
+
+        # Prefijo y mantenimiento del índice al editar y eliminar
+        assert [i["id"] for i in client.get("/api/v1/reports/search", params={"q": "lumin"}).json()["items"]] == [ids[1]]
+        client.put(f"/reportes/{ids[1]}", json={"titulo": "Farola rota"})
+        assert client.get("/api/v1/reports/search", params={"q": "luminaria"}).json()["items"] == []
+        client.delete(f"/reportes/{ids[0]}")
+        restantes = [i["id"] for i in client.get("/api/v1/reports/search", params={"q": "zanfona"}).json()["items"]]
+        assert restantes == ids[1:]
+        assert client.get("/api/v1/reports/search", params={"q": "!!"}).json() == {"items": [], "next_cursor": None}
+    finally:
+        app.dependency_overrides.clear()
+
+
+def _pdf_bytes(textos):
+    """PDF mínimo con una página por texto (Helvetica), suficiente para PyPDF2."""
+    n = len(textos)
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(n))
+    objs.append(f"<< /Type /Pages /Kids [{kids}] /Count {n} >>".encode())
+    objs.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, texto in enumerate(textos):
+        stream = f"BT /F1 12 Tf 72 720 Td ({texto}) Tj ET".encode()
+        objs.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        objs.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for num, obj in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % num + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    return bytes(out)
+
+
+def test_pdf_extraccion_por_paginas_y_limites(monkeypatch, tmp_path):
+    import pdf_cache
+    import pdf_extractor
+
+    monkeypatch.setattr(pdf_cache, "PDF_CACHE_DIR", str(tmp_path))
+
+    pdf = _pdf_bytes([f"Pagina {i}" for i in range(1, 13)])
+    archivo = {"file": ("doc.pdf", pdf, "application/pdf")}
+
+    r = client.post("/api/v1/pdf/extract", files=archivo)
+    assert r.status_code == 200, r.text
+    assert r.json()["pages"] == 12 and "Pagina 12" in r.json()["text"]
+
+    r = client.post("/api/v1/pdf/extract", params={"format": "ndjson", "pages": "3-10"}, files=archivo)
+    assert r.status_code == 200 and r.headers["x-pdf-total-pages"] == "12"
+    lineas = [json.loads(line) for line in r.text.splitlines()]
+    assert [x["page"] for x in lineas] == list(range(3, 11))
+    assert lineas[0]["text"].strip() == "Pagina 3"
+
+    assert client.post("/api/v1/pdf/extract", params={"pages": "20-30"}, files=archivo).status_code == 400
+    assert client.post("/api/v1/pdf/extract", params={"pages": "x"}, files=archivo).status_code == 400
+    monkeypatch.setattr(pdf_extractor, "PDF_MAX_PAGES", 5)
+    assert client.post("/api/v1/pdf/extract", files=archivo).status_code == 413
+    assert client.post("/api/v1/pdf/extract", params={"pages": "1-5"}, files=archivo).status_code == 200
+    monkeypatch.setattr(pdf_extractor, "PDF_MAX_BYTES", 100)
+    assert client.post("/api/v1/pdf/extract", files=archivo).status_code == 413
+
+    # Content-Length excesivo: 413 sin leer el cuerpo ni llegar al endpoint
+    import routers.pdf as pdf_router
+
+    def no_llamar(*args, **kwargs):
+        raise AssertionError("no debe leerse el upload")
+
+    monkeypatch.setattr(pdf_router, "save_upload", no_llamar)
+    grande = {"file": ("grande.pdf", b"%PDF" + b"0" * (pdf_router.MULTIPART_OVERHEAD_BYTES + 200), "application/pdf")}
+    assert client.post("/api/v1/pdf/extract", files=grande).status_code == 413
+
+
+def test_pdf_cache_por_contenido(monkeypatch, tmp_path):
+    import pdf_cache
+    import pdf_extractor
+
+    monkeypatch.setattr(pdf_cache, "PDF_CACHE_DIR", str(tmp_path))
+    pdf = _pdf_bytes(["Factura 1", "Detalle", "Total"])
+
+    r = client.post("/api/v1/pdf/extract", files={"file": ("a.pdf", pdf, "application/pdf")})
+    assert r.status_code == 200 and r.headers["x-cache"] == "MISS"
+    esperado = r.json()
+
+    # Mismo contenido con otro nombre: no vuelve a pasar por PyPDF2
+    def no_llamar(*args, **kwargs):
+        raise AssertionError("no debería re-extraer")
+
+    monkeypatch.setattr(pdf_extractor, "iter_pages", no_llamar)
+    monkeypatch.setattr(pdf_extractor, "plan_pages", no_llamar)
+    import routers.pdf as pdf_router
+    monkeypatch.setattr(pdf_router, "iter_pages", no_llamar)
+    monkeypatch.setattr(pdf_router, "plan_pages", no_llamar)
+    r = client.post("/api/v1/pdf/extract", files={"file": ("copia.pdf", pdf, "application/pdf")})
+    assert r.status_code == 200 and r.headers["x-cache"] == "HIT"
+    assert r.json() == esperado
+    r = client.post("/api/v1/pdf/extract", params={"pages": "2-3", "format": "ndjson"},
+                    files={"file": ("copia.pdf", pdf, "application/pdf")})
+    assert r.headers["x-cache"] == "HIT"
+    assert [json.loads(x)["page"] for x in r.text.splitlines()] == [2, 3]
+
+    # LRU por tamaño: la entrada menos usada se expulsa primero
+    pdf_cache.store("aa" * 32, 1, 0, 1, ["x" * 1000])
+    time.sleep(0.01)
+    pdf_cache.store("bb" * 32, 1, 0, 1, ["y" * 1000])
+    pdf_cache.lookup("aa" * 32, None)  # aa pasa a ser la más reciente
+    pdf_cache.evict(max_bytes=os.path.getsize(pdf_cache._path("aa" * 32)))
+    assert pdf_cache.lookup("aa" * 32, None) is not None
+    assert pdf_cache.lookup("bb" * 32, None) is None
+
+
+def test_adjuntos_subida_reanudable_y_range(monkeypatch, tmp_path):
+    import hashlib
+    import blob_store
+
+    monkeypatch.setattr(blob_store, "BLOB_STORE_DIR", str(tmp_path))
+    datos = bytes(range(256)) * 40
+    sha = hashlib.sha256(datos).hexdigest()
+    (rep_id,) = _seed_reportes(1)
+    _as_seed_user()
+    try:
+        meta = {"id_reporte": rep_id, "nombre_archivo": "datos.bin", "tipo": "application/octet-stream",
+                "tamano": len(datos)}
+        r = client.post("/archivos/uploads", json=meta)
+        assert r.status_code == 201, r.text
+        carga = r.json()["id_carga"]
+
+        r = client.put(f"/archivos/uploads/{carga}", content=datos[:4000],
+                       headers={"content-range": f"bytes 0-3999/{len(datos)}"})
+        assert r.status_code == 200 and r.json()["recibido"] == 4000 and r.json()["archivo"] is None
+        # Una parte fuera de orden indica desde dónde reanudar
+        r = client.put(f"/archivos/uploads/{carga}", content=datos[5000:],
+                       headers={"content-range": f"bytes 5000-{len(datos) - 1}/{len(datos)}"})
+        assert r.status_code == 409 and r.headers["upload-offset"] == "4000"
+        assert client.get(f"/archivos/uploads/{carga}").json()["recibido"] == 4000
+
+        # Otro worker tiene reservada la escritura: 409 aunque el offset sea el correcto
+        from datetime import datetime, timedelta
+        from db import SessionLocal
+        from entities.carga_archivo import CargaArchivo
+
+        def reservar(hasta):
+            with SessionLocal() as session:
+                session.get(CargaArchivo, carga).escribiendo_hasta = hasta
+                session.commit()
+
+        reservar(datetime.utcnow() + timedelta(minutes=5))
+        r = client.put(f"/archivos/uploads/{carga}", content=datos[4000:],
+                       headers={"content-range": f"bytes 4000-{len(datos) - 1}/{len(datos)}"})
+        assert r.status_code == 409 and r.headers["upload-offset"] == "4000"
+        reservar(datetime.utcnow() - timedelta(seconds=1))  # reserva vencida (worker caído)
+        # Una parte que excede el tamaño no avanza el offset ni deja la reserva tomada
+        r = client.put(f"/archivos/uploads/{carga}", content=datos[4000:] + b"x",
+                       headers={"content-range": f"bytes 4000-{len(datos)}/*"})
+        assert r.status_code == 413
+        assert client.get(f"/archivos/uploads/{carga}").json()["recibido"] == 4000
+        r = client.put(f"/archivos/uploads/{carga}", content=datos[4000:],
+                       headers={"content-range": f"bytes 4000-{len(datos) - 1}/{len(datos)}"})
+        assert r.status_code == 200, r.text
+        archivo = r.json()["archivo"]
+        assert archivo["sha256"] == sha and archivo["tamano"] == len(datos)
+        assert client.get(f"/archivos/uploads/{carga}").status_code == 404
+
+        # Conocer el sha256 no basta: el contenido se sube y el servidor deduplica con su propio hash
+        (otro_id,) = _seed_reportes(1)
+        r = client.post("/archivos/uploads", json={**meta, "id_reporte": otro_id, "sha256": sha})
+        assert r.status_code == 201 and r.json()["archivo"] is None and r.json()["recibido"] == 0
+        r = client.put(f"/archivos/uploads/{r.json()['id_carga']}", content=datos)
+        assert r.status_code == 200 and r.json()["deduplicado"] is True
+        copia = r.json()["archivo"]
+        assert copia["id_archivo"] != archivo["id_archivo"] and copia["sha256"] == sha
+
+        # Un sha256 declarado que no coincide con lo subido no crea el adjunto
+        otro_sha = hashlib.sha256(b"otro contenido").hexdigest()
+        r = client.post("/archivos/uploads", json={**meta, "id_reporte": otro_id, "sha256": otro_sha})
+        falsa = r.json()["id_carga"]
+        assert client.put(f"/archivos/uploads/{falsa}", content=datos).status_code == 422
+        assert client.get(f"/archivos/uploads/{falsa}").status_code == 404
+        assert not os.path.exists(blob_store.upload_path(falsa))
+
+        url = archivo["url"]
+        r = client.get(url)
+        assert r.status_code == 200 and r.content == datos and r.headers["etag"] == f'"{sha}"'
+        r = client.get(url, headers={"range": "bytes=100-199"})
+        assert r.status_code == 206 and r.content == datos[100:200]
+        assert r.headers["content-range"] == f"bytes 100-199/{len(datos)}"
+        assert client.get(url, headers={"range": "bytes=-10"}).content == datos[-10:]
+        assert client.get(url, headers={"range": f"bytes={len(datos)}-"}).status_code == 416
+        assert client.get(url, headers={"if-none-match": f'"{sha}"'}).status_code == 304
+
+        # El blob se borra del disco sólo con el último adjunto que lo usa
+        assert client.delete(f"/archivos/{archivo['id_archivo']}").status_code == 204
+        assert blob_store.exists(sha)
+
+        # Un borrado que compite con una deduplicación en curso no deja al adjunto nuevo sin blob
+        import threading
+        from entities.archivo_adjunto import ArchivoAdjunto
+        from routers.archivo_adjunto import _crear_adjunto
+
+        def liberar():
+            with SessionLocal() as session:
+                blob_store.release_unused(session, {sha})
+
+        with SessionLocal() as session:
+            session.delete(session.get(ArchivoAdjunto, copia["id_archivo"]))
+            session.commit()  # ya nada referencia el blob, pero todavía no se liberó
+        with SessionLocal() as dedup:
+            blob_store.lock_blobs(dedup, {sha})
+            assert blob_store.exists(sha)
+            nuevo = _crear_adjunto(dedup, otro_id, "datos.bin", None, sha, len(datos))
+            borrador = threading.Thread(target=liberar)
+            borrador.start()
+            borrador.join(0.3)
+            assert borrador.is_alive()  # espera el lock
+            dedup.commit()
+        borrador.join()
+        assert blob_store.exists(sha)
+        assert client.delete(f"/archivos/{nuevo.id_archivo}").status_code == 204
+        assert not blob_store.exists(sha)
+
+        # Subidas abandonadas: se borran fila y archivo parcial, y los parciales sin fila
+        abandonada = client.post("/archivos/uploads", json=meta).json()["id_carga"]
+        with open(blob_store.upload_path("huerfano"), "wb"):
+            pass
+        monkeypatch.setattr(blob_store, "BLOB_UPLOAD_TTL_SECONDS", -1)
+        assert blob_store.purge_stale_uploads() >= 1
+        assert client.get(f"/archivos/uploads/{abandonada}").status_code == 404
+        assert os.listdir(blob_store.uploads_dir()) == []
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_range_con_zerocopysend(tmp_path):
+    import asyncio
+    import blob_store
+
+    path = tmp_path / "blob"
+    path.write_bytes(bytes(range(256)) * 4)
+    mensajes, archivos = [], []
+
+    async def send(message):
+        if message["type"] == "http.response.zerocopysend":
+            # Servidor falso: transfiere desde el objeto archivo, que debe seguir abierto
+            fh = message["file"]
+            assert not fh.closed
+            archivos.append(fh)
+            fh.seek(message["offset"])
+            message = {"type": "http.response.body", "body": fh.read(message["count"])}
+        mensajes.append(message)
+
+    scope = {"type": "http", "method": "GET", "headers": [], "extensions": {"http.response.zerocopysend": {}}}
+    response = blob_store.RangeFileResponse(str(path), range_header="bytes=10-19")
+    asyncio.run(response(scope, None, send))
+    assert mensajes[0]["status"] == 206
+    assert mensajes[1]["body"] == path.read_bytes()[10:20]
+    assert len(archivos) == 1 and archivos[0].closed  # se cierra al terminar la respuesta
+
+
+def test_miniaturas_en_segundo_plano(monkeypatch, tmp_path):
+    import asyncio
+    import hashlib
+    from concurrent.futures import ThreadPoolExecutor
+    import blob_store
+    import thumbnails
+
+    monkeypatch.setattr(blob_store, "BLOB_STORE_DIR", str(tmp_path))
+    renderizados = []
+
+    def render_falso(src, out_dir, formato):
+        # Sin depender de Pillow: una "miniatura" por imagen
+        renderizados.append(src)
+        path = os.path.join(out_dir, "thumb")
+        with open(path, "wb") as fh:
+            fh.write(b"miniatura de " + open(src, "rb").read()[:8])
+        return [("thumb", path, 64, 48, "image/webp")]
+
+    monkeypatch.setattr(thumbnails, "_render_variants", render_falso)
+    imagen = b"\x89PNG fake" * 100
+    sha = hashlib.sha256(imagen).hexdigest()
+    rep_a, rep_b = _seed_reportes(2)
+    _as_seed_user()
+    try:
+        meta = {"id_reporte": rep_a, "nombre_archivo": "foto.png", "tipo": "image/png", "tamano": len(imagen)}
+        carga = client.post("/archivos/uploads", json=meta).json()["id_carga"]
+        archivo = client.put(f"/archivos/uploads/{carga}", content=imagen).json()["archivo"]
+        assert archivo["variantes"] == {}
+
+        worker = thumbnails.ThumbnailWorker(executor=ThreadPoolExecutor(1))
+        assert asyncio.run(worker.run_once()) == 1
+        assert asyncio.run(worker.run_once()) == 0
+        variantes = client.get(f"/archivos/{archivo['id_archivo']}").json()["variantes"]
+        assert variantes == {"thumb": f"/archivos/{archivo['id_archivo']}/contenido?variante=thumb"}
+        r = client.get(variantes["thumb"])
+        assert r.status_code == 200 and r.content.startswith(b"miniatura de") and r.headers["content-type"] == "image/webp"
+        assert client.get(f"/archivos/{archivo['id_archivo']}/contenido?variante=web").status_code == 404
+
+        # Mismo contenido en otro reporte: reutiliza las variantes sin volver a redimensionar
+        carga = client.post("/archivos/uploads", json={**meta, "id_reporte": rep_b, "sha256": sha}).json()["id_carga"]
+        copia = client.put(f"/archivos/uploads/{carga}", content=imagen).json()["archivo"]
+        assert asyncio.run(worker.run_once()) == 1
+        assert len(renderizados) == 1
+        assert "thumb" in client.get(f"/archivos/{copia['id_archivo']}").json()["variantes"]
+
+        # Los adjuntos que no son imágenes no generan trabajos
+        otro = client.post("/archivos/uploads", json={**meta, "nombre_archivo": "a.txt", "tipo": "text/plain", "tamano": 3})
+        client.put(f"/archivos/uploads/{otro.json()['id_carga']}", content=b"abc")
+        assert asyncio.run(worker.run_once()) == 0
+
+        thumb_sha = hashlib.sha256(b"miniatura de " + imagen[:8]).hexdigest()
+        client.delete(f"/archivos/{archivo['id_archivo']}")
+        assert blob_store.exists(thumb_sha)
+        client.delete(f"/archivos/{copia['id_archivo']}")
+        assert not blob_store.exists(thumb_sha) and not blob_store.exists(sha)
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_reporte_full_con_consultas_fijas():
+    from sqlalchemy import event
+    from db import SessionLocal, engine
+    from entities.area import Area
+    from entities.comentario import Comentario
+    from entities.usuario import Usuario
+
+    with SessionLocal() as session:
+        area = Area(nombre_area="Bloque Full")
+        session.add(area)
+        session.commit()
+        id_area = area.id_area
+    chico, grande = _seed_reportes(2, id_area=id_area)
+    with SessionLocal() as session:
+        autor = session.query(Usuario).filter(Usuario.email == "seed@example.com").one()
+        for rep_id, n in ((chico, 2), (grande, 12)):
+            session.add_all(
+                Comentario(id_reporte=rep_id, id_usuario=autor.id_usuario, contenido=f"c{i}") for i in range(n)
+            )
+        session.commit()
+
+    consultas = []
+
+    def contar(conn, cursor, statement, *args):
+        consultas.append(statement)
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        r = client.get(f"/api/v1/reports/{chico}/full")
+        n_chico = len(consultas)
+        consultas.clear()
+        r_grande = client.get(f"/api/v1/reports/{grande}/full", params={"comments_limit": 50})
+        n_grande = len(consultas)
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+    assert r.status_code == 200 and r_grande.status_code == 200
+    assert n_chico == n_grande
+    body = r_grande.json()
+    assert body["area_name"] == "Bloque Full" and body["user_name"] == "Seed"
+    assert body["rating"] == {"count": 0, "average": None, "min": None, "max": None}
+    assert len(body["comments"]["items"]) == 12 and body["comments"]["items"][0]["user_name"] == "Seed"
+
+    # Paginación de comentarios
+    vistos, cursor = [], None
+    while True:
+        params = {"comments_limit": 5, **({"comments_cursor": cursor} if cursor else {})}
+        page = client.get(f"/api/v1/reports/{grande}/full", params=params).json()["comments"]
+        vistos += [c["id"] for c in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert vistos == [c["id"] for c in body["comments"]["items"]]
+    assert client.get("/api/v1/reports/999999/full").status_code == 404
+
+
+def test_consulta_por_lote_de_ids():
+    from sqlalchemy import event
+    from db import engine
+
+    a, b = _seed_reportes(2)
+    consultas = []
+
+    def contar(conn, cursor, statement, *args):
+        if "FROM reportes" in statement:
+            consultas.append(statement)
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        r = client.get("/api/v1/reports", params={"ids": f"{b},999999,{a},{b}"})
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+    assert r.status_code == 200, r.text
+    items = r.json()
+    assert [i and i["id"] for i in items] == [b, None, a, b]
+    assert len(consultas) == 1 and " IN " in consultas[0]
+
+    usuarios = client.get("/api/v1/users").json()
+    r = client.get("/api/v1/users", params={"ids": f"999999,{usuarios[0]['id']}"})
+    assert r.json() == [None, usuarios[0]]
+    r = client.get("/api/v1/states", params={"ids": "999999"})
+    assert r.status_code == 200 and r.json() == [None]
+    assert client.get("/api/v1/categories", params={"ids": ""}).json() == []
+    assert client.get("/api/v1/areas", params={"ids": "1,x"}).status_code == 400
+
+
+def test_fields_reduce_select_y_respuesta():
+    from sqlalchemy import event
+    from db import engine
+
+    (rep_id,) = _seed_reportes(1, descripcion="texto largo " * 50)
+    consultas = []
+
+    def capturar(conn, cursor, statement, *args):
+        if "FROM reportes" in statement:
+            consultas.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capturar)
+    try:
+        r = client.get("/api/v1/reports", params={"fields": "id,title,status", "limit": 500})
+    finally:
+        event.remove(engine, "before_cursor_execute", capturar)
+    assert r.status_code == 200, r.text
+    items = r.json()["items"]
+    assert all(set(i) == {"id", "title", "status"} for i in items)
+    assert any(i["id"] == rep_id for i in items)
+    assert consultas and all("descripcion" not in q for q in consultas)
+
+    # Paginación, ids y export respetan los campos pedidos
+    page = client.get("/api/v1/reports", params={"fields": "title", "limit": 1}).json()
+    assert list(page["items"][0]) == ["title"] and page["next_cursor"]
+    assert client.get("/api/v1/reports", params={"fields": "title", "ids": f"{rep_id},999999"}).json() == [
+        {"title": "Seed 0"}, None,
+    ]
+    r = client.get("/api/v1/reports/export", params={"format": "csv", "fields": "id,title"})
+    assert r.text.splitlines()[0] == "id,title"
+
+    assert client.get("/api/v1/users", params={"fields": "id,name"}).json()[0].keys() == {"id", "name"}
+    assert all(set(e) == {"name"} for e in client.get("/api/v1/states", params={"fields": "name"}).json())
+    r = client.get("/api/v1/reports", params={"fields": "id,descripcion"})
+    assert r.status_code == 400 and "descripcion" in r.json()["detail"]
+    assert client.get("/api/v1/tags", params={"fields": "secret"}).status_code == 400
+
+
+def test_lecturas_a_replica_y_read_your_writes(monkeypatch, tmp_path):
+    import db
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    # Réplica vacía: simula una réplica atrasada respecto del primario
+    replica = create_engine(f"sqlite:///{tmp_path}/replica.db")
+    db.Base.metadata.create_all(bind=replica)
+    monkeypatch.setattr(db, "_replica_sessions", [sessionmaker(bind=replica)])
+    monkeypatch.setattr(db, "_recent_writers", {})
+    _as_seed_user()
+    escritor = {"Authorization": "Bearer escritor"}
+    otro = {"Authorization": "Bearer otro"}
+    try:
+        assert client.get("/api/v1/reports", headers=escritor).json() == []
+        # Un POST que no escribe en la base no fija al primario
+        pdf = {"file": ("doc.pdf", _pdf_bytes(["Hola"]), "application/pdf")}
+        r = client.post("/api/v1/pdf/extract", files=pdf, headers=escritor)
+        assert r.status_code == 200 and "set-cookie" not in r.headers and "x-last-write" not in r.headers
+        assert db._recent_writers == {}
+
+        r = client.post("/reportes", json={"titulo": "Recién creado"}, headers=escritor)
+        assert r.status_code == 201, r.text
+        assert "read_primary=1" in r.headers["set-cookie"]
+        ultima = r.headers["x-last-write"]
+        rep_id = r.json()["id_reporte"]
+        client.cookies.clear()
+
+        # Quien escribió lee del primario; los demás siguen en la réplica
+        assert client.get(f"/reportes/{rep_id}", headers=escritor).status_code == 200
+        assert client.get(f"/reportes/{rep_id}", headers=otro).status_code == 404
+        # La cookie fija al primario también en otros workers
+        assert client.get(f"/reportes/{rep_id}", headers={**otro, "Cookie": "read_primary=1"}).status_code == 200
+        # Clientes sin cookies (GraphQL, scripts) reenvían X-Last-Write
+        assert client.get(f"/reportes/{rep_id}", headers={**otro, "X-Last-Write": ultima}).status_code == 200
+        vencido = str(int(ultima) - int(db.READ_YOUR_WRITES_SECONDS * 1000) - 1)
+        assert client.get(f"/reportes/{rep_id}", headers={**otro, "X-Last-Write": vencido}).status_code == 404
+
+        # Vencida la ventana, vuelve a la réplica
+        db._recent_writers.clear()
+        assert client.get(f"/reportes/{rep_id}", headers=escritor).status_code == 404
+    finally:
+        app.dependency_overrides.clear()
+        client.cookies.clear()
+
+
 def teardown_module(module=None):
     """No se requiere limpieza de archivos; la API ya elimina el reporte creado.
     Para datos adicionales en Supabase, usa esquemas/DB de testing o fixtures.
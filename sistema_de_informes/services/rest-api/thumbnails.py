@@ -0,0 +1,271 @@
+"""
+Miniaturas y versiones web de las imágenes adjuntas, en segundo plano.
+
+Al crear un adjunto de imagen en el almacén local, `enqueue` agrega un
+trabajo a la tabla `trabajos_miniaturas` en la misma transacción (la cola
+sobrevive a reinicios). `ThumbnailWorker` reclama trabajos por lotes y
+redimensiona con Pillow en un pool de procesos (`THUMB_WORKERS`); las
+variantes se guardan en `blob_store` y se registran en `archivos_variantes`:
+
+- "thumb": caja de `THUMB_SIZE` px, para listados.
+- "web": caja de `THUMB_WEB_SIZE` px, sólo si el original es más grande.
+
+Si otro adjunto con el mismo contenido ya tiene variantes, se reutilizan sin
+volver a procesar la imagen. Sin Pillow instalado el worker no arranca y los
+trabajos quedan pendientes hasta que esté disponible.
+"""
+import asyncio
+import importlib.util
+import os
+import shutil
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+import blob_store
+from db import SessionLocal
+from entities.archivo_adjunto import ArchivoAdjunto
+from entities.contenido_archivo import ContenidoArchivo
+from entities.trabajo_miniatura import TrabajoMiniatura
+from entities.variante_archivo import VarianteArchivo
+
+THUMB_ENABLED = os.getenv("THUMB_ENABLED", "1") == "1"
+THUMB_WORKERS = int(os.getenv("THUMB_WORKERS", "2"))
+THUMB_BATCH_SIZE = int(os.getenv("THUMB_BATCH_SIZE", "8"))
+THUMB_POLL_SECONDS = float(os.getenv("THUMB_POLL_SECONDS", "2.0"))
+THUMB_LEASE_SECONDS = int(os.getenv("THUMB_LEASE_SECONDS", "120"))
+THUMB_MAX_ATTEMPTS = int(os.getenv("THUMB_MAX_ATTEMPTS", "3"))
+THUMB_SIZE = int(os.getenv("THUMB_SIZE", "256"))
+THUMB_WEB_SIZE = int(os.getenv("THUMB_WEB_SIZE", "1600"))
+# WEBP o JPEG
+THUMB_FORMAT = os.getenv("THUMB_FORMAT", "WEBP").upper()
+# Protección contra "bombas de descompresión"
+THUMB_MAX_PIXELS = int(os.getenv("THUMB_MAX_PIXELS", str(50_000_000)))
+
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp", "image/bmp", "image/tiff"}
+_MIME = {"WEBP": "image/webp", "JPEG": "image/jpeg"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=THUMB_WORKERS)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def is_image(tipo: Optional[str]) -> bool:
+    return (tipo or "").split(";")[0].strip().lower() in IMAGE_TYPES
+
+
+def enqueue(db, archivo: ArchivoAdjunto) -> None:
+    """Agrega el trabajo a la transacción de `db` si el adjunto es una imagen local (requiere id asignado)."""
+    if THUMB_ENABLED and is_image(archivo.tipo):
+        db.add(TrabajoMiniatura(id_archivo=archivo.id_archivo))
+
+
+# --- Corre en el pool (nivel de módulo: picklable) ---
+
+def _render_variants(src: str, out_dir: str, formato: str) -> list[tuple[str, str, int, int, str]]:
+    """Genera las variantes de `src` en `out_dir`. Devuelve [(nombre, ruta, ancho, alto, mime)]."""
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = THUMB_MAX_PIXELS
+    cajas = {"thumb": THUMB_SIZE, "web": THUMB_WEB_SIZE}
+    resultados = []
+    with Image.open(src) as original:
+        # JPEG: decodifica directamente a escala reducida (mucho menos memoria y CPU)
+        original.draft("RGB", (THUMB_WEB_SIZE, THUMB_WEB_SIZE))
+        imagen = ImageOps.exif_transpose(original)
+        if imagen.mode not in ("RGB", "RGBA"):
+            imagen = imagen.convert("RGBA" if "transparency" in imagen.info or imagen.mode in ("LA", "PA") else "RGB")
+        if formato == "JPEG" and imagen.mode == "RGBA":
+            imagen = imagen.convert("RGB")
+        for nombre, caja in cajas.items():
+            if nombre != "thumb" and imagen.width <= caja and imagen.height <= caja:
+                continue  # el original ya es liviano
+            variante = imagen.copy()
+            variante.thumbnail((caja, caja), Image.LANCZOS)
+            path = os.path.join(out_dir, nombre)
+            variante.save(path, formato, quality=75 if nombre == "thumb" else 82, optimize=True)
+            resultados.append((nombre, path, variante.width, variante.height, _MIME.get(formato, "image/jpeg")))
+    return resultados
+
+
+# --- Cola en la base de datos ---
+
+def _claim(limit: int) -> list[tuple[int, int, str]]:
+    """Reserva hasta `limit` trabajos pendientes. Devuelve [(id_trabajo, id_archivo, sha256)]."""
+    now = datetime.utcnow()
+    with SessionLocal() as session:
+        rows = (
+            session.query(TrabajoMiniatura, ContenidoArchivo.sha256)
+            .join(ContenidoArchivo, ContenidoArchivo.id_archivo == TrabajoMiniatura.id_archivo)
+            .filter(TrabajoMiniatura.terminado_en.is_(None), TrabajoMiniatura.proximo_intento <= now)
+            .order_by(TrabajoMiniatura.id_trabajo)
+            .limit(limit)
+            .with_for_update(skip_locked=True, of=TrabajoMiniatura)
+            .all()
+        )
+        lease = now + timedelta(seconds=THUMB_LEASE_SECONDS)
+        for trabajo, _ in rows:
+            trabajo.proximo_intento = lease
+        out = [(t.id_trabajo, t.id_archivo, sha) for t, sha in rows]
+        session.commit()
+        return out
+
+
+def _terminar(session, id_trabajo: int) -> None:
+    trabajo = session.get(TrabajoMiniatura, id_trabajo)
+    if trabajo:
+        trabajo.terminado_en = datetime.utcnow()
+        trabajo.ultimo_error = None
+
+
+def _variantes_reutilizables(session, id_archivo: int, sha: str) -> list[VarianteArchivo]:
+    origen = (
+        session.query(VarianteArchivo.id_archivo)
+        .join(ContenidoArchivo, ContenidoArchivo.id_archivo == VarianteArchivo.id_archivo)
+        .filter(ContenidoArchivo.sha256 == sha, VarianteArchivo.id_archivo != id_archivo)
+        .first()
+    )
+    if origen is None:
+        return []
+    return (
+        session.query(VarianteArchivo)
+        .filter(VarianteArchivo.id_archivo == origen[0])
+        .populate_existing()
+        .all()
+    )
+
+
+def _reutilizar(id_trabajo: int, id_archivo: int, sha: str) -> bool:
+    """Copia las variantes de otro adjunto con el mismo contenido, si existe."""
+    with SessionLocal() as session:
+        variantes = _variantes_reutilizables(session, id_archivo, sha)
+        if not variantes:
+            return False
+        shas = {v.sha256 for v in variantes}
+        blob_store.lock_blobs(session, shas)
+        # Se relee con el lock: el origen pudo borrarse (y soltar sus blobs) entretanto
+        variantes = _variantes_reutilizables(session, id_archivo, sha)
+        if not variantes or not {v.sha256 for v in variantes} <= shas:
+            session.rollback()
+            return False
+        for v in variantes:
+            session.merge(VarianteArchivo(
+                id_archivo=id_archivo, nombre=v.nombre, sha256=v.sha256,
+                tamano=v.tamano, ancho=v.ancho, alto=v.alto, tipo=v.tipo,
+            ))
+        _terminar(session, id_trabajo)
+        session.commit()
+        return True
+
+
+def _guardar(id_trabajo: int, id_archivo: int, resultados: list[tuple[str, str, int, int, str]]) -> None:
+    archivos = [(r, blob_store.file_sha256(r[1])) for r in resultados]
+    with SessionLocal() as session:
+        # Los blobs entran al almacén con el lock tomado y se referencian en la misma transacción
+        blob_store.lock_blobs(session, {sha for _, sha in archivos})
+        if session.get(ArchivoAdjunto, id_archivo) is None:
+            # El adjunto se borró mientras se procesaba (el trabajo cayó en cascada)
+            session.rollback()
+            return
+        for (nombre, path, ancho, alto, tipo), sha in archivos:
+            tamano = os.path.getsize(path)
+            blob_store.put_file(path, sha)
+            session.merge(VarianteArchivo(
+                id_archivo=id_archivo, nombre=nombre, sha256=sha, tamano=tamano, ancho=ancho, alto=alto, tipo=tipo,
+            ))
+        _terminar(session, id_trabajo)
+        session.commit()
+
+
+def _fallar(id_trabajo: int, error: str) -> None:
+    now = datetime.utcnow()
+    with SessionLocal() as session:
+        trabajo = session.get(TrabajoMiniatura, id_trabajo)
+        if not trabajo:
+            return
+        trabajo.intentos += 1
+        trabajo.ultimo_error = error[:255]
+        if trabajo.intentos >= THUMB_MAX_ATTEMPTS:
+            trabajo.terminado_en = now  # se abandona: el adjunto queda sin variantes
+        else:
+            trabajo.proximo_intento = now + timedelta(seconds=30 * 2 ** (trabajo.intentos - 1))
+        session.commit()
+
+
+class ThumbnailWorker:
+    """Procesa la cola de miniaturas. `executor` permite reemplazar el pool de procesos (pruebas)."""
+
+    def __init__(self, executor: Optional[Executor] = None) -> None:
+        self._executor = executor
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> int:
+        """Procesa un lote; devuelve cuántos trabajos se reclamaron."""
+        jobs = await run_in_threadpool(_claim, THUMB_BATCH_SIZE)
+        await asyncio.gather(*(self._procesar(*job) for job in jobs))
+        return len(jobs)
+
+    async def _procesar(self, id_trabajo: int, id_archivo: int, sha: str) -> None:
+        # Dentro del almacén: put_file mueve las variantes con un rename
+        out_dir = tempfile.mkdtemp(prefix="thumbs-", dir=blob_store.scratch_dir())
+        try:
+            if await run_in_threadpool(_reutilizar, id_trabajo, id_archivo, sha):
+                return
+            loop = asyncio.get_running_loop()
+            resultados = await loop.run_in_executor(
+                self._executor or get_pool(), _render_variants, blob_store.blob_path(sha), out_dir, THUMB_FORMAT
+            )
+            await run_in_threadpool(_guardar, id_trabajo, id_archivo, resultados)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                shutdown_pool()  # un worker murió (p. ej. imagen corrupta): se recrea en el siguiente lote
+            await run_in_threadpool(_fallar, id_trabajo, repr(e))
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                n = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Error procesando miniaturas: {e}")
+                n = 0
+            if n < THUMB_BATCH_SIZE:
+                await asyncio.sleep(THUMB_POLL_SECONDS)
+
+    def start(self) -> None:
+        if not THUMB_ENABLED or self._task is not None:
+            return
+        if not PIL_AVAILABLE:
+            print("⚠️ Pillow no está instalado: las miniaturas quedan pendientes")
+            return
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        shutdown_pool()
@@ -2,97 +2,370 @@
 Módulo de notificaciones al WebSocket
 Envía eventos HTTP POST a ws://localhost:8080/notify/{room}
 cuando hay cambios en el REST API
+
+Los envíos no bloquean la request: `notify_websocket` encola el evento y un
+worker en segundo plano lo entrega con un único cliente HTTP (keep-alive),
+reintentando con backoff. Si la cola está llena el evento se descarta y se
+cuenta en las métricas.
+
+Con `db=...` el evento no se envía: se guarda en la outbox dentro de la
+transacción de la request y lo entrega `outbox.OutboxWorker` tras el commit.
+
+Puntuaciones y comentarios se agrupan: durante WS_COALESCE_SECONDS los
+eventos de la misma sala y reporte se acumulan y salen como un solo mensaje
+("N nuevas puntuaciones, nuevo promedio X"). Con un único evento en la
+ventana se envía el mensaje original.
 """
+import asyncio
 import httpx
 import os
 from typing import Optional
 
+import outbox
+
 WS_BASE_URL = os.getenv("WS_BASE_URL", "http://localhost:8080")
 WS_ENABLED = os.getenv("WS_NOTIFICATIONS_ENABLED", "1") == "1"
+WS_QUEUE_MAX = int(os.getenv("WS_QUEUE_MAX", "1000"))
+WS_MAX_RETRIES = int(os.getenv("WS_MAX_RETRIES", "3"))
+WS_RETRY_BASE_SECONDS = float(os.getenv("WS_RETRY_BASE_SECONDS", "0.5"))
+WS_TIMEOUT_SECONDS = float(os.getenv("WS_TIMEOUT_SECONDS", "2.0"))
+# Ventana de agrupación por (sala, evento, reporte); 0 desactiva
+WS_COALESCE_SECONDS = float(os.getenv("WS_COALESCE_SECONDS", "0.5"))
+
+
+def _merge_ratings(report_id: int, datos: list[dict]) -> tuple[str, dict]:
+    ratings = [d.get("rating") for d in datos]
+    average = datos[-1].get("average")
+    message = f"{len(datos)} nuevas puntuaciones en reporte #{report_id}"
+    if average is not None:
+        message += f", nuevo promedio {average:.2f}"
+    data = {"report_id": report_id, "count": len(datos), "rating": ratings[-1], "ratings": ratings[:100]}
+    if average is not None:
+        data["average"] = average
+    return message, data
+
+
+def _merge_comments(report_id: int, datos: list[dict]) -> tuple[str, dict]:
+    message = f"{len(datos)} nuevos comentarios en reporte #{report_id}"
+    data = {
+        "report_id": report_id,
+        "count": len(datos),
+        "comment_ids": [d.get("comment_id") for d in datos][:100],
+        "preview": datos[-1].get("preview"),
+    }
+    return message, data
+
+
+# evento -> función que arma el mensaje agregado a partir de los `data` individuales
+_COALESCE = {"rating_added": _merge_ratings, "comment_added": _merge_comments}
+
+
+class _Pendiente:
+    """Eventos acumulados de una clave durante la ventana de agrupación."""
+
+    def __init__(self, room: str) -> None:
+        self.room = room
+        self.payloads: list[dict] = []
+        self.futures: list[asyncio.Future] = []  # envíos que esperan confirmación (outbox)
+
+    def resolver(self, ok: bool) -> None:
+        for fut in self.futures:
+            if not fut.done():
+                fut.set_result(ok)
+
+
+class NotificationDispatcher:
+    """Cola acotada + worker que entrega los eventos al servicio WebSocket."""
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
+        self._transport = transport
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._pendientes: dict[tuple, _Pendiente] = {}
+        # Entregas confirmadas de ventanas ya cerradas (se guarda la referencia hasta que terminen)
+        self._entregas: set[asyncio.Task] = set()
+        self.stats = {"enqueued": 0, "sent": 0, "retried": 0, "failed": 0, "dropped": 0, "coalesced": 0}
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._worker and not self._worker.done():
+            return
+        # Primer uso o nuevo event loop (p. ej. TestClient): se recrea todo en este loop
+        self._loop = loop
+        self._pendientes = {}
+        self._entregas = set()
+        self._queue = asyncio.Queue(maxsize=WS_QUEUE_MAX)
+        self._client = httpx.AsyncClient(
+            timeout=WS_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            transport=self._transport,
+        )
+        self._worker = loop.create_task(self._run())
+
+    def _coalesce_key(self, room: str, payload: dict) -> Optional[tuple]:
+        event = payload.get("event")
+        report_id = (payload.get("data") or {}).get("report_id")
+        if WS_COALESCE_SECONDS <= 0 or event not in _COALESCE or report_id is None:
+            return None
+        return (room, event, report_id)
+
+    def _acumular(self, key: tuple, room: str, payload: dict) -> _Pendiente:
+        pendiente = self._pendientes.get(key)
+        if pendiente is None:
+            pendiente = self._pendientes[key] = _Pendiente(room)
+            self._loop.call_later(WS_COALESCE_SECONDS, self._cerrar_ventana, key)
+        pendiente.payloads.append(payload)
+        return pendiente
+
+    def _cerrar_ventana(self, key: tuple) -> None:
+        pendiente = self._pendientes.pop(key, None)
+        if pendiente is None:
+            return
+        payloads = pendiente.payloads
+        if len(payloads) == 1:
+            payload = payloads[0]
+        else:
+            self.stats["coalesced"] += len(payloads) - 1
+            room, event, report_id = key
+            message, data = _COALESCE[event](report_id, [p.get("data") or {} for p in payloads])
+            payload = {"event": event, "message": message, "data": data}
+        if not pendiente.futures:
+            self._enqueue(pendiente.room, payload)
+            return
+
+        async def entregar() -> None:
+            ok = False
+            try:
+                ok = await self._deliver(self._client, pendiente.room, payload, retries=0)
+            finally:
+                # También si se cancela: quien espera en `send` recibe False y no queda colgado
+                pendiente.resolver(ok)
+
+        task = self._loop.create_task(entregar())
+        self._entregas.add(task)
+        task.add_done_callback(self._entregas.discard)
+
+    def submit(self, room: str, payload: dict) -> bool:
+        """Encola sin esperar. Devuelve False si el evento se descartó por cola llena."""
+        self._ensure_started()
+        key = self._coalesce_key(room, payload)
+        if key is not None:
+            self._acumular(key, room, payload)
+            return True
+        return self._enqueue(room, payload)
+
+    def _enqueue(self, room: str, payload: dict) -> bool:
+        try:
+            self._queue.put_nowait((room, payload))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            return False
+        self.stats["enqueued"] += 1
+        return True
+
+    def metrics(self) -> dict:
+        return {**self.stats, "queued": self._queue.qsize() if self._queue else 0}
+
+    async def _run(self) -> None:
+        queue, client = self._queue, self._client
+        try:
+            while True:
+                room, payload = await queue.get()
+                try:
+                    await self._deliver(client, room, payload)
+                finally:
+                    queue.task_done()
+        finally:
+            await client.aclose()
+
+    async def send(self, room: str, payload: dict) -> bool:
+        """Entrega con confirmación, un solo intento (los reintentos los maneja quien llama: la outbox).
+
+        Los eventos agrupables esperan el cierre de su ventana; todos los que
+        se agruparon reciben el resultado del mensaje agregado.
+        """
+        self._ensure_started()
+        key = self._coalesce_key(room, payload)
+        if key is None:
+            return await self._deliver(self._client, room, payload, retries=0)
+        fut = self._loop.create_future()
+        self._acumular(key, room, payload).futures.append(fut)
+        return await fut
+
+    async def _deliver(self, client: httpx.AsyncClient, room: str, payload: dict, retries: int = WS_MAX_RETRIES) -> bool:
+        event = payload.get("event")
+        for attempt in range(retries + 1):
+            if attempt:
+                self.stats["retried"] += 1
+                await asyncio.sleep(WS_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+            try:
+                response = await client.post(f"{WS_BASE_URL}/notify/{room}", json=payload)
+            except httpx.TimeoutException:
+                error = f"⏱️ Timeout al notificar WebSocket (sala: {room}, evento: {event})"
+                continue
+            except httpx.ConnectError:
+                error = f"❌ No se pudo conectar al WebSocket en {WS_BASE_URL}"
+                continue
+            except Exception as e:
+                error = f"❌ Error notificando WebSocket: {e}"
+                continue
+            if response.status_code < 500:
+                if response.status_code == 200:
+                    self.stats["sent"] += 1
+                    return True
+                # 4xx: el payload no va a mejorar reintentando
+                self.stats["failed"] += 1
+                print(f"⚠️ WebSocket respondió con status {response.status_code}")
+                return False
+            error = f"⚠️ WebSocket respondió con status {response.status_code}"
+        self.stats["failed"] += 1
+        print(error)
+        return False
+
+    async def _cerrar_ventanas(self) -> None:
+        """Cierra las ventanas abiertas y espera sus entregas confirmadas."""
+        for key in list(self._pendientes):
+            self._cerrar_ventana(key)
+        while self._entregas:
+            await asyncio.gather(*self._entregas, return_exceptions=True)
+
+    async def drain(self) -> None:
+        """Espera a que se entregue lo encolado (tests y apagado ordenado)."""
+        if self._queue is not None and self._loop is asyncio.get_running_loop():
+            await self._cerrar_ventanas()
+            await self._queue.join()
+
+    async def stop(self) -> None:
+        if self._loop is asyncio.get_running_loop():
+            # Antes de cancelar el worker: él cierra el cliente que usan las entregas
+            await self._cerrar_ventanas()
+        for pendiente in self._pendientes.values():
+            pendiente.resolver(False)
+        self._pendientes = {}
+        if self._worker and self._loop is asyncio.get_running_loop():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+
+
+dispatcher = NotificationDispatcher()
 
 
 async def notify_websocket(
     room: str,
     event: str,
     message: str,
-    data: Optional[dict] = None
+    data: Optional[dict] = None,
+    db=None,
 ):
     """
-    Envía notificación al WebSocket para que replique a clientes conectados
+    Encola una notificación al WebSocket para que replique a clientes conectados.
+    Retorna de inmediato; la entrega la hace `dispatcher` en segundo plano.
     
     Args:
         room: Sala del WebSocket (reports, comments, general, etc.)
         event: Tipo de evento (new_report, update_report, comment_added, etc.)
         message: Mensaje descriptivo del evento
         data: Datos adicionales opcionales
+        db: Sesión (sync o async) de la request; llamar antes del commit
     """
+    payload = {
+        "event": event,
+        "message": message,
+    }
+    if data:
+        payload["data"] = data
+    if db is not None:
+        outbox.add_event(db, room, payload, ws=WS_ENABLED)
+        return
     if not WS_ENABLED:
         return  # WebSocket notifications deshabilitadas
-    
-    try:
-        payload = {
-            "event": event,
-            "message": message,
-        }
-        if data:
-            payload["data"] = data
-        
-        async with httpx.AsyncClient(timeout=2.0) as client:
-            response = await client.post(
-                f"{WS_BASE_URL}/notify/{room}",
-                json=payload,
-                headers={"Content-Type": "application/json"}
-            )
-            
-            if response.status_code == 200:
-                print(f"✅ WebSocket notificado: {event} en sala '{room}'")
-            else:
-                print(f"⚠️ WebSocket respondió con status {response.status_code}")
-                
-    except httpx.TimeoutException:
-        print(f"⏱️ Timeout al notificar WebSocket (sala: {room}, evento: {event})")
-    except httpx.ConnectError:
-        print(f"❌ No se pudo conectar al WebSocket en {WS_BASE_URL}")
-    except Exception as e:
-        print(f"❌ Error notificando WebSocket: {e}")
+    if not dispatcher.submit(room, payload):
+        print(f"⚠️ Cola de notificaciones llena: se descarta {event} (sala: {room})")
 
 
 # Funciones helper específicas por evento
-async def notify_new_report(report_id: int, title: str):
+async def notify_new_report(report_id: int, title: str, db=None):
     """Notifica creación de nuevo reporte"""
     await notify_websocket(
         room="reports",
         event="new_report",
         message=f"Nuevo reporte creado: {title}",
-        data={"report_id": report_id, "title": title}
+        data={"report_id": report_id, "title": title},
+        db=db,
     )
 
 
-async def notify_update_report(report_id: int, title: str):
+async def notify_update_report(report_id: int, title: str, db=None):
     """Notifica actualización de reporte"""
     await notify_websocket(
         room="reports",
         event="update_report",
         message=f"Reporte actualizado: {title}",
-        data={"report_id": report_id, "title": title}
+        data={"report_id": report_id, "title": title},
+        db=db,
     )
 
 
-async def notify_comment_added(report_id: int, comment_id: int, content: str):
+async def notify_comment_added(report_id: int, comment_id: int, content: str, db=None):
     """Notifica nuevo comentario en reporte"""
     await notify_websocket(
         room="comments",
         event="comment_added",
         message=f"Nuevo comentario en reporte #{report_id}",
-        data={"report_id": report_id, "comment_id": comment_id, "preview": content[:100]}
+        data={"report_id": report_id, "comment_id": comment_id, "preview": content[:100]},
+        db=db,
     )
 
 
-async def notify_rating_added(report_id: int, rating_value: int):
-    """Notifica nueva puntuación"""
+async def notify_rating_added(report_id: int, rating_value: int, average: Optional[float] = None, db=None):
+    """Notifica nueva puntuación (`average`: promedio del reporte tras el alta)"""
+    data = {"report_id": report_id, "rating": rating_value}
+    if average is not None:
+        data["average"] = average
     await notify_websocket(
         room="reports",
         event="rating_added",
         message=f"Nueva puntuación en reporte #{report_id}: {rating_value}/5",
-        data={"report_id": report_id, "rating": rating_value}
+        data=data,
+        db=db,
+    )
+
+
+# Altas masivas: un único mensaje agregado por lote
+async def notify_reports_imported(report_ids: list[int], db=None):
+    """Notifica la creación de un lote de reportes"""
+    await notify_websocket(
+        room="reports",
+        event="reports_imported",
+        message=f"{len(report_ids)} reportes importados",
+        data={"count": len(report_ids), "report_ids": report_ids[:100]},
+        db=db,
+    )
+
+
+async def notify_comments_imported(count: int, report_ids: list[int], db=None):
+    """Notifica un lote de comentarios (report_ids sin repetir)"""
+    await notify_websocket(
+        room="comments",
+        event="comments_imported",
+        message=f"{count} comentarios nuevos en {len(report_ids)} reportes",
+        data={"count": count, "report_ids": report_ids[:100]},
+        db=db,
+    )
+
+
+async def notify_ratings_imported(count: int, report_ids: list[int], db=None):
+    """Notifica un lote de puntuaciones (report_ids sin repetir)"""
+    await notify_websocket(
+        room="reports",
+        event="ratings_imported",
+        message=f"{count} puntuaciones nuevas en {len(report_ids)} reportes",
+        data={"count": count, "report_ids": report_ids[:100]},
+        db=db,
     )